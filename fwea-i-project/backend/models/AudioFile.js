@@ -143,7 +143,9 @@ const audioFileSchema = new mongoose.Schema({
             language: String,
             count: Number,
             words: [String]
-        }]
+        }],
+        lexiconVersion: String, // e.g. "english@2,spanish@2", see LexiconStore.getVersion
+        scannedAt: Date
     },
 
     // Waveform data
@@ -370,30 +372,27 @@ audioFileSchema.statics.getProcessingStats = async function() {
     ]);
 };
 
-audioFileSchema.statics.getLanguageStats = async function() {
-    return this.aggregate([
-        { $unwind: '$detectedLanguages' },
-        {
-            $group: {
-                _id: '$detectedLanguages.language',
-                count: { $sum: 1 },
-                avgConfidence: { $avg: '$detectedLanguages.confidence' }
-            }
-        },
-        { $sort: { count: -1 } }
-    ]);
+// Language and profanity breakdowns come from the JobRollup documents written
+// as jobs finish, not a scan of every file; `timeframe` is '1h', '24h', '7d',
+// '30d' or 'all'
+audioFileSchema.statics.getLanguageStats = async function(timeframe = 'all') {
+    const JobRollup = require('./JobRollup');
+    const summary = await JobRollup.summarize(timeframe);
+
+    return Object.entries(summary.languages)
+        .map(([language, totals]) => ({ _id: language, count: totals.count || 0 }))
+        .sort((a, b) => b.count - a.count);
 };
 
-audioFileSchema.statics.getProfanityStats = async function() {
-    return this.aggregate([
-        {
-            $group: {
-                _id: '$profanityAnalysis.severity',
-                count: { $sum: 1 },
-                avgProfanityCount: { $avg: '$profanityAnalysis.count' }
-            }
-        }
-    ]);
+audioFileSchema.statics.getProfanityStats = async function(timeframe = 'all') {
+    const JobRollup = require('./JobRollup');
+    const summary = await JobRollup.summarize(timeframe);
+
+    return Object.entries(summary.profanity).map(([severity, totals]) => ({
+        _id: severity,
+        count: totals.count || 0,
+        avgProfanityCount: totals.count ? totals.words / totals.count : 0
+    }));
 };
 
 audioFileSchema.statics.findByShareToken = function(token) {
@@ -406,38 +405,9 @@ audioFileSchema.statics.findByShareToken = function(token) {
     });
 };
 
-audioFileSchema.statics.cleanExpired = async function() {
-    const expiredFiles = await this.find({
-        $or: [
-            { expiresAt: { $lt: new Date() } },
-            { 
-                shareExpires: { $lt: new Date() },
-                shareToken: { $exists: true }
-            }
-        ]
-    });
-
-    // Delete physical files and database records
-    const fs = require('fs');
-    for (const file of expiredFiles) {
-        try {
-            if (file.originalPath && fs.existsSync(file.originalPath)) {
-                fs.unlinkSync(file.originalPath);
-            }
-            if (file.processedPath && fs.existsSync(file.processedPath)) {
-                fs.unlinkSync(file.processedPath);
-            }
-            if (file.previewPath && fs.existsSync(file.previewPath)) {
-                fs.unlinkSync(file.previewPath);
-            }
-        } catch (error) {
-            console.error(`Error deleting file ${file.filename}:`, error);
-        }
-    }
-
-    return this.deleteMany({
-        _id: { $in: expiredFiles.map(f => f._id) }
-    });
+// Removes expired files from disk and the database; see services/janitor.js
+audioFileSchema.statics.cleanExpired = function() {
+    return require('../services/janitor').sweepExpired('audiofiles');
 };
 
 module.exports = mongoose.model('AudioFile', audioFileSchema);
@@ -0,0 +1,97 @@
+const mongoose = require('mongoose');
+
+// A bulk submission (POST /api/batches): one entry per submitted file,
+// each pointing at the ProcessingJob that produces it. Identical files share
+// a job, within the batch and with the user's earlier completed jobs, so
+// `counts.jobs` can be well below `counts.total`. Children carry `batchId`;
+// `counts.completed` and `counts.failed` are $inc'ed as they finish.
+const batchJobSchema = new mongoose.Schema({
+    userId: {
+        type: mongoose.Schema.Types.ObjectId,
+        ref: 'User',
+        required: true,
+        index: true
+    },
+    name: String,
+    status: {
+        type: String,
+        enum: ['processing', 'completed', 'failed'],
+        default: 'processing'
+    },
+    settings: {
+        outputFormat: String,
+        extraFormats: [String],
+        censorMode: String
+    },
+    entries: [{
+        name: String,
+        job: {
+            type: mongoose.Schema.Types.ObjectId,
+            ref: 'ProcessingJob'
+        },
+        // Same content as an earlier entry or an earlier job
+        duplicate: Boolean,
+        _id: false
+    }],
+    counts: {
+        total: { type: Number, default: 0 },
+        jobs: { type: Number, default: 0 },
+        reused: { type: Number, default: 0 },
+        completed: { type: Number, default: 0 },
+        failed: { type: Number, default: 0 }
+    },
+    createdAt: {
+        type: Date,
+        default: Date.now
+    },
+    completedAt: Date,
+    // Matches the children's retention
+    expiresAt: {
+        type: Date,
+        default: () => new Date(Date.now() + 7 * 24 * 60 * 60 * 1000),
+        index: { expireAfterSeconds: 0 }
+    }
+});
+
+// Counts a finished child and closes the batch once every child has finished
+batchJobSchema.statics.recordChild = async function(batchId, succeeded) {
+    await this.updateOne({ _id: batchId }, { $inc: { [succeeded ? 'counts.completed' : 'counts.failed']: 1 } });
+
+    const finished = { $gte: [{ $add: ['$counts.completed', '$counts.failed'] }, '$counts.jobs'] };
+    await this.updateOne(
+        { _id: batchId, status: 'processing', $expr: finished },
+        [{
+            $set: {
+                status: { $cond: [{ $eq: ['$counts.completed', 0] }, 'failed', 'completed'] },
+                completedAt: '$$NOW'
+            }
+        }]
+    );
+};
+
+// Aggregate progress over the batch's distinct jobs: { progress, statuses }
+batchJobSchema.statics.progress = async function(batch) {
+    const ProcessingJob = require('./ProcessingJob');
+    const groups = await ProcessingJob.aggregate([
+        { $match: { batchId: batch._id } },
+        { $group: { _id: '$status', count: { $sum: 1 }, progress: { $sum: '$progress' } } }
+    ]);
+
+    const statuses = {};
+    let progress = 100 * batch.counts.reused;
+    for (const group of groups) {
+        statuses[group._id] = group.count;
+        // A failed job is finished as far as the batch is concerned
+        progress += group._id === 'failed' ? 100 * group.count : group.progress;
+    }
+    if (batch.counts.reused > 0) {
+        statuses.completed = (statuses.completed || 0) + batch.counts.reused;
+    }
+
+    return {
+        progress: batch.counts.jobs > 0 ? Math.min(100, Math.round(progress / batch.counts.jobs)) : 100,
+        statuses
+    };
+};
+
+module.exports = mongoose.model('BatchJob', batchJobSchema);
@@ -0,0 +1,25 @@
+const mongoose = require('mongoose');
+
+// Where the janitor's expiry sweep over a collection got to: the last
+// (expiresAt, _id) it finished. A run that is interrupted resumes after it;
+// a run that completes removes its checkpoint.
+const janitorCheckpointSchema = new mongoose.Schema({
+    name: {
+        type: String,
+        required: true,
+        unique: true
+    },
+    lastExpiresAt: Date,
+    lastId: mongoose.Schema.Types.ObjectId,
+    runStartedAt: Date,
+    removed: {
+        type: Number,
+        default: 0
+    },
+    updatedAt: {
+        type: Date,
+        default: Date.now
+    }
+});
+
+module.exports = mongoose.model('JanitorCheckpoint', janitorCheckpointSchema);
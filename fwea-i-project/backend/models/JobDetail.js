@@ -0,0 +1,74 @@
+const mongoose = require('mongoose');
+
+// Large per-job data kept out of the ProcessingJob document, one document per
+// job and kind, loaded only by the endpoints that need it:
+//
+//   waveform               waveformData (points, peaks, dimensions)
+//   profanity-timestamps   every flagged word with its time range
+//   stages                 per-stage timing history (startStage() etc.)
+//   debug                  free-form debugging info
+//
+// ProcessingJob stays a small hot document, so status polls and progress
+// updates don't read or write these. Transcript segments are not stored
+// here; they live in the job's transcript.json artifact.
+const KINDS = ['waveform', 'profanity-timestamps', 'stages', 'debug'];
+
+const jobDetailSchema = new mongoose.Schema({
+    job: {
+        type: mongoose.Schema.Types.ObjectId,
+        ref: 'ProcessingJob',
+        required: true
+    },
+    kind: {
+        type: String,
+        enum: KINDS,
+        required: true
+    },
+    data: mongoose.Schema.Types.Mixed,
+    updatedAt: {
+        type: Date,
+        default: Date.now
+    },
+    // Matches ProcessingJob's default retention
+    expiresAt: {
+        type: Date,
+        default: () => new Date(Date.now() + 7 * 24 * 60 * 60 * 1000),
+        index: { expireAfterSeconds: 0 }
+    }
+});
+
+jobDetailSchema.index({ job: 1, kind: 1 }, { unique: true });
+
+jobDetailSchema.statics.KINDS = KINDS;
+
+jobDetailSchema.statics.put = function(jobId, kind, data) {
+    return this.putMany(jobId, { [kind]: data });
+};
+
+// details: { kind: data }; undefined values are skipped
+jobDetailSchema.statics.putMany = function(jobId, details) {
+    const expiresAt = new Date(Date.now() + 7 * 24 * 60 * 60 * 1000);
+    const operations = Object.entries(details)
+        .filter(([, data]) => data !== undefined)
+        .map(([kind, data]) => ({
+            updateOne: {
+                filter: { job: jobId, kind },
+                update: { $set: { data, updatedAt: new Date(), expiresAt } },
+                upsert: true
+            }
+        }));
+
+    return operations.length > 0 ? this.bulkWrite(operations, { ordered: false }) : Promise.resolve(null);
+};
+
+// The stored data, or `fallback` when there is none
+jobDetailSchema.statics.get = async function(jobId, kind, fallback = null) {
+    const detail = await this.findOne({ job: jobId, kind }).select('data').lean();
+    return detail && detail.data !== undefined ? detail.data : fallback;
+};
+
+jobDetailSchema.statics.removeForJobs = function(jobIds) {
+    return this.deleteMany({ job: { $in: jobIds } });
+};
+
+module.exports = mongoose.model('JobDetail', jobDetailSchema);
@@ -0,0 +1,159 @@
+const mongoose = require('mongoose');
+const LogSketch = require('../services/logSketch');
+
+const HOUR_MS = 60 * 60 * 1000;
+const DAY_MS = 24 * HOUR_MS;
+
+const TIMEFRAMES = {
+    '1h': HOUR_MS,
+    '24h': DAY_MS,
+    '7d': 7 * DAY_MS,
+    '30d': 30 * DAY_MS
+};
+
+// Pre-aggregated job analytics, one document per UTC hour and per UTC day,
+// written with $inc/$min/$max as each job finishes (completed or failed).
+// The analytics statics on ProcessingJob and AudioFile answer a window by
+// merging at most ~55 of these (whole days plus the hours before the first
+// one) instead of grouping raw jobs. Windows start on an hour boundary.
+//
+//   statuses.<status>   count, processingMs (sum), timed (jobs with a
+//                       processing time), fileSize (sum)
+//   processing          completed jobs' processing time: min, max and a
+//                       LogSketch of bucket counts for percentiles
+//   languages.<name>    count
+//   profanity.<sev>     count, words (sum of profanity counts)
+const jobRollupSchema = new mongoose.Schema({
+    granularity: {
+        type: String,
+        enum: ['hour', 'day'],
+        required: true
+    },
+    start: {
+        type: Date,
+        required: true
+    },
+    // No defaults: an upsert would $setOnInsert them and clash with the $inc paths
+    statuses: mongoose.Schema.Types.Mixed,
+    processing: {
+        min: Number,
+        max: Number,
+        sketch: mongoose.Schema.Types.Mixed
+    },
+    languages: mongoose.Schema.Types.Mixed,
+    profanity: mongoose.Schema.Types.Mixed
+});
+
+jobRollupSchema.index({ granularity: 1, start: 1 }, { unique: true });
+
+// Field names can't contain "." or start with "$"
+function fieldKey(name) {
+    return String(name || 'unknown').replace(/[.$]/g, '_');
+}
+
+jobRollupSchema.statics.TIMEFRAMES = TIMEFRAMES;
+
+// Adds a finished job to its hour and day rollups
+jobRollupSchema.statics.recordJob = async function(job) {
+    const finishedAt = job.completedAt || job.processingEndTime || new Date();
+    const status = fieldKey(job.status);
+    const processingMs = job.totalProcessingTime;
+    const inc = {
+        [`statuses.${status}.count`]: 1,
+        [`statuses.${status}.fileSize`]: job.fileSize || 0
+    };
+    const update = { $inc: inc };
+
+    if (typeof processingMs === 'number') {
+        inc[`statuses.${status}.processingMs`] = processingMs;
+        inc[`statuses.${status}.timed`] = 1;
+
+        if (job.status === 'completed') {
+            inc[`processing.sketch.${LogSketch.key(processingMs)}`] = 1;
+            update.$min = { 'processing.min': processingMs };
+            update.$max = { 'processing.max': processingMs };
+        }
+    }
+
+    for (const detected of job.detectedLanguages || []) {
+        const language = fieldKey(detected.language);
+        inc[`languages.${language}.count`] = (inc[`languages.${language}.count`] || 0) + 1;
+    }
+
+    if (job.profanityResults && job.status === 'completed') {
+        const severity = fieldKey(job.profanityResults.severity || 'none');
+        inc[`profanity.${severity}.count`] = 1;
+        inc[`profanity.${severity}.words`] = job.profanityResults.count || 0;
+    }
+
+    const hour = new Date(Math.floor(finishedAt.getTime() / HOUR_MS) * HOUR_MS);
+    const day = new Date(Math.floor(finishedAt.getTime() / DAY_MS) * DAY_MS);
+
+    return this.bulkWrite([hour, day].map((start, i) => ({
+        updateOne: {
+            filter: { granularity: i === 0 ? 'hour' : 'day', start },
+            update,
+            upsert: true
+        }
+    })), { ordered: false });
+};
+
+// Merged rollups since the start of `timeframe` ('1h', '24h', '7d', '30d' or
+// 'all'): { since, statuses, processing: { min, max, sketch }, languages, profanity }
+jobRollupSchema.statics.summarize = async function(timeframe = '24h', now = new Date()) {
+    let query;
+    let since = null;
+
+    if (timeframe === 'all') {
+        query = { granularity: 'day' };
+    } else {
+        const windowMs = TIMEFRAMES[timeframe] || TIMEFRAMES['24h'];
+        since = new Date(Math.floor((now.getTime() - windowMs) / HOUR_MS) * HOUR_MS);
+        // Hours up to the first whole day, then days
+        const firstDay = new Date(Math.ceil(since.getTime() / DAY_MS) * DAY_MS);
+        query = {
+            $or: [
+                { granularity: 'hour', start: { $gte: since, $lt: firstDay } },
+                { granularity: 'day', start: { $gte: firstDay } }
+            ]
+        };
+    }
+
+    const rollups = await this.find(query).lean();
+    const summary = {
+        since,
+        statuses: {},
+        processing: { min: null, max: null, sketch: new LogSketch() },
+        languages: {},
+        profanity: {}
+    };
+
+    const add = (target, source) => {
+        for (const [key, value] of Object.entries(source || {})) {
+            target[key] = (target[key] || 0) + value;
+        }
+    };
+
+    for (const rollup of rollups) {
+        for (const [status, values] of Object.entries(rollup.statuses || {})) {
+            add(summary.statuses[status] = summary.statuses[status] || {}, values);
+        }
+        for (const [language, values] of Object.entries(rollup.languages || {})) {
+            add(summary.languages[language] = summary.languages[language] || {}, values);
+        }
+        for (const [severity, values] of Object.entries(rollup.profanity || {})) {
+            add(summary.profanity[severity] = summary.profanity[severity] || {}, values);
+        }
+
+        const processing = rollup.processing || {};
+        if (typeof processing.min === 'number') {
+            summary.processing.min = summary.processing.min === null ? processing.min : Math.min(summary.processing.min, processing.min);
+            summary.processing.max = summary.processing.max === null ? processing.max : Math.max(summary.processing.max, processing.max);
+        }
+        summary.processing.sketch.merge(processing.sketch);
+    }
+
+    return summary;
+};
+
+module.exports = mongoose.model('JobRollup', jobRollupSchema);
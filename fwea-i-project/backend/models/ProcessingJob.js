@@ -1,4 +1,5 @@
 const mongoose = require('mongoose');
+const JobDetail = require('./JobDetail');
 
 const processingJobSchema = new mongoose.Schema({
     userId: {
@@ -12,6 +13,12 @@ const processingJobSchema = new mongoose.Schema({
         ref: 'AudioFile',
         index: true
     },
+    // Set for jobs submitted through POST /api/batches
+    batchId: {
+        type: mongoose.Schema.Types.ObjectId,
+        ref: 'BatchJob',
+        index: true
+    },
 
     // Job identification
     jobId: {
@@ -60,45 +67,13 @@ const processingJobSchema = new mongoose.Schema({
     },
     stageDescription: String,
 
-    // Processing stages tracking with detailed timing
-    stages: [{
-        name: {
-            type: String,
-            required: true
-        },
-        status: {
-            type: String,
-            enum: ['pending', 'processing', 'completed', 'failed', 'skipped'],
-            default: 'pending'
-        },
-        startTime: Date,
-        endTime: Date,
-        duration: Number, // in milliseconds
-        progress: {
-            type: Number,
-            min: 0,
-            max: 100,
-            default: 0
-        },
-        description: String,
-        error: String,
-        retryCount: {
-            type: Number,
-            default: 0
-        },
-        metadata: mongoose.Schema.Types.Mixed
-    }],
-
-    // Processing results
+    // Summary of the results. The bulky parts (stage history, language
+    // segments, profanity timestamps, waveform points, debug info) are
+    // JobDetail documents, see loadDetail().
     detectedLanguages: [{
         language: String,
         confidence: Number,
-        segments: [{
-            start: Number,
-            end: Number,
-            text: String,
-            confidence: Number
-        }]
+        _id: false
     }],
 
     profanityResults: {
@@ -115,14 +90,6 @@ const processingJobSchema = new mongoose.Schema({
             enum: ['none', 'mild', 'moderate', 'severe'],
             default: 'none'
         },
-        timestamps: [{
-            start: Number,
-            end: Number,
-            word: String,
-            confidence: Number,
-            language: String,
-            category: String
-        }],
         languageBreakdown: [{
             language: String,
             count: Number,
@@ -138,24 +105,46 @@ const processingJobSchema = new mongoose.Schema({
         channels: Number,
         format: String,
         quality: String,
-        loudness: Number,
-        dynamicRange: Number,
-        peakLevels: [Number],
-        rmsLevels: [Number]
+        loudness: Number,       // integrated, LUFS (EBU R128)
+        dynamicRange: Number,   // loudness range, LU
+        peakLevels: [Number],   // true peak per channel, dBTP
+        rmsLevels: [Number]     // RMS per channel, dBFS
     },
 
-    waveformData: {
-        data: [mongoose.Schema.Types.Mixed],
-        width: Number,
-        height: Number,
-        samples: Number,
-        peaks: [mongoose.Schema.Types.Mixed],
-        generatedAt: Date
+    // Regions the vocal-activity detector sent to transcription (seconds) and
+    // the audio seconds that were skipped as silent or instrumental
+    speechActivity: {
+        regions: [{
+            start: Number,
+            end: Number,
+            _id: false
+        }],
+        transcribedSeconds: Number,
+        skippedSeconds: Number
     },
 
+    // Mute mask applied to the current output (seconds) and what it was built from.
+    // Decoded audio and the transcript live in the job's artifacts directory.
+    muteMask: [{
+        start: Number,
+        end: Number,
+        _id: false
+    }],
+    maskVersion: String,
+
     // File paths and URLs
     originalPath: String,
+    fileHash: {
+        type: String, // sha256 of the upload, keys the render cache
+        index: true
+    },
     outputPath: String,
+    // Every rendered format, outputPath's included (multi-format jobs)
+    outputs: [{
+        format: String,
+        path: String,
+        _id: false
+    }],
     previewPath: String,
     previewUrl: String,
     waveformImagePath: String,
@@ -185,9 +174,20 @@ const processingJobSchema = new mongoose.Schema({
             enum: ['mp3', 'wav', 'flac', 'm4a', 'aac'],
             default: 'mp3'
         },
+        // Rendered alongside outputFormat in the same pass (Studio Elite)
+        extraFormats: [{
+            type: String,
+            enum: ['mp3', 'wav', 'flac', 'm4a', 'aac']
+        }],
         bitrate: String,
         sampleRate: Number,
         channels: Number,
+        customWords: [String], // muted in addition to the lexicons, see /reclean
+        censorMode: {
+            type: String,
+            enum: ['mute', 'bleep', 'reverse', 'duck-vocals'],
+            default: 'mute'
+        },
         customSettings: mongoose.Schema.Types.Mixed
     },
 
@@ -241,7 +241,6 @@ const processingJobSchema = new mongoose.Schema({
         timestamp: Date
     },
     warnings: [String],
-    debugInfo: mongoose.Schema.Types.Mixed,
 
     // Retry and recovery
     retryCount: {
@@ -302,6 +301,10 @@ processingJobSchema.index({ userId: 1, createdAt: -1 });
 processingJobSchema.index({ status: 1, priority: -1, createdAt: 1 });
 processingJobSchema.index({ isPaid: 1, status: 1 });
 processingJobSchema.index({ createdAt: 1, expiresAt: 1 });
+// Janitor: matching files in uploads/ back to their job
+processingJobSchema.index({ filename: 1 });
+// Batch dedup: a user's earlier jobs for the same upload
+processingJobSchema.index({ userId: 1, fileHash: 1 });
 processingJobSchema.index({ paymentId: 1 }, { sparse: true });
 processingJobSchema.index({ subscriptionId: 1 }, { sparse: true });
 
@@ -320,17 +323,32 @@ processingJobSchema.virtual('processingDuration').get(function() {
     return null;
 });
 
+// Stage history lives in the job's 'stages' JobDetail
+processingJobSchema.methods.loadDetail = function(kind, fallback = null) {
+    return JobDetail.get(this._id, kind, fallback);
+};
+
+processingJobSchema.methods.loadStages = function() {
+    return this.loadDetail('stages', []);
+};
+
+processingJobSchema.methods.saveStages = function(stages) {
+    return JobDetail.put(this._id, 'stages', stages);
+};
+
 // Start processing stage
-processingJobSchema.methods.startStage = function(stageName, description) {
-    const stage = {
+processingJobSchema.methods.startStage = async function(stageName, description) {
+    const stages = await this.loadStages();
+    stages.push({
         name: stageName,
         status: 'processing',
         startTime: new Date(),
         description: description || '',
-        progress: 0
-    };
+        progress: 0,
+        retryCount: 0
+    });
+    await this.saveStages(stages);
 
-    this.stages.push(stage);
     this.currentStage = stageName;
     this.stageDescription = description;
 
@@ -343,14 +361,16 @@ processingJobSchema.methods.startStage = function(stageName, description) {
 };
 
 // Update stage progress
-processingJobSchema.methods.updateStageProgress = function(stageName, progress, description) {
-    const stage = this.stages.find(s => s.name === stageName && s.status === 'processing');
+processingJobSchema.methods.updateStageProgress = async function(stageName, progress, description) {
+    const stages = await this.loadStages();
+    const stage = stages.find(s => s.name === stageName && s.status === 'processing');
 
     if (stage) {
         stage.progress = Math.min(Math.max(progress, 0), 100);
         if (description) {
             stage.description = description;
         }
+        await this.saveStages(stages);
     }
 
     // Update overall progress based on stage weights
@@ -366,7 +386,7 @@ processingJobSchema.methods.updateStageProgress = function(stageName, progress,
     let totalWeight = 0;
     let completedWeight = 0;
 
-    for (const s of this.stages) {
+    for (const s of stages) {
         const weight = stageWeights[s.name] || 10;
         totalWeight += weight;
 
@@ -384,36 +404,40 @@ processingJobSchema.methods.updateStageProgress = function(stageName, progress,
 };
 
 // Complete processing stage
-processingJobSchema.methods.completeStage = function(stageName, metadata = null) {
-    const stage = this.stages.find(s => s.name === stageName && s.status === 'processing');
+processingJobSchema.methods.completeStage = async function(stageName, metadata = null) {
+    const stages = await this.loadStages();
+    const stage = stages.find(s => s.name === stageName && s.status === 'processing');
 
     if (stage) {
         stage.status = 'completed';
         stage.endTime = new Date();
-        stage.duration = stage.endTime - stage.startTime;
+        stage.duration = stage.endTime - new Date(stage.startTime);
         stage.progress = 100;
         if (metadata) {
             stage.metadata = metadata;
         }
+        await this.saveStages(stages);
     }
 
-    return this.save();
+    return this;
 };
 
 // Fail processing stage
-processingJobSchema.methods.failStage = function(stageName, error, retryable = false) {
-    const stage = this.stages.find(s => s.name === stageName && s.status === 'processing');
+processingJobSchema.methods.failStage = async function(stageName, error, retryable = false) {
+    const stages = await this.loadStages();
+    const stage = stages.find(s => s.name === stageName && s.status === 'processing');
 
     if (stage) {
         stage.status = 'failed';
         stage.endTime = new Date();
-        stage.duration = stage.endTime - stage.startTime;
+        stage.duration = stage.endTime - new Date(stage.startTime);
         stage.error = error;
 
         if (retryable && stage.retryCount < 3) {
             stage.retryCount += 1;
             stage.status = 'pending';
         }
+        await this.saveStages(stages);
     }
 
     if (!retryable || (stage && stage.retryCount >= 3)) {
@@ -424,9 +448,10 @@ processingJobSchema.methods.failStage = function(stageName, error, retryable = f
             stage: stageName,
             timestamp: new Date()
         };
+        return this.save();
     }
 
-    return this.save();
+    return this;
 };
 
 // Update progress with estimated time
@@ -444,7 +469,7 @@ processingJobSchema.methods.canRetry = function() {
 };
 
 // Retry processing
-processingJobSchema.methods.retry = function() {
+processingJobSchema.methods.retry = async function() {
     if (!this.canRetry()) {
         throw new Error('Job cannot be retried');
     }
@@ -454,7 +479,7 @@ processingJobSchema.methods.retry = function() {
     this.progress = 0;
     this.error = null;
     this.errorDetails = null;
-    this.stages = [];
+    await this.saveStages([]);
     this.processingStartTime = null;
     this.processingEndTime = null;
 
@@ -514,9 +539,26 @@ processingJobSchema.methods.isPreviewAvailable = function() {
     return this.status === 'completed' && (this.previewPath || this.previewUrl);
 };
 
-// Check if download is available (paid content)
+// Check if download is available (paid content). Outputs are rendered on
+// first download, so a paid job doesn't need an outputPath yet.
 processingJobSchema.methods.isDownloadAvailable = function() {
-    return this.status === 'completed' && this.isPaid && this.outputPath;
+    return this.status === 'completed' && this.isPaid;
+};
+
+// Settings CleanPipeline needs to re-clean or render this job
+processingJobSchema.methods.toPipelineJob = function() {
+    return {
+        id: this._id,
+        originalPath: this.originalPath,
+        fileHash: this.fileHash,
+        outputFormat: this.processingSettings.outputFormat,
+        extraFormats: this.processingSettings.extraFormats,
+        customWords: this.processingSettings.customWords,
+        censorMode: this.processingSettings.censorMode,
+        outputs: this.outputs,
+        previewPath: this.previewPath,
+        previewDuration: this.previewDuration
+    };
 };
 
 // Access preview (with counting)
@@ -533,54 +575,43 @@ processingJobSchema.methods.recordDownload = function() {
     return this.save();
 };
 
-// Static methods for analytics and management
+// Static methods for analytics and management. Both read the hourly/daily
+// JobRollup documents written as jobs finish, so they count finished
+// (completed or failed) jobs by completion time.
 processingJobSchema.statics.getJobStats = async function(timeframe = '24h') {
-    const timeframeMappings = {
-        '1h': 1 * 60 * 60 * 1000,
-        '24h': 24 * 60 * 60 * 1000,
-        '7d': 7 * 24 * 60 * 60 * 1000,
-        '30d': 30 * 24 * 60 * 60 * 1000
-    };
-
-    const since = new Date(Date.now() - (timeframeMappings[timeframe] || timeframeMappings['24h']));
-
-    return this.aggregate([
-        { $match: { createdAt: { $gte: since } } },
-        {
-            $group: {
-                _id: '$status',
-                count: { $sum: 1 },
-                avgProcessingTime: { $avg: '$totalProcessingTime' },
-                totalFileSize: { $sum: '$fileSize' }
-            }
-        }
-    ]);
+    const JobRollup = require('./JobRollup');
+    const summary = await JobRollup.summarize(timeframe);
+
+    return Object.entries(summary.statuses).map(([status, totals]) => ({
+        _id: status,
+        count: totals.count || 0,
+        avgProcessingTime: totals.timed ? totals.processingMs / totals.timed : null,
+        totalFileSize: totals.fileSize || 0
+    }));
 };
 
 processingJobSchema.statics.getPerformanceMetrics = async function(timeframe = '24h') {
-    const timeframeMappings = {
-        '1h': 1 * 60 * 60 * 1000,
-        '24h': 24 * 60 * 60 * 1000,
-        '7d': 7 * 24 * 60 * 60 * 1000,
-        '30d': 30 * 24 * 60 * 60 * 1000
-    };
-
-    const since = new Date(Date.now() - (timeframeMappings[timeframe] || timeframeMappings['24h']));
-
-    return this.aggregate([
-        { $match: { createdAt: { $gte: since }, status: 'completed' } },
-        {
-            $group: {
-                _id: null,
-                avgProcessingTime: { $avg: '$totalProcessingTime' },
-                minProcessingTime: { $min: '$totalProcessingTime' },
-                maxProcessingTime: { $max: '$totalProcessingTime' },
-                totalJobs: { $sum: 1 },
-                avgFileSize: { $avg: '$fileSize' },
-                successRate: { $avg: { $cond: [{ $eq: ['$status', 'completed'] }, 1, 0] } }
-            }
-        }
-    ]);
+    const JobRollup = require('./JobRollup');
+    const summary = await JobRollup.summarize(timeframe);
+    const completed = summary.statuses.completed;
+    if (!completed || !completed.count) return [];
+
+    const failed = summary.statuses.failed ? summary.statuses.failed.count : 0;
+    const { sketch } = summary.processing;
+
+    return [{
+        _id: null,
+        avgProcessingTime: completed.timed ? completed.processingMs / completed.timed : null,
+        minProcessingTime: summary.processing.min,
+        maxProcessingTime: summary.processing.max,
+        // Approximate (within 1%), from the merged LogSketch
+        p50ProcessingTime: sketch.quantile(0.5),
+        p90ProcessingTime: sketch.quantile(0.9),
+        p99ProcessingTime: sketch.quantile(0.99),
+        totalJobs: completed.count,
+        avgFileSize: completed.fileSize / completed.count,
+        successRate: completed.count / (completed.count + failed)
+    }];
 };
 
 processingJobSchema.statics.getPendingJobs = function(limit = 10) {
@@ -592,35 +623,9 @@ processingJobSchema.statics.getPendingJobs = function(limit = 10) {
     .limit(limit);
 };
 
-processingJobSchema.statics.cleanExpiredJobs = async function() {
-    const expiredJobs = await this.find({
-        $or: [
-            { expiresAt: { $lt: new Date() } },
-            { status: 'completed', completedAt: { $lt: new Date(Date.now() - 7 * 24 * 60 * 60 * 1000) } }
-        ]
-    });
-
-    // Delete associated files
-    const fs = require('fs');
-    for (const job of expiredJobs) {
-        try {
-            if (job.originalPath && fs.existsSync(job.originalPath)) {
-                fs.unlinkSync(job.originalPath);
-            }
-            if (job.outputPath && fs.existsSync(job.outputPath)) {
-                fs.unlinkSync(job.outputPath);
-            }
-            if (job.previewPath && fs.existsSync(job.previewPath)) {
-                fs.unlinkSync(job.previewPath);
-            }
-        } catch (error) {
-            console.error(`Error deleting files for job ${job._id}:`, error);
-        }
-    }
-
-    return this.deleteMany({
-        _id: { $in: expiredJobs.map(j => j._id) }
-    });
+// Removes expired jobs with their files, details and artifacts; see services/janitor.js
+processingJobSchema.statics.cleanExpiredJobs = function() {
+    return require('../services/janitor').sweepExpired('processingjobs');
 };
 
 module.exports = mongoose.model('ProcessingJob', processingJobSchema);
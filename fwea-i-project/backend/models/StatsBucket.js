@@ -0,0 +1,39 @@
+const mongoose = require('mongoose');
+
+// Completed-job counters per minute and per day, maintained with $inc by
+// StatsCounters. Replaces aggregating ProcessingJob for /api/stats.
+const statsBucketSchema = new mongoose.Schema({
+    // "minute:<epoch minute>" or "day:<YYYY-MM-DD>" (server local day)
+    key: {
+        type: String,
+        required: true,
+        unique: true
+    },
+    granularity: {
+        type: String,
+        enum: ['minute', 'day'],
+        required: true
+    },
+    start: {
+        type: Date,
+        required: true
+    },
+    jobsCompleted: {
+        type: Number,
+        default: 0
+    },
+    totalProcessingMs: {
+        type: Number,
+        default: 0
+    },
+
+    // Minute buckets only matter for the rolling window; days are kept a year
+    expiresAt: {
+        type: Date,
+        index: { expireAfterSeconds: 0 }
+    }
+});
+
+statsBucketSchema.index({ granularity: 1, start: -1 });
+
+module.exports = mongoose.model('StatsBucket', statsBucketSchema);
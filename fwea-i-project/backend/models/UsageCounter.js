@@ -0,0 +1,93 @@
+const mongoose = require('mongoose');
+
+const DAY_MS = 24 * 60 * 60 * 1000;
+
+// Tracks processed per user per day and per month, maintained with $inc by
+// UsageCounters. A new day or month is a new document, so nothing is ever
+// reset; old buckets expire. Replaces the read-modify-save counters on
+// User.usage, which lost increments when jobs for one account finished
+// concurrently.
+const usageCounterSchema = new mongoose.Schema({
+    user: {
+        type: mongoose.Schema.Types.ObjectId,
+        ref: 'User',
+        required: true
+    },
+    // "day:<YYYY-MM-DD>" or "month:<YYYY-MM>" (server local time)
+    key: {
+        type: String,
+        required: true
+    },
+    tracks: {
+        type: Number,
+        default: 0
+    },
+    expiresAt: {
+        type: Date,
+        index: { expireAfterSeconds: 0 }
+    }
+});
+
+usageCounterSchema.index({ user: 1, key: 1 }, { unique: true });
+
+usageCounterSchema.statics.dayKey = function(date) {
+    const month = String(date.getMonth() + 1).padStart(2, '0');
+    const day = String(date.getDate()).padStart(2, '0');
+    return `day:${date.getFullYear()}-${month}-${day}`;
+};
+
+usageCounterSchema.statics.monthKey = function(date) {
+    return `month:${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, '0')}`;
+};
+
+// increments: [{ user, tracks, at }]. One $inc per user and bucket, plus the
+// lifetime total and last processing date on the user document.
+usageCounterSchema.statics.addMany = async function(increments) {
+    const buckets = new Map();
+    const users = new Map();
+
+    for (const { user, tracks, at } of increments) {
+        for (const [key, ttl] of [[this.dayKey(at), 2 * DAY_MS], [this.monthKey(at), 400 * DAY_MS]]) {
+            const id = `${user}|${key}`;
+            const bucket = buckets.get(id) || { user, key, tracks: 0, expiresAt: new Date(at.getTime() + ttl) };
+            bucket.tracks += tracks;
+            buckets.set(id, bucket);
+        }
+        const total = users.get(String(user)) || { user, tracks: 0, at };
+        total.tracks += tracks;
+        if (at > total.at) total.at = at;
+        users.set(String(user), total);
+    }
+    if (buckets.size === 0) return;
+
+    const User = require('./User');
+    await Promise.all([
+        this.bulkWrite([...buckets.values()].map(bucket => ({
+            updateOne: {
+                filter: { user: bucket.user, key: bucket.key },
+                update: { $inc: { tracks: bucket.tracks }, $setOnInsert: { expiresAt: bucket.expiresAt } },
+                upsert: true
+            }
+        })), { ordered: false }),
+        User.bulkWrite([...users.values()].map(total => ({
+            updateOne: {
+                filter: { _id: total.user },
+                update: {
+                    $inc: { 'usage.tracksProcessed': total.tracks },
+                    $max: { 'usage.lastProcessingDate': total.at }
+                }
+            }
+        })), { ordered: false })
+    ]);
+};
+
+// { daily, monthly } stored for a user at `at`
+usageCounterSchema.statics.current = async function(user, at = new Date()) {
+    const dayKey = this.dayKey(at);
+    const monthKey = this.monthKey(at);
+    const buckets = await this.find({ user, key: { $in: [dayKey, monthKey] } }).select('key tracks').lean();
+    const tracks = key => (buckets.find(bucket => bucket.key === key) || { tracks: 0 }).tracks;
+    return { daily: tracks(dayKey), monthly: tracks(monthKey) };
+};
+
+module.exports = mongoose.model('UsageCounter', usageCounterSchema);
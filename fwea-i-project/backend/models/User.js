@@ -60,21 +60,8 @@ const userSchema = new mongoose.Schema({
             default: 0,
             min: 0
         },
-        lastProcessingDate: Date,
-        monthlyUsage: {
-            type: Number,
-            default: 0,
-            min: 0
-        },
-        dailyUsage: {
-            type: Number,
-            default: 0,
-            min: 0
-        },
-        lastResetDate: {
-            type: Date,
-            default: Date.now
-        }
+        lastProcessingDate: Date
+        // Daily and monthly counts live in UsageCounter
     },
     preferences: {
         language: {
@@ -166,6 +153,26 @@ userSchema.pre('save', function(next) {
     next();
 });
 
+// Cached API key lookups (services/apiKeyCache.js) go stale when a key is
+// rotated or the user's API access or subscription changes
+userSchema.pre('save', function(next) {
+    if (this.isModified('apiAccess.apiKey') || this.isModified('apiAccess.enabled') ||
+        this.isModified('subscription.tier') || this.isModified('subscription.status') ||
+        this.isModified('isActive')) {
+        this.$locals.staleApiKeys = [this.$locals.previousApiKey, this.apiAccess.apiKey];
+    }
+    next();
+});
+
+userSchema.post('save', function(user) {
+    const ApiKeyCache = require('../services/apiKeyCache');
+    for (const apiKey of user.$locals.staleApiKeys || []) {
+        ApiKeyCache.invalidate(apiKey);
+    }
+    user.$locals.staleApiKeys = null;
+    user.$locals.previousApiKey = null;
+});
+
 // Hash password before saving
 userSchema.pre('save', async function(next) {
     if (!this.isModified('password')) return next();
@@ -198,61 +205,48 @@ userSchema.methods.getPreviewLimit = function() {
     return limits[this.subscription.tier] || 30;
 };
 
-// Check if user can process more files
-userSchema.methods.canProcessFile = function() {
+// Number of output formats a job may render at once
+userSchema.methods.getOutputFormatLimit = function() {
     const limits = {
         'single': 1,
-        'dj-pro': -1, // unlimited
-        'studio-elite': -1, // unlimited
-        'day-pass': -1 // unlimited for 24 hours
+        'dj-pro': 1,
+        'studio-elite': 5,
+        'day-pass': 1
     };
 
-    const limit = limits[this.subscription.tier];
-    if (limit === -1) return true; // unlimited
-
-    // Check daily usage reset
-    const today = new Date().toDateString();
-    const lastReset = new Date(this.usage.lastResetDate).toDateString();
-
-    if (today !== lastReset) {
-        this.usage.dailyUsage = 0;
-        this.usage.lastResetDate = new Date();
-    }
+    return limits[this.subscription.tier] || 1;
+};
 
-    return this.usage.dailyUsage < limit;
+// Check if user can process more files today (cached counters, see
+// services/usageCounters.js)
+userSchema.methods.canProcessFile = function() {
+    const UsageCounters = require('../services/usageCounters');
+    return UsageCounters.canProcess(this._id, this.subscription.tier);
 };
 
-// Update usage statistics
+// Count a processed track. Batched $inc on UsageCounter (which also bumps
+// usage.tracksProcessed), so concurrent jobs don't overwrite each other.
 userSchema.methods.incrementUsage = function() {
-    this.usage.tracksProcessed += 1;
-    this.usage.dailyUsage += 1;
-    this.usage.monthlyUsage += 1;
-    this.usage.lastProcessingDate = new Date();
-    return this.save();
+    const UsageCounters = require('../services/usageCounters');
+    UsageCounters.record(this._id);
 };
 
 // Generate API key
 userSchema.methods.generateApiKey = function() {
     const crypto = require('crypto');
+    this.$locals.previousApiKey = this.$locals.previousApiKey || this.apiAccess.apiKey;
     this.apiAccess.apiKey = 'fwea_' + crypto.randomBytes(32).toString('hex');
     this.apiAccess.enabled = true;
     return this.apiAccess.apiKey;
 };
 
-// Check API rate limit
+// Counts an API call against this user's tier limits; false when over them.
+// Decided in memory by the shared RateLimiter, with no database write.
 userSchema.methods.checkRateLimit = function() {
-    if (!this.apiAccess.enabled) return false;
-
-    const now = new Date();
-    const hourAgo = new Date(now - 60 * 60 * 1000);
-
-    if (!this.apiAccess.lastApiCall || this.apiAccess.lastApiCall < hourAgo) {
-        this.apiAccess.lastApiCall = now;
-        return true;
-    }
+    if (!this.apiAccess.enabled || !this.apiAccess.apiKey) return false;
 
-    // This would need more sophisticated rate limiting in production
-    return true;
+    const RateLimiter = require('../services/rateLimiter');
+    return RateLimiter.forApiKeys().consume(this.apiAccess.apiKey, RateLimiter.limitsFor(this)).allowed;
 };
 
 // Static methods for user management
@@ -260,6 +254,7 @@ userSchema.statics.findByEmail = function(email) {
     return this.findOne({ email: email.toLowerCase() });
 };
 
+// Uncached; API requests go through services/apiKeyCache.js
 userSchema.statics.findByApiKey = function(apiKey) {
     return this.findOne({ 'apiAccess.apiKey': apiKey, 'apiAccess.enabled': true });
 };
@@ -0,0 +1,90 @@
+#!/usr/bin/env node
+
+// Adds jobs that finished before JobRollup existed to the hourly and daily
+// rollups, so the 7d/30d analytics windows cover them. Run it once after the
+// rollups are deployed.
+//
+//   node scripts/backfill-rollups.js                       jobs finished before the earliest rollup hour
+//   node scripts/backfill-rollups.js --before 2026-10-19T10:58:00Z
+//
+// Rollups are only ever added to, so a job must not be counted twice. Without
+// --before, the cutoff is the start of the earliest hour rollup: jobs from the
+// part of that hour before the deploy are missed, and a second run finds
+// nothing left to add. Pass the deploy time as --before to include them.
+// Jobs expire after 7 days, so older windows stay incomplete.
+
+const mongoose = require('mongoose');
+require('dotenv').config();
+
+const ProcessingJob = require('../models/ProcessingJob');
+const JobRollup = require('../models/JobRollup');
+
+function parseArgs(argv) {
+    const args = {};
+    for (let i = 0; i < argv.length; i++) {
+        if (!argv[i].startsWith('--')) continue;
+        const key = argv[i].slice(2);
+        const next = argv[i + 1];
+        if (next === undefined || next.startsWith('--')) {
+            args[key] = true;
+        } else {
+            args[key] = next;
+            i++;
+        }
+    }
+    return args;
+}
+
+async function backfill(argv = process.argv.slice(2)) {
+    const args = parseArgs(argv);
+
+    try {
+        console.log('🗄️  Connecting to MongoDB...');
+        await mongoose.connect(process.env.MONGODB_URI || 'mongodb://localhost:27017/fwea-i');
+
+        let before;
+        if (args.before) {
+            before = new Date(args.before);
+            if (isNaN(before.getTime())) throw new Error(`Invalid --before date: ${args.before}`);
+        } else {
+            const earliest = await JobRollup.findOne({ granularity: 'hour' }).sort({ start: 1 }).lean();
+            before = earliest ? earliest.start : new Date();
+        }
+
+        // Same finish time recordJob buckets by
+        const jobs = ProcessingJob.find({
+            status: { $in: ['completed', 'failed'] },
+            $or: [
+                { completedAt: { $lt: before } },
+                { completedAt: null, processingEndTime: { $lt: before } }
+            ]
+        })
+            .select('status completedAt processingEndTime totalProcessingTime fileSize detectedLanguages profanityResults')
+            .lean()
+            .cursor();
+
+        console.log(`📊 Backfilling rollups with jobs finished before ${before.toISOString()}...`);
+        let count = 0;
+        for await (const job of jobs) {
+            await JobRollup.recordJob(job);
+            if (++count % 1000 === 0) console.log(`   ${count} jobs`);
+        }
+
+        console.log(`\n✅ ${count} jobs added to the rollups`);
+        return count;
+
+    } catch (error) {
+        console.error('❌ Backfill failed:', error);
+        process.exitCode = 1;
+    } finally {
+        if (mongoose.connection.readyState !== 0) {
+            await mongoose.disconnect();
+        }
+    }
+}
+
+if (require.main === module) {
+    backfill();
+}
+
+module.exports = backfill;
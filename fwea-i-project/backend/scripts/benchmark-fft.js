@@ -0,0 +1,70 @@
+#!/usr/bin/env node
+
+// Spectrogram throughput: STFT frames per second on one core, for the FFT
+// alone and for the full Spectrogram path (window, FFT, log, uint8 tiles).
+// Input is synthetic: noise plus a few tones at 44.1 kHz mono.
+//
+//   node scripts/benchmark-fft.js [seconds]
+
+const FFT = require('../services/fft');
+const Spectrogram = require('../services/spectrogram');
+
+const SAMPLE_RATE = 44100;
+const SIZES = [512, 1024, 2048, 4096];
+
+function signal(seconds) {
+    const samples = new Float64Array(seconds * SAMPLE_RATE);
+    for (let i = 0; i < samples.length; i++) {
+        const t = i / SAMPLE_RATE;
+        samples[i] = 0.3 * Math.sin(2 * Math.PI * 440 * t) +
+            0.1 * Math.sin(2 * Math.PI * 3520 * t) +
+            0.05 * (Math.random() * 2 - 1);
+    }
+    return samples;
+}
+
+function framesPerSecond(frames, start) {
+    const seconds = Number(process.hrtime.bigint() - start) / 1e9;
+    return { rate: frames / seconds, ms: seconds * 1000 };
+}
+
+function benchmark() {
+    const seconds = parseInt(process.argv[2], 10) || 60;
+    const samples = signal(seconds);
+
+    console.log(`\n${seconds} s of audio at ${SAMPLE_RATE} Hz, hop = fftSize / 4, single core\n`);
+    console.log('fftSize    frames   fft frames/s   spectrogram frames/s   x realtime');
+
+    for (const fftSize of SIZES) {
+        const hopSize = fftSize / 4;
+        const frames = Math.floor((samples.length - fftSize) / hopSize) + 1;
+
+        const fft = new FFT(fftSize, 'hann');
+        const output = new Float64Array(fft.bins);
+        // Warm up the JIT before timing
+        for (let f = 0; f < Math.min(frames, 200); f++) fft.powerSpectrum(samples, f * hopSize, output);
+
+        let start = process.hrtime.bigint();
+        for (let f = 0; f < frames; f++) fft.powerSpectrum(samples, f * hopSize, output);
+        const fftOnly = framesPerSecond(frames, start);
+
+        let tiles = 0;
+        const spectrogram = new Spectrogram(SAMPLE_RATE, { fftSize, hopSize }, () => tiles++);
+        start = process.hrtime.bigint();
+        // Feed in 1 s blocks, as a PCM stream would
+        for (let i = 0; i < samples.length; i += SAMPLE_RATE) {
+            spectrogram.push(samples.subarray(i, i + SAMPLE_RATE));
+        }
+        spectrogram.finish();
+        const full = framesPerSecond(spectrogram.frames, start);
+
+        console.log(
+            `${String(fftSize).padStart(7)}  ${String(frames).padStart(8)}  ` +
+            `${Math.round(fftOnly.rate).toLocaleString().padStart(13)}  ` +
+            `${Math.round(full.rate).toLocaleString().padStart(21)}  ` +
+            `${(seconds / (full.ms / 1000)).toFixed(0).padStart(11)}`
+        );
+    }
+}
+
+benchmark();
@@ -0,0 +1,95 @@
+#!/usr/bin/env node
+
+// Recall / latency benchmark for the profanity filter.
+// Generates transcript segments containing the kinds of spellings Whisper
+// produces (phonetic misspellings, asterisk censoring, one-letter typos) plus
+// clean dictionary sentences, then runs them through the exact-only filter and
+// the exact + fuzzy filter.
+//
+// The clean sentences come from the same dictionary build-allowlists.js
+// suppresses, so their false-positive rate is a lower bound; check fuzzy
+// matching against real clean lyrics before turning it on.
+//
+//   node scripts/benchmark-profanity.js [segmentsPerCase]
+
+const compromise = require('compromise');
+const ProfanityFilter = require('../services/profanityFilter');
+
+const LANGUAGES = ['English', 'Spanish'];
+
+// What ASR actually writes for the words in the English and Spanish lexicons
+const MISSPELLED = [
+    'fuk', 'fock', 'phuck', 'fuhk', 'motherfuker', 'biatch', 'bytch', 'basterd',
+    'bastad', 'shyt', 'sheit', 'assholle', 'dik', 'pusy', 'cunnt', 'wanka',
+    'puda', 'pendeho', 'mierdda', 'carrajo', 'hoder'
+];
+const CENSORED = ['f**k', 'f*ck', 'sh*t', 's**t', 'b*tch', 'b***h', 'a**hole', 'c*nt', 'p*ta', 'mi*rda'];
+
+function pick(list, i) {
+    return list[i % list.length];
+}
+
+function segmentsFor(words, count, fillers) {
+    const segments = [];
+    for (let i = 0; i < count; i++) {
+        const filler = pick(fillers, i * 7);
+        segments.push(`${filler} ${pick(words, i)} ${pick(fillers, i * 13 + 5)}`);
+    }
+    return segments;
+}
+
+async function run(filter, segments, options) {
+    let flagged = 0;
+    const start = process.hrtime.bigint();
+    for (const text of segments) {
+        const result = await filter.checkTextForProfanity(text.toLowerCase(), LANGUAGES, options);
+        if (result.found) flagged++;
+    }
+    const elapsedUs = Number(process.hrtime.bigint() - start) / 1e3;
+    return { flagged, usPerSegment: elapsedUs / segments.length };
+}
+
+async function benchmark() {
+    process.env.LEXICON_HOT_RELOAD = 'false';
+    const perCase = parseInt(process.argv[2], 10) || 2000;
+
+    const tags = compromise.model().one.lexicon;
+    const dictionary = Object.keys(tags).filter(word => /^[a-z]{3,}$/.test(word) && tags[word] !== 'LastName');
+    const filter = ProfanityFilter.shared();
+
+    // Clean filler words must not trip either filter on their own
+    const fillers = [];
+    for (const word of dictionary) {
+        if (fillers.length >= 500) break;
+        if (!(await filter.checkTextForProfanity(word, LANGUAGES)).found) fillers.push(word);
+    }
+
+    const cases = {
+        misspelled: segmentsFor(MISSPELLED, perCase, fillers),
+        censored: segmentsFor(CENSORED, perCase, fillers),
+        clean: Array.from({ length: perCase }, (_, i) =>
+            [0, 1, 2, 3, 4, 5].map(n => pick(dictionary, i * 6 + n)).join(' '))
+    };
+
+    ProfanityFilter.preload(LANGUAGES);
+    filter.lexicons.getPhoneticIndex(LANGUAGES);
+
+    console.log(`🎯 Profanity benchmark (${perCase} segments per case, ${dictionary.length} clean words)\n`);
+    console.log('case         filter   flagged   rate      µs/segment');
+
+    for (const [name, segments] of Object.entries(cases)) {
+        for (const [label, options] of [['exact', { fuzzyMatching: false }], ['fuzzy', { fuzzyMatching: true }]]) {
+            const { flagged, usPerSegment } = await run(filter, segments, options);
+            const rate = `${((flagged / segments.length) * 100).toFixed(1)}%`;
+            console.log(`${name.padEnd(12)} ${label.padEnd(8)} ${String(flagged).padEnd(9)} ${rate.padEnd(9)} ${usPerSegment.toFixed(1)}`);
+        }
+    }
+
+    console.log('\nmisspelled/censored rates are recall; the clean rate is the false-positive rate.');
+}
+
+if (require.main === module) {
+    benchmark();
+}
+
+module.exports = benchmark;
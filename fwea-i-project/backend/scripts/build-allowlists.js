@@ -0,0 +1,64 @@
+#!/usr/bin/env node
+
+// Regenerates the "allow" list of every lexicon in data/lexicons.
+// Runs an English dictionary (compromise's lexicon) through the fuzzy index and
+// records each ordinary word that would be flagged as a sound-alike, so
+// "shoot", "count" and "hello" never get muted. Words the exact matcher
+// already flags are left out. Re-run after editing a lexicon's words.
+
+const fs = require('fs');
+const path = require('path');
+const compromise = require('compromise');
+const LexiconStore = require('../services/lexiconStore');
+
+function buildAllowlists() {
+    process.env.LEXICON_HOT_RELOAD = 'false';
+    const store = new LexiconStore();
+
+    // Surnames are skipped: "phak" and "phan" are exactly what ASR writes for profanity
+    const tags = compromise.model().one.lexicon;
+    const dictionary = Object.keys(tags)
+        .filter(word => /^[a-z]+$/.test(word) && tags[word] !== 'LastName')
+        .sort();
+
+    // English goes first: its allow list also applies to every other language set
+    const files = fs.readdirSync(store.directory)
+        .filter(file => file.endsWith('.json'))
+        .sort((a, b) => (b === 'english.json') - (a === 'english.json') || a.localeCompare(b));
+    console.log(`📚 Checking ${dictionary.length} dictionary words against ${files.length} lexicons...`);
+
+    for (const file of files) {
+        const language = path.basename(file, '.json');
+        const filePath = path.join(store.directory, file);
+        const data = JSON.parse(fs.readFileSync(filePath, 'utf8'));
+
+        // Start from an empty allow list so stale entries drop out
+        const lexicon = store.getLexicon(language);
+        store.lexicons.set(language, { ...lexicon, allow: [] });
+
+        const index = store.getPhoneticIndex([language]);
+        const matcher = store.getMatcher([language]);
+        const allow = dictionary.filter(word => {
+            const hit = index.lookup(word);
+            // The base list is shared by every language; its sound-alikes belong to English
+            if (!hit || (hit.entry.source === 'badwords' && language !== 'english')) return false;
+            return !matcher.test(word);
+        });
+
+        const changed = JSON.stringify(allow) !== JSON.stringify(data.allow || []);
+        if (changed) {
+            data.allow = allow;
+            data.version = (data.version || 1) + 1;
+            fs.writeFileSync(filePath, `${JSON.stringify(data, null, 4)}\n`);
+        }
+
+        console.log(`   ${changed ? '✏️ ' : '✅'} ${language}: ${allow.length} allowed`);
+        store.invalidate(language);
+    }
+}
+
+if (require.main === module) {
+    buildAllowlists();
+}
+
+module.exports = buildAllowlists;
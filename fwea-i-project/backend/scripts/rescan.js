@@ -0,0 +1,97 @@
+#!/usr/bin/env node
+
+// Re-scans stored transcripts for profanity, e.g. after a lexicon change.
+//
+//   node scripts/rescan.js                          all AudioFiles with transcripts
+//   node scripts/rescan.js --stale                  only files scanned with older lexicons
+//   node scripts/rescan.js --jsonl in.jsonl [--out out.jsonl]
+//
+// Options: --workers N, --batch N (transcripts per worker batch),
+//          --write-batch N (updates per bulkWrite), --context (NLP context pass)
+
+const fs = require('fs');
+const mongoose = require('mongoose');
+require('dotenv').config();
+
+const BatchScanner = require('../services/batchScanner');
+
+function parseArgs(argv) {
+    const args = {};
+    for (let i = 0; i < argv.length; i++) {
+        if (!argv[i].startsWith('--')) continue;
+        const key = argv[i].slice(2);
+        const next = argv[i + 1];
+        if (next === undefined || next.startsWith('--')) {
+            args[key] = true;
+        } else {
+            args[key] = next;
+            i++;
+        }
+    }
+    return args;
+}
+
+async function rescan(argv = process.argv.slice(2)) {
+    const args = parseArgs(argv);
+    const scanner = new BatchScanner({
+        workers: parseInt(args.workers, 10) || undefined,
+        batchSize: parseInt(args.batch, 10) || undefined,
+        writeBatchSize: parseInt(args['write-batch'], 10) || undefined,
+        scanOptions: { contextScoring: Boolean(args.context) }
+    });
+
+    // JSONL results may go to stdout; keep progress output off it
+    const log = args.jsonl && !args.out ? console.error : console.log;
+
+    let report;
+    try {
+        if (args.jsonl) {
+            log(`📄 Scanning transcripts from ${args.jsonl}...`);
+            const output = args.out ? fs.createWriteStream(args.out) : process.stdout;
+            report = await scanner.run(BatchScanner.fromJsonl(args.jsonl), BatchScanner.jsonlSink(output));
+            if (args.out) output.end();
+        } else {
+            log('🗄️  Connecting to MongoDB...');
+            await mongoose.connect(process.env.MONGODB_URI || 'mongodb://localhost:27017/fwea-i');
+
+            let query = {};
+            if (args.stale) {
+                // Files never scanned, or scanned with any lexicon older than today's
+                const LexiconStore = require('../services/lexiconStore');
+                const AudioFile = require('../models/AudioFile');
+                const store = new LexiconStore();
+                const languages = await AudioFile.distinct('detectedLanguages.language');
+                const current = languages
+                    .map(language => store.getVersion([language]))
+                    .filter(Boolean)
+                    .map(version => version.replace(/[.*+?^${}()|[\]\\]/g, '\\$&'))
+                    .join('|');
+                query = current
+                    ? { 'profanityAnalysis.lexiconVersion': { $not: new RegExp(`^(${current})(,(${current}))*$`) } }
+                    : {};
+            }
+
+            log(`🔁 Re-scanning stored transcripts with ${scanner.workerCount} workers...`);
+            report = await scanner.run(BatchScanner.fromAudioFiles(query), BatchScanner.audioFileSink());
+        }
+
+        log(`\n✅ ${report.transcripts} transcripts, ${report.segments} segments, ${report.flagged} flagged` +
+            (report.failed ? `, ${report.failed} failed` : ''));
+        log(`⚡ ${report.segmentsPerSecond} segments/sec (${report.elapsedMs}ms, ${report.workers} workers)`);
+        return report;
+
+    } catch (error) {
+        console.error('❌ Rescan failed:', error);
+        process.exitCode = 1;
+    } finally {
+        if (mongoose.connection.readyState !== 0) {
+            await mongoose.disconnect();
+        }
+    }
+}
+
+if (require.main === module) {
+    rescan();
+}
+
+module.exports = rescan;
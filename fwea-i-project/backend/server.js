@@ -4,6 +4,8 @@ const helmet = require('helmet');
 const multer = require('multer');
 const path = require('path');
 const fs = require('fs');
+const crypto = require('crypto');
+const { pipeline, Transform } = require('stream');
 const { v4: uuidv4 } = require('uuid');
 const mongoose = require('mongoose');
 const http = require('http');
@@ -16,11 +18,31 @@ const LanguageDetector = require('./services/languageDetector');
 const ProfanityFilter = require('./services/profanityFilter');
 const WaveformGenerator = require('./services/waveformGenerator');
 const PaymentService = require('./services/paymentService');
+const CleanPipeline = require('./services/cleanPipeline');
+const RenderCache = require('./services/renderCache');
+const PcmRenderer = require('./services/pcmRenderer');
+const JobArtifacts = require('./services/jobArtifacts');
+const FFT = require('./services/fft');
+const Spectrogram = require('./services/spectrogram');
+const Metrics = require('./services/metrics');
+const StatsCounters = require('./services/statsCounters');
+const Janitor = require('./services/janitor');
+const ApiKeyCache = require('./services/apiKeyCache');
+const RateLimiter = require('./services/rateLimiter');
+const UsageCounters = require('./services/usageCounters');
+const JobScheduler = require('./services/jobScheduler');
+const EtaModel = require('./services/etaModel');
+const BatchRunner = require('./services/batchRunner');
+const ArchiveReader = require('./services/archiveReader');
+const ZipWriter = require('./services/zipWriter');
 
 // Import models
 const User = require('./models/User');
 const AudioFile = require('./models/AudioFile');
 const ProcessingJob = require('./models/ProcessingJob');
+const JobRollup = require('./models/JobRollup');
+const JobDetail = require('./models/JobDetail');
+const BatchJob = require('./models/BatchJob');
 
 const app = express();
 const server = http.createServer(app);
@@ -75,6 +97,38 @@ app.use(helmet({
   }
 }));
 
+// API key clients (X-API-Key header) are authenticated and rate limited per
+// key and tier before the body is parsed. Keys resolve through ApiKeyCache
+// and limits are decided in memory, so neither touches MongoDB per request.
+// Requests without a key (the web app) pass through unchanged.
+app.use('/api', async (req, res, next) => {
+  const apiKey = req.get('X-API-Key');
+  if (!apiKey) return next();
+
+  try {
+    const user = await ApiKeyCache.get(apiKey);
+    if (!user) {
+      return res.status(401).json({ error: 'Invalid API key' });
+    }
+
+    const limit = RateLimiter.forApiKeys().consume(apiKey, RateLimiter.limitsFor(user));
+    res.set({
+      'X-RateLimit-Limit': String(limit.limit),
+      'X-RateLimit-Remaining': String(Math.max(0, limit.remaining)),
+      'X-RateLimit-Reset': String(Math.ceil((Date.now() + limit.resetMs) / 1000))
+    });
+    if (!limit.allowed) {
+      res.set('Retry-After', String(Math.ceil(limit.retryAfterMs / 1000)));
+      return res.status(429).json({ error: 'Rate limit exceeded' });
+    }
+
+    req.apiUser = user;
+    next();
+  } catch (error) {
+    next(error);
+  }
+});
+
 // Body parsing middleware (accept up to 100MB uploads)
 app.use(express.json({ limit: '100mb' }));
 app.use(express.urlencoded({ extended: true, limit: '100mb' }));
@@ -100,19 +154,37 @@ const storage = multer.diskStorage({
     cb(null, `${uniqueId}${extension}`);
   }
 });
+const MAX_UPLOAD_BYTES = 100 * 1024 * 1024;
+const audioFileFilter = (req, file, cb) => {
+  const allowedTypes = /mp3|wav|flac|m4a|aac|ogg/;
+  const extName = allowedTypes.test(path.extname(file.originalname).toLowerCase());
+  const mimeType = file.mimetype.includes('audio');
+  if (mimeType && extName) {
+    cb(null, true);
+  } else {
+    cb(new Error('Only audio files are allowed'));
+  }
+};
 const upload = multer({
   storage,
-  limits: { fileSize: 100 * 1024 * 1024, files: 1 },
-  fileFilter: (req, file, cb) => {
-    const allowedTypes = /mp3|wav|flac|m4a|aac|ogg/;
-    const extName = allowedTypes.test(path.extname(file.originalname).toLowerCase());
-    const mimeType = file.mimetype.includes('audio');
-    if (mimeType && extName) {
-      cb(null, true);
-    } else {
-      cb(new Error('Only audio files are allowed'));
-    }
-  }
+  limits: { fileSize: MAX_UPLOAD_BYTES, files: 1 },
+  fileFilter: audioFileFilter
+});
+
+// Batch submissions (POST /api/batches)
+const BATCH_MAX_FILES = parseInt(process.env.BATCH_MAX_FILES, 10) || 5000;
+// Whole submission, on top of the 100MB per file
+const BATCH_MAX_BYTES = parseInt(process.env.BATCH_MAX_BYTES, 10) || 10 * 1024 * 1024 * 1024;
+const BATCH_TIERS = ['dj-pro', 'studio-elite'];
+const BATCH_SUBSCRIPTION_STATUSES = ['active', 'trialing'];
+const BATCH_AUDIO_EXTENSION = /^\.(mp3|wav|flac|m4a|aac|ogg)$/;
+const BATCH_ARCHIVE_POLL_MS = 2000;
+// Zip exports of selected outputs (GET /api/exports)
+const EXPORT_MAX_JOBS = parseInt(process.env.EXPORT_MAX_JOBS, 10) || 200;
+const batchUpload = multer({
+  storage,
+  limits: { fileSize: MAX_UPLOAD_BYTES, files: BATCH_MAX_FILES },
+  fileFilter: audioFileFilter
 });
 
 // Connect to MongoDB
@@ -124,12 +196,22 @@ async function connectDB() {
       useUnifiedTopology: true
     });
     console.log('🗄️ Connected to MongoDB');
+    StatsCounters.start();
+    Janitor.start();
+    UsageCounters.start();
+    resumeUploads()
+      .catch(error => console.error('Upload resume error:', error.message));
+    BatchRunner.resume(runStoredJob, userTier)
+      .catch(error => console.error('Batch resume error:', error.message));
   } catch (error) {
     console.error('MongoDB connection error:', error);
   }
 }
 connectDB();
 
+// Compile the default profanity lexicon up front so the first scan doesn't pay for it
+ProfanityFilter.preload();
+
 // Track connected users for socket events
 let connectedUsers = 0;
 
@@ -164,56 +246,50 @@ app.get('/api/health', (req, res) => {
   });
 });
 
-// Return current stats (mock or from DB)
-app.get('/api/stats', async (req, res) => {
-  try {
-    let tracksProcessed = 0;
-    let avgProcessTime = 12.3;
+// Internal stage timings, counters and scheduler lane counts. Only for
+// monitoring: needs `Authorization: Bearer <METRICS_TOKEN>`, and answers 404
+// when no token is configured.
+app.get('/api/metrics', (req, res) => {
+  const token = process.env.METRICS_TOKEN;
+  if (!token) {
+    return res.status(404).json({ error: 'Not found' });
+  }
 
-    if (mongoose.connection.readyState === 1) {
-      const startOfDay = new Date();
-      startOfDay.setHours(0, 0, 0, 0);
+  // Compare digests so the check takes the same time for any guess
+  const digest = value => crypto.createHash('sha256').update(value).digest();
+  const supplied = (req.get('Authorization') || '').replace(/^Bearer\s+/i, '');
+  if (!supplied || !crypto.timingSafeEqual(digest(supplied), digest(token))) {
+    return res.status(401).json({ error: 'Metrics token required' });
+  }
 
-      const stats = await ProcessingJob.aggregate([
-        { $match: {
-            createdAt: { $gte: startOfDay },
-            status: 'completed'
-          }
-        },
-        { $group: {
-            _id: null,
-            count: { $sum: 1 },
-            avgTime: { $avg: '$totalProcessingTime' }
-          }
-        }
-      ]);
-      if (stats.length > 0) {
-        tracksProcessed = stats[0].count;
-        avgProcessTime = (stats[0].avgTime / 1000) || 12.3;
-      }
-    }
+  res.json({ ...Metrics.snapshot(), scheduler: JobScheduler.snapshot() });
+});
 
-    res.json({
-      tracksProcessedToday: tracksProcessed,
-      aiAccuracy: 99.7,
-      avgProcessTime: Number(avgProcessTime.toFixed(1)),
-      serverStatus: 'Optimal',
-      currentUsers: connectedUsers
-    });
-  } catch (error) {
-    console.error('Stats error:', error);
-    res.json({
-      tracksProcessedToday: 0,
-      aiAccuracy: 99.7,
-      avgProcessTime: 12.3,
-      serverStatus: 'Optimal',
-      currentUsers: connectedUsers
-    });
-  }
+// Homepage stats, from the in-memory counters (see StatsCounters); polled by
+// every visitor, so it never touches the database
+app.get('/api/stats', (req, res) => {
+  const stats = StatsCounters.snapshot();
+  const avgProcessTime = stats.avgProcessingMs !== null ? stats.avgProcessingMs / 1000 : 12.3;
+
+  res.set('Cache-Control', 'public, max-age=10');
+  res.json({
+    tracksProcessedToday: stats.tracksProcessedToday,
+    aiAccuracy: 99.7,
+    avgProcessTime: Number(avgProcessTime.toFixed(1)),
+    serverStatus: 'Optimal',
+    currentUsers: connectedUsers
+  });
 });
 
 // Upload endpoint
 app.post('/api/upload', upload.single('audio'), async (req, res) => {
+  // Set while this upload holds a quota slot it hasn't used yet
+  let quotaReservedAt = null;
+  const releaseQuota = () => {
+    if (quotaReservedAt) UsageCounters.release(req.apiUser._id, quotaReservedAt);
+    quotaReservedAt = null;
+  };
+
   try {
     if (!req.file) {
       return res.status(400).json({ error: 'No audio file provided' });
@@ -221,13 +297,35 @@ app.post('/api/upload', upload.single('audio'), async (req, res) => {
 
     console.log(`📤 Uploaded file: ${req.file.originalname} (${req.file.size} bytes)`);
 
+    // Optional `formats` field: "mp3" or "wav,mp3,flac"; the first is the primary output
+    const formats = parseFormats(req.body && req.body.formats);
+    if (formats === null) {
+      return res.status(400).json({
+        error: `formats must be a comma-separated list of: ${Object.keys(AudioProcessor.OUTPUT_CODECS).join(', ')}`
+      });
+    }
+
+    // API clients are held to their tier's daily track quota. The track is
+    // counted as soon as it passes, so concurrent uploads see each other.
+    if (req.apiUser) {
+      const reservedAt = new Date();
+      if (!(await UsageCounters.reserve(req.apiUser._id, req.apiUser.subscription.tier, reservedAt))) {
+        return res.status(429).json({ error: 'Daily track limit reached for your plan' });
+      }
+      quotaReservedAt = reservedAt;
+    }
+
+    const lane = JobScheduler.laneFor(req.apiUser && req.apiUser.subscription.tier);
     const jobData = {
+      userId: req.apiUser ? req.apiUser._id : undefined,
+      priority: lane,
       filename: req.file.filename,
       originalName: req.file.originalname,
       fileSize: req.file.size,
       status: 'uploaded',
       progress: 0,
       originalPath: req.file.path,
+      fileHash: await RenderCache.hashFile(req.file.path),
       createdAt: new Date()
     };
 
@@ -235,32 +333,85 @@ app.post('/api/upload', upload.single('audio'), async (req, res) => {
     let job;
     if (mongoose.connection.readyState === 1) {
       job = new ProcessingJob(jobData);
+      job.previewDuration = await previewLimitFor(job);
+      if (formats.length > 0) {
+        const limit = await outputFormatLimitFor(job);
+        if (formats.length > limit) {
+          releaseQuota();
+          return res.status(403).json({ error: `Your plan can render ${limit} format(s) per upload` });
+        }
+        job.processingSettings.outputFormat = formats[0];
+        job.processingSettings.extraFormats = formats.slice(1);
+      }
       await job.save();
     } else {
-      job = { _id: uuidv4(), ...jobData };
+      if (formats.length > 1) {
+        releaseQuota();
+        return res.status(503).json({ error: 'Multi-format output needs the database' });
+      }
+      job = {
+        _id: uuidv4(),
+        ...jobData,
+        processingSettings: formats.length > 0 ? { outputFormat: formats[0] } : undefined
+      };
     }
 
-    // Start async processing (mocked here)
-    processAudioFile(job._id, req.file.path, req.file.originalname, io);
+    // Accepted: the reserved track stays counted
+    quotaReservedAt = null;
+
+    // Queue for processing; the scheduler shares worker slots fairly across
+    // users and tiers (see JobScheduler)
+    const settings = {
+      outputFormat: job.processingSettings && job.processingSettings.outputFormat,
+      extraFormats: job.processingSettings && job.processingSettings.extraFormats,
+      censorMode: job.processingSettings && job.processingSettings.censorMode,
+      previewDuration: job.previewDuration,
+      profile: EtaModel.profileFor({
+        originalName: req.file.originalname,
+        fileSize: req.file.size,
+        previewDuration: job.previewDuration
+      })
+    };
+    const cost = EtaModel.total(settings.profile);
+    const queuePosition = JobScheduler.submit({
+      id: job._id,
+      lane,
+      user: jobData.userId,
+      cost,
+      run: () => processAudioFile(job._id, req.file.path, req.file.originalname, io, settings)
+    });
+
+    // Queued jobs wait for a slot first; running ones update this per stage
+    const estimatedTimeRemaining = Math.round(JobScheduler.expectedWait(job._id) + cost);
+    if (queuePosition > 0 && mongoose.connection.readyState === 1) {
+      ProcessingJob.updateOne({ _id: job._id }, { estimatedTimeRemaining })
+        .catch(error => console.error('ETA update error:', error.message));
+    }
 
     res.json({
       success: true,
       jobId: job._id,
-      message: 'Upload successful, processing started'
+      queuePosition,
+      estimatedTimeRemaining,
+      message: queuePosition === 0 ? 'Upload successful, processing started' : 'Upload successful, queued for processing'
     });
   } catch (err) {
+    releaseQuota();
     console.error('Upload failed:', err);
     res.status(500).json({ error: 'Upload failed', message: err.message });
   }
 });
 
-// Status endpoint
+// Status endpoint. Polled while a job runs, so it reads only these fields of
+// the job document; the waveform is fetched once from /api/jobs/:jobId/waveform.
 app.get('/api/status/:jobId', async (req, res) => {
   try {
     if (mongoose.connection.readyState !== 1) {
       return res.status(503).json({ error: 'Database unresponsive' });
     }
-    const job = await ProcessingJob.findById(req.params.jobId);
+    const job = await ProcessingJob.findById(req.params.jobId)
+      .select('status progress currentStage estimatedTimeRemaining detectedLanguages previewUrl')
+      .lean();
     if (!job) {
       return res.status(404).json({ error: 'Job not found' });
     }
@@ -268,9 +419,9 @@ app.get('/api/status/:jobId', async (req, res) => {
       status: job.status,
       progress: job.progress,
       stage: job.currentStage,
-      estimatedTime: job.estimatedTime,
+      estimatedTime: job.estimatedTimeRemaining,
       languages: job.detectedLanguages,
-      waveformData: job.waveformData,
+      waveformUrl: job.status === 'completed' ? `/api/jobs/${req.params.jobId}/waveform` : null,
       previewUrl: job.previewUrl
     });
   } catch (err) {
@@ -279,6 +430,448 @@ app.get('/api/status/:jobId', async (req, res) => {
   }
 });
 
+// Waveform points and peaks from the analysis pass
+app.get('/api/jobs/:jobId/waveform', async (req, res) => {
+  try {
+    if (mongoose.connection.readyState !== 1) {
+      return res.status(503).json({ error: 'Database unresponsive' });
+    }
+    if (!mongoose.Types.ObjectId.isValid(req.params.jobId)) {
+      return res.status(404).json({ error: 'Waveform not available' });
+    }
+    const waveform = await JobDetail.get(req.params.jobId, 'waveform');
+    if (!waveform) {
+      return res.status(404).json({ error: 'Waveform not available' });
+    }
+    res.set('Cache-Control', 'private, max-age=3600');
+    res.json(waveform);
+  } catch (err) {
+    console.error('Waveform fetch error:', err);
+    res.status(500).json({ error: 'Failed to get waveform' });
+  }
+});
+
+// Spectrogram layout for a job: bins, frame duration and tile count. Tiles are
+// computed on demand from the decoded source, so any fftSize/hopSize/window works.
+app.get('/api/jobs/:jobId/spectrogram', async (req, res) => {
+  try {
+    const options = spectrogramOptions(req.query);
+    if (options.error) {
+      return res.status(400).json({ error: options.error });
+    }
+    const pcmPath = JobArtifacts.forJob(req.params.jobId).sourcePcmPath;
+    if (!fs.existsSync(pcmPath)) {
+      return res.status(404).json({ error: 'Spectrogram not available' });
+    }
+
+    const format = PcmRenderer.FORMAT;
+    const settings = { ...Spectrogram.DEFAULTS, ...options };
+    const samples = fs.statSync(pcmPath).size / PcmRenderer.bytesPerFrame(format);
+    const frames = samples < settings.fftSize ? 0 : Math.floor((samples - settings.fftSize) / settings.hopSize) + 1;
+
+    res.set('Cache-Control', 'private, max-age=3600');
+    res.json({
+      sampleRate: format.sampleRate,
+      fftSize: settings.fftSize,
+      hopSize: settings.hopSize,
+      windowFunction: settings.windowFunction,
+      bins: settings.fftSize / 2 + 1,
+      binHz: format.sampleRate / settings.fftSize,
+      tileFrames: settings.tileFrames,
+      floorDb: settings.floorDb,
+      frames,
+      tiles: Math.ceil(frames / settings.tileFrames),
+      frameDuration: settings.hopSize / format.sampleRate
+    });
+  } catch (err) {
+    console.error('Spectrogram error:', err);
+    res.status(500).json({ error: 'Failed to describe spectrogram' });
+  }
+});
+
+// One spectrogram tile: uint8, frame-major (frames x bins)
+app.get('/api/jobs/:jobId/spectrogram/:tile', async (req, res) => {
+  try {
+    const options = spectrogramOptions(req.query);
+    const index = Number(req.params.tile);
+    if (options.error || !Number.isInteger(index) || index < 0) {
+      return res.status(400).json({ error: options.error || 'Invalid tile index' });
+    }
+    const pcmPath = JobArtifacts.forJob(req.params.jobId).sourcePcmPath;
+    if (!fs.existsSync(pcmPath)) {
+      return res.status(404).json({ error: 'Spectrogram not available' });
+    }
+
+    const tile = await WaveformGenerator.spectrogramTile(pcmPath, PcmRenderer.FORMAT, index, options);
+    if (!tile) {
+      return res.status(404).json({ error: 'Tile not found' });
+    }
+
+    res.set({
+      'Content-Type': 'application/octet-stream',
+      'Cache-Control': 'private, max-age=3600',
+      'X-Spectrogram-Bins': tile.bins,
+      'X-Spectrogram-Frames': tile.frames,
+      'X-Spectrogram-Start-Time': tile.startTime
+    });
+    res.send(Buffer.from(tile.data.buffer, tile.data.byteOffset, tile.data.length));
+  } catch (err) {
+    console.error('Spectrogram tile error:', err);
+    res.status(500).json({ error: 'Failed to render spectrogram tile' });
+  }
+});
+
+// Peaks or onsets between two times (seconds), from the index built during
+// analysis. Times are absolute, so the frontend can snap edits to them directly.
+app.get('/api/jobs/:jobId/peaks', async (req, res) => {
+  try {
+    const type = req.query.type || 'peaks';
+    if (!['peaks', 'onsets'].includes(type)) {
+      return res.status(400).json({ error: 'type must be peaks or onsets' });
+    }
+    const start = req.query.start !== undefined ? Number(req.query.start) : 0;
+    const end = req.query.end !== undefined ? Number(req.query.end) : Infinity;
+    const limit = Math.min(Number(req.query.limit) || 1000, 10000);
+    if (!Number.isFinite(start) || Number.isNaN(end) || start < 0 || end < start) {
+      return res.status(400).json({ error: 'start and end must be seconds with start <= end' });
+    }
+
+    const index = await JobArtifacts.forJob(req.params.jobId).loadTransients(type);
+    if (!index) {
+      return res.status(404).json({ error: 'Peaks not available' });
+    }
+
+    const events = index.range(start, end, limit);
+    res.json({
+      type,
+      start,
+      end: Number.isFinite(end) ? end : null,
+      total: index.count(start, end),
+      events
+    });
+  } catch (err) {
+    console.error('Peaks error:', err);
+    res.status(500).json({ error: 'Failed to get peaks' });
+  }
+});
+
+// Re-clean a processed job after a lexicon update or with new custom words.
+// Reuses the stored transcript and decoded audio; only changed ranges are re-rendered.
+app.post('/api/jobs/:jobId/reclean', async (req, res) => {
+  try {
+    // Rewrites the job's settings and outputs, so only its owner may call it
+    if (!req.apiUser) {
+      return res.status(401).json({ error: 'Re-cleaning needs an API key' });
+    }
+    if (mongoose.connection.readyState !== 1) {
+      return res.status(503).json({ error: 'Database unresponsive' });
+    }
+    if (!mongoose.Types.ObjectId.isValid(req.params.jobId)) {
+      return res.status(404).json({ error: 'Job not found' });
+    }
+    const job = await ProcessingJob.findById(req.params.jobId)
+      .select('userId status originalPath fileHash processingSettings outputs previewPath previewDuration');
+    if (!job || String(job.userId) !== String(req.apiUser._id)) {
+      return res.status(404).json({ error: 'Job not found' });
+    }
+    if (job.status !== 'completed') {
+      return res.status(409).json({ error: 'Job has not finished processing' });
+    }
+
+    const { customWords, censorMode } = req.body;
+    if (customWords !== undefined && (!Array.isArray(customWords) || customWords.some(word => typeof word !== 'string'))) {
+      return res.status(400).json({ error: 'customWords must be an array of strings' });
+    }
+    if (censorMode !== undefined && !PcmRenderer.MODES.includes(censorMode)) {
+      return res.status(400).json({ error: `censorMode must be one of: ${PcmRenderer.MODES.join(', ')}` });
+    }
+    if (customWords) {
+      job.processingSettings.customWords = customWords;
+    }
+    if (censorMode) {
+      job.processingSettings.censorMode = censorMode;
+    }
+
+    const result = await CleanPipeline.reclean(job.toPipelineJob());
+
+    const { timestamps: profanityTimestamps, ...profanityResults } = result.profanity;
+    job.profanityResults = profanityResults;
+    job.muteMask = result.mask;
+    job.maskVersion = result.maskVersion;
+    job.outputPath = result.outputPath;
+    job.outputs = result.outputs;
+    if (result.previewPath) {
+      job.previewPath = result.previewPath;
+      job.previewUrl = `/uploads/previews/${path.basename(result.previewPath)}`;
+    }
+    await Promise.all([job.save(), JobDetail.put(job._id, 'profanity-timestamps', profanityTimestamps)]);
+
+    res.json({
+      success: true,
+      maskVersion: result.maskVersion,
+      changedRanges: result.changedRanges,
+      profanityCount: result.profanity.count
+    });
+  } catch (err) {
+    console.error('Re-clean error:', err);
+    res.status(500).json({ error: 'Re-clean failed', message: err.message });
+  }
+});
+
+// Bulk submission for label and DJ pool accounts (API key, DJ Pro or Studio
+// Elite). The body is either multipart with many `audio` files, a tar stream
+// (application/x-tar) or a zip (application/zip); `formats` and `name` come
+// from form fields or the query string. Identical files share one job.
+app.post('/api/batches', async (req, res) => {
+  const user = batchUser(req, res);
+  if (!user) return;
+  if (mongoose.connection.readyState !== 1) {
+    return res.status(503).json({ error: 'Database unresponsive' });
+  }
+
+  let files = [];
+  try {
+    files = await receiveBatchFiles(req, res);
+    if (files.length === 0) {
+      return res.status(400).json({ error: 'No audio files in the submission' });
+    }
+
+    const fields = { ...req.query, ...(req.body || {}) };
+    const formats = parseFormats(fields.formats);
+    if (formats === null) {
+      await removeFiles(files);
+      return res.status(400).json({
+        error: `formats must be a comma-separated list of: ${Object.keys(AudioProcessor.OUTPUT_CODECS).join(', ')}`
+      });
+    }
+
+    const batch = await createBatch(user, files, {
+      name: fields.name ? String(fields.name).slice(0, 200) : undefined,
+      outputFormat: formats[0],
+      extraFormats: formats.slice(1)
+    });
+
+    res.status(202).json({
+      success: true,
+      batchId: batch._id,
+      total: batch.counts.total,
+      jobs: batch.counts.jobs,
+      reused: batch.counts.reused,
+      duplicates: batch.counts.total - batch.counts.jobs,
+      statusUrl: `/api/batches/${batch._id}`,
+      archiveUrl: `/api/batches/${batch._id}/archive`
+    });
+  } catch (err) {
+    await removeFiles(files);
+    console.error('Batch submission failed:', err);
+    const tooLarge = err.code && String(err.code).startsWith('LIMIT_');
+    res.status(err.status || (tooLarge ? 413 : 500)).json({ error: 'Batch submission failed', message: err.message });
+  }
+});
+
+// Aggregate progress of a batch; `?entries=true` also lists each file's job
+app.get('/api/batches/:batchId', async (req, res) => {
+  const user = batchUser(req, res);
+  if (!user) return;
+
+  try {
+    const batch = await findBatch(req, res, user, req.query.entries === 'true' ? '' : '-entries');
+    if (!batch) return;
+
+    const { progress, statuses } = await BatchJob.progress(batch);
+    res.json({
+      batchId: batch._id,
+      name: batch.name,
+      status: batch.status,
+      progress,
+      counts: batch.counts,
+      statuses,
+      createdAt: batch.createdAt,
+      completedAt: batch.completedAt,
+      archiveUrl: `/api/batches/${batch._id}/archive`,
+      entries: batch.entries && batch.entries.map(entry => ({
+        name: entry.name,
+        jobId: entry.job,
+        duplicate: Boolean(entry.duplicate)
+      }))
+    });
+  } catch (err) {
+    console.error('Batch status error:', err);
+    res.status(500).json({ error: 'Failed to get batch status' });
+  }
+});
+
+// One zip of the batch's cleaned outputs, streamed as jobs finish: each
+// output is added as soon as its job completes (the response stays open
+// until the last one), followed by manifest.json with every entry's outcome
+app.get('/api/batches/:batchId/archive', async (req, res) => {
+  const user = batchUser(req, res);
+  if (!user) return;
+
+  let batch;
+  try {
+    batch = await findBatch(req, res, user, 'name entries');
+    if (!batch) return;
+  } catch (err) {
+    console.error('Batch archive error:', err);
+    return res.status(500).json({ error: 'Failed to build archive' });
+  }
+
+  const namesByJob = new Map();
+  for (const entry of batch.entries) {
+    const id = String(entry.job);
+    if (!namesByJob.has(id)) namesByJob.set(id, []);
+    namesByJob.get(id).push(entry.name);
+  }
+
+  let closed = false;
+  res.on('close', () => { closed = true; });
+  res.set({
+    'Content-Type': 'application/zip',
+    'Content-Disposition': `attachment; filename="${archiveBaseName(batch.name || `batch-${batch._id}`)}.zip"`
+  });
+
+  const zip = new ZipWriter(res);
+  const used = new Set();
+  const manifest = [];
+  const pending = new Set(namesByJob.keys());
+
+  try {
+    while (pending.size > 0 && !closed) {
+      const finished = await ProcessingJob.find({
+        _id: { $in: [...pending] },
+        status: { $in: ['completed', 'failed'] }
+      }).limit(50);
+
+      for (const job of finished) {
+        if (closed) break;
+        const id = String(job._id);
+        pending.delete(id);
+        const names = namesByJob.get(id);
+
+        const output = job.status === 'completed' ? await jobOutput(job).catch(error => error) : null;
+        for (const name of names) {
+          if (!output || output instanceof Error) {
+            manifest.push({ name, jobId: id, status: 'failed', error: output ? output.message : job.error });
+            continue;
+          }
+          const file = uniqueArchiveName(name, output.path, used);
+          await zip.addFile(file, output.path);
+          manifest.push({ name, jobId: id, status: 'completed', file });
+        }
+      }
+
+      if (pending.size > 0 && finished.length === 0) {
+        await new Promise(resolve => setTimeout(resolve, BATCH_ARCHIVE_POLL_MS));
+      }
+    }
+
+    if (!closed) {
+      await zip.addBuffer('manifest.json', Buffer.from(JSON.stringify(manifest, null, 2)));
+      await zip.finish();
+      res.end();
+    }
+  } catch (err) {
+    console.error('Batch archive error:', err);
+    res.destroy(err);
+  }
+});
+
+// One zip (stored entries) of selected completed, paid outputs:
+// ?jobs=<id>,<id>[&format=wav][&name=...]. The archive's layout is fixed up
+// front from the output files' sizes, so the response has an exact
+// Content-Length and an ETag, and a single Range (with If-Range) resumes
+// an interrupted download. Nothing is staged on disk.
+app.get('/api/exports', async (req, res) => {
+  try {
+    if (mongoose.connection.readyState !== 1) {
+      return res.status(503).json({ error: 'DB unavailable' });
+    }
+
+    const ids = [...new Set(String(req.query.jobs || '').split(',').map(id => id.trim()).filter(Boolean))];
+    if (ids.length === 0 || ids.length > EXPORT_MAX_JOBS || !ids.every(id => mongoose.Types.ObjectId.isValid(id))) {
+      return res.status(400).json({ error: `jobs must be a comma-separated list of 1 to ${EXPORT_MAX_JOBS} job IDs` });
+    }
+    const format = req.query.format ? String(req.query.format).toLowerCase() : null;
+    if (format && !AudioProcessor.OUTPUT_CODECS[format]) {
+      return res.status(400).json({ error: `format must be one of: ${Object.keys(AudioProcessor.OUTPUT_CODECS).join(', ')}` });
+    }
+
+    // API key users can only export their own jobs
+    const query = { _id: { $in: ids } };
+    if (req.apiUser) query.userId = req.apiUser._id;
+    const jobs = new Map((await ProcessingJob.find(query)).map(job => [String(job._id), job]));
+
+    const unavailable = ids.filter(id => !jobs.has(id) || jobs.get(id).status !== 'completed');
+    if (unavailable.length > 0) {
+      return res.status(403).json({ error: 'File not ready', jobs: unavailable });
+    }
+    const unpaid = ids.filter(id => !jobs.get(id).isPaid);
+    if (unpaid.length > 0) {
+      return res.status(403).json({ error: 'Payment required', jobs: unpaid });
+    }
+
+    const used = new Set();
+    const files = [];
+    for (const id of ids) {
+      const job = jobs.get(id);
+      const output = await jobOutput(job, format || undefined).catch(() => null);
+      if (!output) {
+        return res.status(404).json({ error: 'File not found', jobs: [id] });
+      }
+      files.push({ name: uniqueArchiveName(job.originalName, output.path, used), path: output.path });
+    }
+
+    const layout = await ZipWriter.layout(files);
+    const etag = `"${layout.etag}"`;
+    res.set({
+      'Content-Type': 'application/zip',
+      'Content-Disposition': `attachment; filename="${archiveBaseName(req.query.name || 'fwea-export')}.zip"`,
+      'Accept-Ranges': 'bytes',
+      'ETag': etag,
+      'Cache-Control': 'private, no-cache'
+    });
+    if (req.fresh) {
+      return res.status(304).end();
+    }
+
+    let start = 0;
+    let end = layout.size - 1;
+    const ifRange = req.get('If-Range');
+    if (req.get('Range') && (!ifRange || ifRange === etag)) {
+      const ranges = req.range(layout.size, { combine: true });
+      if (ranges === -1) {
+        res.set('Content-Range', `bytes */${layout.size}`);
+        return res.status(416).end();
+      }
+      // Malformed or multiple ranges get the whole archive
+      if (Array.isArray(ranges) && ranges.type === 'bytes' && ranges.length === 1) {
+        ({ start, end } = ranges[0]);
+        res.status(206).set('Content-Range', `bytes ${start}-${end}/${layout.size}`);
+      }
+    }
+
+    res.set('Content-Length', String(end - start + 1));
+    if (req.method === 'HEAD') {
+      return res.end();
+    }
+
+    let closed = false;
+    res.on('close', () => { closed = true; });
+    try {
+      await ZipWriter.writeRange(res, layout, start, end);
+      res.end();
+    } catch (err) {
+      if (!closed) console.error('Export stream error:', err);
+      res.destroy(err);
+    }
+  } catch (err) {
+    console.error('Export error:', err);
+    if (res.headersSent) return res.destroy(err);
+    res.status(500).json({ error: 'Export failed' });
+  }
+});
+
 // Payment intent creation
 app.post('/api/create-payment-intent', async (req, res) => {
   try {
@@ -307,10 +900,13 @@ app.get('/api/download/:jobId', async (req, res) => {
     if (!job.isPaid) {
       return res.status(403).json({ error: 'Payment required' });
     }
-    if (!fs.existsSync(job.outputPath)) {
+    // Rendered on first download (or after payment); cached renders are reused
+    const output = await jobOutput(job, req.query.format || undefined).catch(() => null);
+    if (!output) {
       return res.status(404).json({ error: 'File not found' });
     }
-    res.download(job.outputPath, `cleaned_${job.originalName}`);
+    const name = path.basename(job.originalName, path.extname(job.originalName));
+    res.download(output.path, `cleaned_${name}${path.extname(output.path)}`);
   } catch (err) {
     console.error('Download error:', err);
     res.status(500).json({ error: 'Download failed' });
@@ -341,67 +937,540 @@ app.use((err, req, res, next) => {
 });
 
 // Audio processing pipeline
-async function processAudioFile(jobId, filePath, originalName, io) {
-  console.log(`🎵 Processing job ${jobId} for file: ${originalName}`);
+// Progress and time remaining come from EtaModel
+const PROCESSING_STAGES = {
+  'analyzing': { description: 'Analyzing audio...' },
+  'language-detection': { description: 'Detecting languages...' },
+  'content-scanning': { description: 'Scanning content...' },
+  'processing': { description: 'Filtering audio...' },
+  'preview': { description: 'Preparing preview...' }
+};
 
-  const stages = [
-    { stage: 'analyzing', progress: 15, description: 'Analyzing audio...', delay: 2000 },
-    { stage: 'language-detection', progress: 35, description: 'Detecting languages...', delay: 3000 },
-    { stage: 'content-scanning', progress: 55, description: 'Scanning content...', delay: 4000 },
-    { stage: 'processing', progress: 75, description: 'Filtering audio...', delay: 3000 },
-    { stage: 'preview', progress: 90, description: 'Preparing preview...', delay: 2000 },
-    { stage: 'completed', progress: 100, description: 'Audio ready!', delay: 1000 }
-  ];
+function parseFormats(value) {
+  if (value === undefined || value === '') return [];
+  const formats = [...new Set(String(value).split(',').map(format => format.trim().toLowerCase()))];
+  return formats.every(format => AudioProcessor.OUTPUT_CODECS[format]) ? formats : null;
+}
+
+// fftSize / hopSize / window from a spectrogram query; anything omitted uses the defaults
+function spectrogramOptions(query) {
+  const options = {};
+  if (query.fftSize !== undefined) {
+    const fftSize = Number(query.fftSize);
+    if (!Number.isInteger(fftSize) || fftSize < 256 || fftSize > 8192 || (fftSize & (fftSize - 1)) !== 0) {
+      return { error: 'fftSize must be a power of two between 256 and 8192' };
+    }
+    options.fftSize = fftSize;
+  }
+  const fftSize = options.fftSize || Spectrogram.DEFAULTS.fftSize;
+  if (query.hopSize !== undefined) {
+    const hopSize = Number(query.hopSize);
+    if (!Number.isInteger(hopSize) || hopSize < 64 || hopSize > fftSize) {
+      return { error: `hopSize must be an integer between 64 and ${fftSize}` };
+    }
+    options.hopSize = hopSize;
+  } else if (options.fftSize) {
+    options.hopSize = fftSize / 4;
+  }
+  if (query.window !== undefined) {
+    if (!FFT.WINDOWS[query.window]) {
+      return { error: `window must be one of: ${Object.keys(FFT.WINDOWS).join(', ')}` };
+    }
+    options.windowFunction = query.window;
+  }
+  return options;
+}
+
+// Formats per upload for the job owner's tier (anonymous uploads get one)
+async function outputFormatLimitFor(job) {
+  if (job.userId) {
+    const user = await User.findById(job.userId).select('subscription');
+    if (user) return user.getOutputFormatLimit();
+  }
+  return 1;
+}
+
+// Preview length in seconds for the job owner's tier (anonymous uploads get the default)
+async function previewLimitFor(job) {
+  if (job.userId) {
+    const user = await User.findById(job.userId).select('subscription');
+    if (user) return user.getPreviewLimit();
+  }
+  return job.previewDuration || CleanPipeline.DEFAULT_PREVIEW_DURATION;
+}
+
+// Loudness (EBU R128) and waveform from the pipeline's analysis pass, in
+// ProcessingJob's audioAnalysis shape and the waveform JobDetail's
+function analysisFields(result) {
+  if (!result.analysis) return {};
+  const { loudness, waveform } = result.analysis;
+
+  return {
+    audioAnalysis: {
+      duration: loudness.duration,
+      sampleRate: result.metadata.sampleRate,
+      bitrate: Number(result.metadata.bitrate) || undefined,
+      channels: loudness.truePeak.length,
+      format: result.metadata.format,
+      loudness: loudness.integrated,
+      dynamicRange: loudness.loudnessRange,
+      peakLevels: loudness.truePeak,
+      rmsLevels: loudness.rms
+    },
+    // Stored as the job's 'waveform' JobDetail, not on the job document
+    waveform: {
+      data: waveform.data,
+      width: waveform.width,
+      height: waveform.height,
+      samples: waveform.samples,
+      peaks: waveform.peaks,
+      generatedAt: new Date()
+    }
+  };
+}
+
+// The API user allowed to submit batches, or null after responding
+function batchUser(req, res) {
+  const user = req.apiUser;
+  if (!user) {
+    res.status(401).json({ error: 'Batch processing needs an API key' });
+    return null;
+  }
+  if (!BATCH_TIERS.includes(user.subscription.tier) || !BATCH_SUBSCRIPTION_STATUSES.includes(user.subscription.status)) {
+    res.status(403).json({ error: 'Batch processing needs an active DJ Pro or Studio Elite subscription' });
+    return null;
+  }
+  return user;
+}
+
+async function findBatch(req, res, user, fields) {
+  if (!mongoose.Types.ObjectId.isValid(req.params.batchId)) {
+    res.status(404).json({ error: 'Batch not found' });
+    return null;
+  }
+  const batch = await BatchJob.findById(req.params.batchId).select(`userId ${fields}`).lean();
+  if (!batch || String(batch.userId) !== String(user._id)) {
+    res.status(404).json({ error: 'Batch not found' });
+    return null;
+  }
+  return batch;
+}
+
+async function userTier(userId) {
+  const user = await User.findById(userId).select('subscription.tier').lean();
+  return user ? user.subscription.tier : null;
+}
+
+// Saves every audio file of a batch submission under uploads/:
+// [{ name, filename, path, size, hash }]
+async function receiveBatchFiles(req, res) {
+  if (parseInt(req.get('Content-Length'), 10) > BATCH_MAX_BYTES) {
+    throw batchTooLarge();
+  }
+
+  if (req.is('multipart/form-data')) {
+    await new Promise((resolve, reject) => {
+      batchUpload.array('audio', BATCH_MAX_FILES)(req, res, error => (error ? reject(error) : resolve()));
+    });
+    const files = [];
+    for (const file of req.files || []) {
+      files.push({
+        name: file.originalname,
+        filename: file.filename,
+        path: file.path,
+        size: file.size,
+        hash: await RenderCache.hashFile(file.path)
+      });
+    }
+    return files;
+  }
+
+  const files = [];
+  const onEntry = async (name, stream) => {
+    if (!BATCH_AUDIO_EXTENSION.test(path.extname(name).toLowerCase())) return;
+    if (files.length >= BATCH_MAX_FILES) {
+      throw Object.assign(new Error(`A batch can hold at most ${BATCH_MAX_FILES} files`), { status: 413 });
+    }
+    files.push(await saveBatchEntry(name, stream));
+  };
 
   try {
-    for (const s of stages) {
-      await new Promise(r => setTimeout(r, s.delay));
-
-      if (mongoose.connection.readyState === 1) {
-        await ProcessingJob.findByIdAndUpdate(jobId, {
-          status: s.stage,
-          progress: s.progress,
-          currentStage: s.stage,
-          stageDescription: s.description,
-          lastUpdated: new Date()
-        });
+    if (req.is('application/x-tar')) {
+      await ArchiveReader.extractTar(pipeline(req, batchByteLimit(), () => {}), onEntry);
+    } else if (req.is('application/zip')) {
+      // Zip's index is at the end: spool it first
+      const spooled = path.join('uploads', `${uuidv4()}.upload.zip`);
+      try {
+        await new Promise((resolve, reject) => pipeline(
+          req, batchByteLimit(), fs.createWriteStream(spooled), error => (error ? reject(error) : resolve())));
+        await ArchiveReader.extractZip(spooled, onEntry);
+      } finally {
+        await fs.promises.rm(spooled, { force: true });
+      }
+    } else {
+      throw Object.assign(new Error('Send multipart/form-data, application/x-tar or application/zip'), { status: 415 });
+    }
+  } catch (error) {
+    await removeFiles(files);
+    throw error;
+  }
+  return files;
+}
+
+// Passes a batch request body through, failing once it passes BATCH_MAX_BYTES
+function batchByteLimit() {
+  let received = 0;
+  return new Transform({
+    transform(chunk, encoding, callback) {
+      received += chunk.length;
+      if (received > BATCH_MAX_BYTES) return callback(batchTooLarge());
+      callback(null, chunk);
+    }
+  });
+}
+
+function batchTooLarge() {
+  const gigabytes = Number((BATCH_MAX_BYTES / 1024 ** 3).toFixed(2));
+  return Object.assign(new Error(`A batch submission can be at most ${gigabytes}GB`), { status: 413 });
+}
+
+// Writes one archive entry to uploads/, hashing it on the way
+function saveBatchEntry(name, stream) {
+  const extension = path.extname(name).toLowerCase();
+  const filename = `${uuidv4()}${extension}`;
+  const filePath = path.join('uploads', filename);
+  const hash = crypto.createHash('sha256');
+  let size = 0;
+
+  const hasher = new Transform({
+    transform(chunk, encoding, callback) {
+      size += chunk.length;
+      if (size > MAX_UPLOAD_BYTES) {
+        return callback(Object.assign(new Error(`${name} is larger than 100MB`), { status: 413 }));
       }
+      hash.update(chunk);
+      callback(null, chunk);
+    }
+  });
 
-      io.to(`processing-${jobId}`).emit('progress-update', {
-        jobId,
-        stage: s.stage,
-        progress: s.progress,
-        description: s.description,
-        languages: s.stage === 'language-detection' ? ['English', 'Spanish'] : undefined
-      });
+  return new Promise((resolve, reject) => {
+    pipeline(stream, hasher, fs.createWriteStream(filePath), error => {
+      if (error) {
+        fs.promises.rm(filePath, { force: true }).finally(() => reject(error));
+      } else {
+        resolve({ name, filename, path: filePath, size, hash: hash.digest('hex') });
+      }
+    });
+  });
+}
+
+function removeFiles(files) {
+  return Promise.all(files.map(file => fs.promises.rm(file.path, { force: true })));
+}
 
-      console.log(`Progress for job ${jobId}: ${s.stage} (${s.progress}%)`);
+// Creates the BatchJob and its child jobs and starts feeding them to the
+// scheduler. Files with the same content share a job, and so do files the
+// user already had cleaned (completed, paid, same settings).
+async function createBatch(user, files, { name, outputFormat, extraFormats }) {
+  const template = new ProcessingJob({
+    filename: 'template',
+    originalName: 'template',
+    originalPath: 'template',
+    fileSize: 0,
+    processingSettings: { outputFormat, extraFormats }
+  }).processingSettings;
+  const sameSettings = job => job.processingSettings &&
+    job.processingSettings.outputFormat === template.outputFormat &&
+    job.processingSettings.censorMode === template.censorMode &&
+    (job.processingSettings.extraFormats || []).join(',') === (template.extraFormats || []).join(',');
+
+  const hashes = [...new Set(files.map(file => file.hash))];
+  const earlier = await ProcessingJob.find({
+    userId: user._id,
+    fileHash: { $in: hashes },
+    status: 'completed',
+    isPaid: true
+  }).select('fileHash processingSettings').lean();
+
+  const jobByHash = new Map();
+  for (const job of earlier) {
+    if (sameSettings(job) && !jobByHash.has(job.fileHash)) jobByHash.set(job.fileHash, { id: job._id, reused: true });
+  }
+  const reused = jobByHash.size;
+
+  const batchId = new mongoose.Types.ObjectId();
+  const lane = JobScheduler.laneFor(user.subscription.tier);
+  const children = [];
+  const entries = [];
+  const redundant = [];
+
+  for (const file of files) {
+    const existing = jobByHash.get(file.hash);
+    if (existing) {
+      entries.push({ name: file.name, job: existing.id, duplicate: true });
+      redundant.push(file);
+      continue;
     }
 
-    if (mongoose.connection.readyState === 1) {
+    const child = new ProcessingJob({
+      userId: user._id,
+      batchId,
+      priority: lane,
+      isPaid: true,
+      filename: file.filename,
+      originalName: path.basename(file.name),
+      fileSize: file.size,
+      originalPath: file.path,
+      fileHash: file.hash,
+      status: 'uploaded',
+      progress: 0,
+      previewDuration: CleanPipeline.DEFAULT_PREVIEW_DURATION,
+      processingSettings: { outputFormat, extraFormats }
+    });
+    children.push(child);
+    jobByHash.set(file.hash, { id: child._id, reused: false });
+    entries.push({ name: file.name, job: child._id, duplicate: false });
+  }
+
+  await ProcessingJob.insertMany(children);
+  const batch = await BatchJob.create({
+    _id: batchId,
+    userId: user._id,
+    name,
+    status: children.length > 0 ? 'processing' : 'completed',
+    completedAt: children.length > 0 ? undefined : new Date(),
+    settings: { outputFormat: template.outputFormat, extraFormats: template.extraFormats, censorMode: template.censorMode },
+    entries,
+    counts: {
+      total: files.length,
+      jobs: children.length + reused,
+      reused,
+      completed: reused,
+      failed: 0
+    }
+  });
+
+  await removeFiles(redundant);
+  if (children.length > 0) {
+    UsageCounters.record(user._id, children.length);
+    BatchRunner.start({ _id: batch._id, userId: user._id, tier: user.subscription.tier }, children, runStoredJob);
+  }
+  console.log(`📦 Batch ${batch._id}: ${files.length} file(s), ${children.length} new job(s), ${reused} reused`);
+  return batch;
+}
+
+// The scheduler's queue lives in memory, so a restart drops every single
+// upload still waiting in it. Queues the ones that never started again and
+// fails those that were mid-processing, as BatchRunner.resume() does for
+// batch children.
+async function resumeUploads() {
+  const interruptedStatuses = ['analyzing', 'language-detection', 'content-scanning', 'processing', 'preview'];
+  const jobs = await ProcessingJob.find({ batchId: null, status: { $in: ['uploaded', ...interruptedStatuses] } })
+    .select('status userId priority originalName fileSize previewDuration')
+    .sort({ createdAt: 1 })
+    .lean();
+
+  const interrupted = jobs.filter(job => job.status !== 'uploaded' && !JobScheduler.has(job._id));
+  if (interrupted.length > 0) {
+    await ProcessingJob.updateMany(
+      { _id: { $in: interrupted.map(job => job._id) }, status: { $in: interruptedStatuses } },
+      { status: 'failed', error: 'Interrupted by a server restart' }
+    );
+  }
+
+  const pending = jobs.filter(job => job.status === 'uploaded' && !JobScheduler.has(job._id));
+  for (const job of pending) {
+    JobScheduler.submit({
+      id: job._id,
+      lane: job.priority,
+      user: job.userId,
+      cost: EtaModel.total(EtaModel.profileFor(job)),
+      run: () => runStoredJob(job._id)
+    });
+  }
+  if (pending.length > 0 || interrupted.length > 0) {
+    console.log(`📤 Resumed ${pending.length} upload(s), ${interrupted.length} interrupted`);
+  }
+}
+
+// Processes a job from its stored record (batch children, uploads resumed
+// after a restart); resolves true when it completed
+async function runStoredJob(jobId) {
+  const job = await ProcessingJob.findById(jobId)
+    .select('originalPath originalName fileSize processingSettings previewDuration')
+    .lean();
+  if (!job) return false;
+
+  return processAudioFile(job._id, job.originalPath, job.originalName, io, {
+    outputFormat: job.processingSettings.outputFormat,
+    extraFormats: job.processingSettings.extraFormats,
+    censorMode: job.processingSettings.censorMode,
+    previewDuration: job.previewDuration,
+    profile: EtaModel.profileFor(job)
+  });
+}
+
+// The job's output in `format` (its primary format by default), rendered
+// now if the post-processing render hasn't produced it yet
+async function jobOutput(job, format = job.processingSettings.outputFormat) {
+  let output = (job.outputs || []).find(candidate => candidate.format === format);
+  if (!output || !fs.existsSync(output.path)) {
+    const outputs = await CleanPipeline.renderJob(job);
+    output = outputs.find(candidate => candidate.format === format);
+  }
+  if (!output || !fs.existsSync(output.path)) {
+    throw new Error('Output could not be rendered');
+  }
+  return output;
+}
+
+function archiveBaseName(name) {
+  return String(name).replace(/[^\w.-]+/g, '_').slice(0, 100) || 'batch';
+}
+
+// "<dir>/cleaned_<name><output extension>", with the submitted folder
+// structure kept (minus anything that would escape it), unique in the archive
+function uniqueArchiveName(name, outputPath, used) {
+  const parts = String(name).split(/[\\/]+/).filter(part => part && part !== '.' && part !== '..');
+  const base = path.basename(parts.pop() || 'track', path.extname(name));
+  const directory = parts.join('/');
+  const extension = path.extname(outputPath);
+
+  let candidate = `${directory ? `${directory}/` : ''}cleaned_${base}${extension}`;
+  for (let i = 2; used.has(candidate); i++) {
+    candidate = `${directory ? `${directory}/` : ''}cleaned_${base} (${i})${extension}`;
+  }
+  used.add(candidate);
+  return candidate;
+}
+
+// Adds a finished job to the analytics rollups; never fails the job
+function recordRollup(job) {
+  JobRollup.recordJob(job).catch(error => console.error('Rollup error:', error.message));
+}
+
+// Runs the clean pipeline for a job; resolves true when it completed
+async function processAudioFile(jobId, filePath, originalName, io, settings = {}) {
+  console.log(`🎵 Processing job ${jobId} for file: ${originalName}`);
+  const startedAt = new Date();
+  const dbReady = () => mongoose.connection.readyState === 1;
+
+  // Each finished stage trains EtaModel; each new one re-estimates the rest
+  const profile = { ...(settings.profile || EtaModel.profileFor({ originalName })) };
+  let currentStage = null;
+  let stageStartedAt = startedAt;
+  let lastProgress = 0;
+
+  const finishStage = (now) => {
+    if (currentStage) EtaModel.record(currentStage, profile, (now - stageStartedAt) / 1000);
+  };
+
+  const onStage = async (stage, details = {}) => {
+    const { description } = PROCESSING_STAGES[stage];
+    const now = new Date();
+    // The real duration arrives with the stage after 'analyzing'; fit that
+    // stage's sample against it, not the file-size guess
+    if (details.duration > 0) profile.duration = details.duration;
+    finishStage(now);
+    currentStage = stage;
+    stageStartedAt = now;
+
+    const estimate = EtaModel.remaining(stage, profile);
+    const progress = lastProgress = Math.max(lastProgress, Math.round(estimate.progress));
+    const estimatedTimeRemaining = Math.round(estimate.remaining);
+
+    if (dbReady()) {
       await ProcessingJob.findByIdAndUpdate(jobId, {
+        status: stage,
+        progress,
+        currentStage: stage,
+        stageDescription: description,
+        estimatedTimeRemaining,
+        lastUpdated: now
+      });
+    }
+
+    io.to(`processing-${jobId}`).emit('progress-update', {
+      jobId,
+      stage,
+      progress,
+      description,
+      estimatedTimeRemaining,
+      languages: details.languages
+    });
+
+    console.log(`Progress for job ${jobId}: ${stage} (${progress}%, ~${estimatedTimeRemaining}s left)`);
+  };
+
+  try {
+    const result = await CleanPipeline.process({
+      id: jobId,
+      originalPath: filePath,
+      outputFormat: settings.outputFormat,
+      extraFormats: settings.extraFormats,
+      customWords: settings.customWords,
+      censorMode: settings.censorMode,
+      previewDuration: settings.previewDuration
+    }, onStage);
+
+    const previewUrl = `/uploads/previews/${path.basename(result.previewPath)}`;
+    const completedAt = new Date();
+    finishStage(completedAt);
+    StatsCounters.recordCompletion(completedAt - startedAt, completedAt);
+
+    if (dbReady()) {
+      const { timestamps: profanityTimestamps, ...profanityResults } = result.profanity;
+      const { audioAnalysis, waveform } = analysisFields(result);
+      await JobDetail.putMany(jobId, { waveform, 'profanity-timestamps': profanityTimestamps });
+
+      const completed = await ProcessingJob.findByIdAndUpdate(jobId, {
         status: 'completed',
         progress: 100,
-        completedAt: new Date(),
-        previewUrl: `/uploads/previews/preview_${path.basename(filePath)}`,
-        outputPath: filePath.replace(/\.([^/.]+)$/, '_clean.$1')
-      });
+        currentStage: 'completed',
+        stageDescription: 'Audio ready!',
+        completedAt,
+        estimatedTimeRemaining: 0,
+        processingStartTime: startedAt,
+        processingEndTime: completedAt,
+        totalProcessingTime: completedAt - startedAt,
+        detectedLanguages: result.transcript.languages.map(language => ({ language })),
+        profanityResults,
+        muteMask: result.mask,
+        maskVersion: result.maskVersion,
+        previewPath: result.previewPath,
+        previewUrl,
+        outputPath: result.outputPath,
+        outputs: result.outputs,
+        speechActivity: result.speech,
+        ...(audioAnalysis ? { audioAnalysis } : {})
+      }, { new: true });
 
-      io.to(`processing-${jobId}`).emit('processing-complete', {
-        jobId,
-        previewUrl: `/uploads/previews/preview_${path.basename(filePath)}`
-      });
+      if (completed) recordRollup(completed);
 
-      console.log(`✅ Job ${jobId} complete!`);
+      // Paid before processing finished: the webhook couldn't render it yet
+      if (completed && completed.isPaid) PaymentService.renderPaidJob(completed);
     }
+
+    io.to(`processing-${jobId}`).emit('processing-complete', { jobId, previewUrl });
+    console.log(`✅ Job ${jobId} complete!`);
+    return true;
   } catch (err) {
     console.error('Error processing job:', err);
 
-    if (mongoose.connection.readyState === 1) {
-      await ProcessingJob.findByIdAndUpdate(jobId, { status: 'failed', error: err.message });
+    if (dbReady()) {
+      const failedAt = new Date();
+      const failed = await ProcessingJob.findByIdAndUpdate(jobId, {
+        status: 'failed',
+        error: err.message,
+        processingStartTime: startedAt,
+        processingEndTime: failedAt,
+        totalProcessingTime: failedAt - startedAt
+      }, { new: true }).catch(() => null);
+      if (failed) recordRollup(failed);
     }
 
     io.to(`processing-${jobId}`).emit('processing-error', { jobId, error: err.message });
+    return false;
   }
 }
 
@@ -417,7 +1486,10 @@ server.listen(PORT, () => {
 // Graceful shutdown
 process.on('SIGTERM', () => {
   console.log('SIGTERM received. Shutting down gracefully...');
-  server.close(() => {
+  server.close(async () => {
+    await StatsCounters.stop().catch(error => console.error('Stats flush error:', error.message));
+    if (RateLimiter.shared) await RateLimiter.shared.stop().catch(() => {});
+    await UsageCounters.stop().catch(error => console.error('Usage flush error:', error.message));
     console.log('Server closed. Exiting process.');
     process.exit(0);
   });
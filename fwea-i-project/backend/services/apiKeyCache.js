@@ -0,0 +1,62 @@
+// API key -> user lookups for the API key middleware, cached in process so
+// an authenticated request doesn't query MongoDB. Entries live for TTL_MS
+// (unknown keys for NEGATIVE_TTL_MS) and concurrent misses for the same key
+// share one query. The User model invalidates a key here when it is rotated
+// or its user's API access or tier changes; other instances pick the change
+// up when their entry expires.
+class ApiKeyCache {
+    static TTL_MS = parseInt(process.env.API_KEY_CACHE_TTL_MS, 10) || 60 * 1000;
+    static NEGATIVE_TTL_MS = 5 * 1000;
+    static MAX_ENTRIES = 10000;
+    static FIELDS = 'subscription.tier subscription.status apiAccess.enabled apiAccess.rateLimit isActive';
+
+    // apiKey -> { user (lean, or null), expiresAt } or { loading: Promise }
+    static entries = new Map();
+
+    // The user owning an enabled API key, or null
+    static async get(apiKey, now = Date.now()) {
+        const entry = ApiKeyCache.entries.get(apiKey);
+        if (entry && entry.loading) return entry.loading;
+        if (entry && entry.expiresAt > now) {
+            // Re-insert so the Map's order stays least recently used first
+            ApiKeyCache.entries.delete(apiKey);
+            ApiKeyCache.entries.set(apiKey, entry);
+            return entry.user;
+        }
+
+        const loading = ApiKeyCache.load(apiKey).then(user => {
+            if (ApiKeyCache.entries.get(apiKey) === pending) {
+                ApiKeyCache.set(apiKey, user);
+            }
+            return user;
+        }, error => {
+            ApiKeyCache.entries.delete(apiKey);
+            throw error;
+        });
+        const pending = { loading };
+        ApiKeyCache.entries.set(apiKey, pending);
+        return loading;
+    }
+
+    static async load(apiKey) {
+        const User = require('../models/User');
+        const user = await User.findByApiKey(apiKey).select(ApiKeyCache.FIELDS).lean();
+        return user && user.isActive !== false ? user : null;
+    }
+
+    static set(apiKey, user) {
+        const ttl = user ? ApiKeyCache.TTL_MS : ApiKeyCache.NEGATIVE_TTL_MS;
+        ApiKeyCache.entries.delete(apiKey);
+        ApiKeyCache.entries.set(apiKey, { user, expiresAt: Date.now() + ttl });
+
+        while (ApiKeyCache.entries.size > ApiKeyCache.MAX_ENTRIES) {
+            ApiKeyCache.entries.delete(ApiKeyCache.entries.keys().next().value);
+        }
+    }
+
+    static invalidate(apiKey) {
+        if (apiKey) ApiKeyCache.entries.delete(apiKey);
+    }
+}
+
+module.exports = ApiKeyCache;
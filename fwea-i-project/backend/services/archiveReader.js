@@ -0,0 +1,230 @@
+const fs = require('fs');
+const { Readable } = require('stream');
+const zlib = require('zlib');
+
+const BLOCK = 512;
+
+// Reads the files out of uploaded tar and zip archives for batch submission.
+// Each regular file is handed to `onEntry(name, stream, size)`; whatever it
+// leaves unread is skipped. Directories, links and other entry types are
+// skipped too.
+//
+// Tar is parsed as it arrives, so an archive never touches disk whole. Zip
+// keeps its index at the end, so it is read from a file: the central
+// directory first, then each entry's data (stored or deflated).
+class ArchiveReader {
+    static async extractTar(input, onEntry) {
+        const reader = new ChunkReader(input);
+        let longName = null;
+        let paxName = null;
+
+        for (;;) {
+            const header = await reader.read(BLOCK);
+            if (!header || header.every(byte => byte === 0)) break;
+
+            const size = parseOctal(header, 124, 12);
+            const type = String.fromCharCode(header[156] || 48);
+            const padded = Math.ceil(size / BLOCK) * BLOCK;
+
+            if (type === 'L' || type === 'x') {
+                // GNU long name / pax header: the name of the next entry
+                const body = await reader.read(padded);
+                if (!body) break;
+                const text = body.subarray(0, size).toString('utf8');
+                if (type === 'L') {
+                    longName = text.replace(/\0.*$/s, '');
+                } else {
+                    const match = /(?:^|\n)\d+ path=([^\n]*)\n/.exec(text);
+                    if (match) paxName = match[1];
+                }
+                continue;
+            }
+
+            const prefix = readString(header, 345, 155);
+            const name = paxName || longName || (prefix ? `${prefix}/${readString(header, 0, 100)}` : readString(header, 0, 100));
+            longName = null;
+            paxName = null;
+
+            if (type === '0' || type === '7') {
+                const stream = reader.stream(size);
+                await onEntry(name, stream, size);
+                // Whatever onEntry left unread, then the padding
+                stream.destroy();
+                await reader.skip(reader.entryLeft + padded - size);
+                reader.entryLeft = 0;
+            } else {
+                await reader.skip(padded);
+            }
+        }
+    }
+
+    static async extractZip(zipPath, onEntry) {
+        const handle = await fs.promises.open(zipPath, 'r');
+        try {
+            const entries = await readCentralDirectory(handle);
+            for (const entry of entries) {
+                if (entry.name.endsWith('/')) continue;
+                if (entry.method !== 0 && entry.method !== 8) {
+                    throw new Error(`Unsupported compression method ${entry.method} for ${entry.name}`);
+                }
+
+                const local = Buffer.alloc(30);
+                await handle.read(local, 0, 30, entry.offset);
+                if (local.readUInt32LE(0) !== 0x04034b50) throw new Error(`Bad local header for ${entry.name}`);
+                const dataStart = entry.offset + 30 + local.readUInt16LE(26) + local.readUInt16LE(28);
+
+                let stream = entry.compressedSize > 0
+                    ? fs.createReadStream(zipPath, { start: dataStart, end: dataStart + entry.compressedSize - 1 })
+                    : Readable.from([]);
+                if (entry.method === 8) stream = stream.pipe(zlib.createInflateRaw());
+                await onEntry(entry.name, stream, entry.size);
+                stream.destroy();
+            }
+        } finally {
+            await handle.close();
+        }
+    }
+}
+
+async function readCentralDirectory(handle) {
+    const { size } = await handle.stat();
+    const tailSize = Math.min(size, 0xFFFF + 22);
+    const tail = Buffer.alloc(tailSize);
+    await handle.read(tail, 0, tailSize, size - tailSize);
+
+    let end = -1;
+    for (let i = tailSize - 22; i >= 0; i--) {
+        if (tail.readUInt32LE(i) === 0x06054b50) {
+            end = i;
+            break;
+        }
+    }
+    if (end < 0) throw new Error('Not a zip archive');
+
+    let count = tail.readUInt16LE(end + 10);
+    let directorySize = tail.readUInt32LE(end + 12);
+    let directoryOffset = tail.readUInt32LE(end + 16);
+
+    // ZIP64 end of central directory, via its locator just before the record above
+    if (end >= 20 && tail.readUInt32LE(end - 20) === 0x07064b50) {
+        const recordOffset = Number(tail.readBigUInt64LE(end - 12));
+        const record = Buffer.alloc(56);
+        await handle.read(record, 0, 56, recordOffset);
+        if (record.readUInt32LE(0) === 0x06064b50) {
+            count = Number(record.readBigUInt64LE(32));
+            directorySize = Number(record.readBigUInt64LE(40));
+            directoryOffset = Number(record.readBigUInt64LE(48));
+        }
+    }
+
+    const directory = Buffer.alloc(directorySize);
+    await handle.read(directory, 0, directorySize, directoryOffset);
+
+    const entries = [];
+    let at = 0;
+    for (let i = 0; i < count; i++) {
+        if (directory.readUInt32LE(at) !== 0x02014b50) throw new Error('Corrupt zip central directory');
+        const nameLength = directory.readUInt16LE(at + 28);
+        const extraLength = directory.readUInt16LE(at + 30);
+        const commentLength = directory.readUInt16LE(at + 32);
+        const entry = {
+            method: directory.readUInt16LE(at + 10),
+            compressedSize: directory.readUInt32LE(at + 20),
+            size: directory.readUInt32LE(at + 24),
+            offset: directory.readUInt32LE(at + 42),
+            name: directory.toString('utf8', at + 46, at + 46 + nameLength)
+        };
+
+        // ZIP64 extra: 8-byte values for whichever fields were maxed out, in order
+        let extra = at + 46 + nameLength;
+        const extraEnd = extra + extraLength;
+        while (extra + 4 <= extraEnd) {
+            const id = directory.readUInt16LE(extra);
+            const length = directory.readUInt16LE(extra + 2);
+            if (id === 0x0001) {
+                let field = extra + 4;
+                for (const key of ['size', 'compressedSize', 'offset']) {
+                    if (entry[key] === 0xFFFFFFFF) {
+                        entry[key] = Number(directory.readBigUInt64LE(field));
+                        field += 8;
+                    }
+                }
+            }
+            extra += 4 + length;
+        }
+
+        entries.push(entry);
+        at = extraEnd + commentLength;
+    }
+    return entries;
+}
+
+function readString(buffer, offset, length) {
+    const end = buffer.indexOf(0, offset);
+    return buffer.toString('utf8', offset, end >= 0 && end < offset + length ? end : offset + length);
+}
+
+function parseOctal(buffer, offset, length) {
+    // GNU base-256 for sizes past 8 GiB
+    if (buffer[offset] & 0x80) {
+        let value = 0;
+        for (let i = offset + 1; i < offset + length; i++) value = value * 256 + buffer[i];
+        return value;
+    }
+    return parseInt(readString(buffer, offset, length).trim() || '0', 8);
+}
+
+// Pull-style reads over a readable stream: exact byte counts, plus a
+// sub-stream for an entry's data that must be consumed before the next read
+class ChunkReader {
+    constructor(input) {
+        this.iterator = input[Symbol.asyncIterator]();
+        this.buffer = Buffer.alloc(0);
+        this.done = false;
+        // Bytes of the current entry not yet read through stream()
+        this.entryLeft = 0;
+    }
+
+    async fill(bytes) {
+        while (this.buffer.length < bytes && !this.done) {
+            const { value, done } = await this.iterator.next();
+            if (done) this.done = true;
+            else this.buffer = this.buffer.length ? Buffer.concat([this.buffer, value]) : value;
+        }
+        return this.buffer.length >= bytes;
+    }
+
+    async read(bytes) {
+        if (!(await this.fill(bytes))) return null;
+        const chunk = this.buffer.subarray(0, bytes);
+        this.buffer = this.buffer.subarray(bytes);
+        return chunk;
+    }
+
+    async skip(bytes) {
+        let left = bytes;
+        while (left > 0) {
+            if (!(await this.fill(1))) throw new Error('Unexpected end of archive');
+            const take = Math.min(left, this.buffer.length);
+            this.buffer = this.buffer.subarray(take);
+            left -= take;
+        }
+    }
+
+    stream(bytes) {
+        const reader = this;
+        reader.entryLeft = bytes;
+        return Readable.from((async function* entryData() {
+            while (reader.entryLeft > 0) {
+                if (!(await reader.fill(1))) throw new Error('Unexpected end of archive');
+                const take = Math.min(reader.entryLeft, reader.buffer.length);
+                const chunk = reader.buffer.subarray(0, take);
+                reader.buffer = reader.buffer.subarray(take);
+                reader.entryLeft -= take;
+                yield chunk;
+            }
+        })(), { objectMode: false });
+    }
+}
+
+module.exports = ArchiveReader;
@@ -4,6 +4,16 @@ const path = require('path');
 const { WaveFile } = require('wavefile');
 
 class AudioProcessor {
+    // Encoder settings per processingSettings.outputFormat
+    static OUTPUT_CODECS = {
+        mp3: { codec: 'libmp3lame', bitrate: '320k', format: 'mp3' },
+        wav: { codec: 'pcm_s16le', format: 'wav' },
+        flac: { codec: 'flac', format: 'flac' },
+        m4a: { codec: 'aac', bitrate: '256k', format: 'ipod' },
+        aac: { codec: 'aac', bitrate: '256k', format: 'adts' }
+    };
+    static PREVIEW_CODEC = { codec: 'libmp3lame', bitrate: '128k', format: 'mp3' };
+
     static async analyzeFile(filePath) {
         return new Promise((resolve, reject) => {
             ffmpeg.ffprobe(filePath, (err, metadata) => {
@@ -80,35 +90,74 @@ class AudioProcessor {
         });
     }
 
-    static async createPreview(inputPath, maxDuration = 60) {
-        const previewDir = path.join(path.dirname(inputPath), '..', 'previews');
-        await fs.mkdir(previewDir, { recursive: true });
+    // Encodes raw PCM (see PcmRenderer.FORMAT) to the requested output format
+    static async encodePcm(pcmPath, outputPath, pcmFormat, outputFormat = 'mp3') {
+        const settings = this.OUTPUT_CODECS[outputFormat] || this.OUTPUT_CODECS.mp3;
 
-        const previewPath = path.join(previewDir, `preview_${path.basename(inputPath)}`);
+        return new Promise((resolve, reject) => {
+            const command = ffmpeg(pcmPath).inputOptions(this.pcmInputOptions(pcmFormat));
+            this.addOutput(command, outputPath, settings)
+                .on('error', reject)
+                .on('end', () => resolve(outputPath))
+                .run();
+        });
+    }
 
+    // Preview from the first `duration` seconds of clean PCM, for when the main
+    // output didn't go through encodePcm (unchanged on re-clean)
+    static async encodePreview(pcmPath, previewPath, pcmFormat, duration) {
         return new Promise((resolve, reject) => {
-            ffmpeg.getAvailableFormats((err, formats) => {
-                if (err) {
-                    console.warn('FFmpeg not available, copying original file as preview');
-                    require('fs').copyFileSync(inputPath, previewPath);
-                    resolve(previewPath);
-                    return;
-                }
+            const command = ffmpeg(pcmPath).inputOptions([...this.pcmInputOptions(pcmFormat), `-t ${duration}`]);
 
-                ffmpeg(inputPath)
-                    .seekInput(0)
-                    .duration(maxDuration)
-                    .audioCodec('libmp3lame')
-                    .audioBitrate('128k')
-                    .on('error', (error) => {
-                        console.error('Preview creation error:', error);
-                        require('fs').copyFileSync(inputPath, previewPath);
-                        resolve(previewPath);
-                    })
-                    .on('end', () => resolve(previewPath))
-                    .save(previewPath);
-            });
+            this.addOutput(command, previewPath, this.PREVIEW_CODEC)
+                .on('error', reject)
+                .on('end', () => resolve(previewPath))
+                .run();
+        });
+    }
+
+    static pcmInputOptions(pcmFormat) {
+        return ['-f s16le', `-ar ${pcmFormat.sampleRate}`, `-ac ${pcmFormat.channels}`];
+    }
+
+    static addOutput(command, outputPath, settings) {
+        command.output(outputPath).audioCodec(settings.codec).format(settings.format);
+        if (settings.bitrate) {
+            command.audioBitrate(settings.bitrate);
+        }
+        return command;
+    }
+
+    // Fallback preview for outputs that were not rendered from PCM (no decode)
+    static async createPreview(inputPath, maxDuration = 60, previewPath = null) {
+        previewPath = previewPath ||
+            path.join(path.dirname(inputPath), '..', 'previews', `preview_${path.basename(inputPath)}`);
+        await fs.mkdir(path.dirname(previewPath), { recursive: true });
+
+        const ffmpegAvailable = await new Promise(resolve => ffmpeg.getAvailableFormats(err => resolve(!err)));
+        if (!ffmpegAvailable) {
+            console.warn('FFmpeg not available, copying original file as preview');
+            await fs.copyFile(inputPath, previewPath);
+            return previewPath;
+        }
+
+        const encoded = await new Promise(resolve => {
+            ffmpeg(inputPath)
+                .duration(maxDuration)
+                .audioCodec(this.PREVIEW_CODEC.codec)
+                .audioBitrate(this.PREVIEW_CODEC.bitrate)
+                .on('error', (error) => {
+                    console.error('Preview creation error:', error);
+                    resolve(false);
+                })
+                .on('end', () => resolve(true))
+                .save(previewPath);
         });
+        if (!encoded) {
+            // Copy failures reject to the caller
+            await fs.copyFile(inputPath, previewPath);
+        }
+        return previewPath;
     }
 
     static async convertToWav(inputPath) {
@@ -0,0 +1,96 @@
+const mongoose = require('mongoose');
+const EtaModel = require('./etaModel');
+const JobScheduler = require('./jobScheduler');
+
+// Feeds a batch's jobs to the JobScheduler at most CONCURRENCY at a time,
+// so a 5,000-track catalog holds a handful of scheduler entries (and worker
+// slots) rather than all of them, and fair queuing still applies between
+// the batch owner and everyone else. Each finished child is counted on its
+// BatchJob. resume() picks up unfinished batches after a restart.
+class BatchRunner {
+    static CONCURRENCY = parseInt(process.env.BATCH_CONCURRENCY, 10) || 4;
+
+    // batchId -> { queue: [job], running }
+    static active = new Map();
+
+    // jobs: [{ _id, originalName, fileSize, previewDuration }]; run(jobId)
+    // processes one and resolves true when it completed
+    static start(batch, jobs, run) {
+        const id = String(batch._id);
+        const state = BatchRunner.active.get(id) || { queue: [], running: 0, batch, run };
+        state.queue.push(...jobs);
+        BatchRunner.active.set(id, state);
+        BatchRunner.pump(id);
+    }
+
+    static pump(id) {
+        const state = BatchRunner.active.get(id);
+        if (!state) return;
+
+        while (state.running < BatchRunner.CONCURRENCY && state.queue.length > 0) {
+            const job = state.queue.shift();
+            state.running++;
+
+            JobScheduler.submit({
+                id: job._id,
+                lane: JobScheduler.laneFor(state.batch.tier),
+                user: state.batch.userId,
+                cost: EtaModel.total(EtaModel.profileFor(job)),
+                run: async () => {
+                    let succeeded = false;
+                    try {
+                        succeeded = await state.run(job._id);
+                    } finally {
+                        await BatchRunner.recordChild(state.batch._id, succeeded);
+                        state.running--;
+                        if (state.running === 0 && state.queue.length === 0) {
+                            BatchRunner.active.delete(id);
+                        } else {
+                            BatchRunner.pump(id);
+                        }
+                    }
+                }
+            });
+        }
+    }
+
+    static recordChild(batchId, succeeded) {
+        const BatchJob = require('../models/BatchJob');
+        if (mongoose.connection.readyState !== 1) return Promise.resolve();
+        return BatchJob.recordChild(batchId, succeeded)
+            .catch(error => console.error(`Batch ${batchId} update error:`, error.message));
+    }
+
+    // Re-queues children of open batches that never started. Jobs that were
+    // mid-processing when the process stopped are marked failed, as a
+    // single upload would be.
+    static async resume(run, tierFor) {
+        const BatchJob = require('../models/BatchJob');
+        const ProcessingJob = require('../models/ProcessingJob');
+
+        const batches = await BatchJob.find({ status: 'processing' }).select('userId').lean();
+        for (const batch of batches) {
+            if (BatchRunner.active.has(String(batch._id))) continue;
+
+            const children = await ProcessingJob.find({ batchId: batch._id, status: { $nin: ['completed', 'failed'] } })
+                .select('status originalName fileSize previewDuration')
+                .lean();
+            const interrupted = children.filter(child => child.status !== 'uploaded');
+            if (interrupted.length > 0) {
+                await ProcessingJob.updateMany(
+                    { _id: { $in: interrupted.map(child => child._id) } },
+                    { status: 'failed', error: 'Interrupted by a server restart' }
+                );
+                for (let i = 0; i < interrupted.length; i++) await BatchJob.recordChild(batch._id, false);
+            }
+
+            const pending = children.filter(child => child.status === 'uploaded');
+            if (pending.length > 0) {
+                BatchRunner.start({ ...batch, tier: await tierFor(batch.userId) }, pending, run);
+                console.log(`📦 Resumed batch ${batch._id}: ${pending.length} job(s) queued`);
+            }
+        }
+    }
+}
+
+module.exports = BatchRunner;
@@ -0,0 +1,242 @@
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const readline = require('readline');
+const { Worker } = require('worker_threads');
+const Metrics = require('./metrics');
+
+const WORKER_PATH = path.join(__dirname, 'workers', 'scanWorker.js');
+
+// Re-scans stored transcripts in bulk, e.g. after a lexicon change.
+// Transcripts stream in from any async iterable (AudioFile cursor, JSONL file),
+// are grouped into batches and spread over a pool of worker threads. Results go
+// to a sink in write batches, so memory stays bounded by the in-flight batches
+// rather than by the size of the catalog.
+class BatchScanner {
+    constructor(options = {}) {
+        this.workerCount = options.workers || Math.max(1, os.cpus().length - 1);
+        this.batchSize = options.batchSize || 100;
+        this.writeBatchSize = options.writeBatchSize || 500;
+        this.scanOptions = options.scanOptions || {};
+        this.lexiconPath = options.lexiconPath || process.env.LEXICON_PATH;
+    }
+
+    // source: async iterable of transcripts or AudioFile-shaped documents
+    // sink: async (results) => void, called with up to writeBatchSize results
+    async run(source, sink) {
+        const stats = { transcripts: 0, segments: 0, flagged: 0, failed: 0 };
+        const start = process.hrtime.bigint();
+        const workers = this.startWorkers();
+
+        const idle = [...workers];
+        const waiting = [];
+        const inFlight = new Set();
+        let pending = [];
+        let nextBatchId = 0;
+
+        const acquire = () => (idle.length > 0
+            ? Promise.resolve(idle.pop())
+            : new Promise(resolve => waiting.push(resolve)));
+        const release = worker => (waiting.length > 0 ? waiting.shift()(worker) : idle.push(worker));
+
+        const flush = async (force = false) => {
+            while (pending.length >= this.writeBatchSize || (force && pending.length > 0)) {
+                await sink(pending.splice(0, this.writeBatchSize));
+            }
+        };
+
+        const dispatch = async transcripts => {
+            const worker = await acquire();
+            const task = this.runBatch(worker, nextBatchId++, transcripts)
+                .then(results => {
+                    for (const result of results) {
+                        stats.transcripts++;
+                        stats.segments += result.segments;
+                        if (result.profanityAnalysis.found) stats.flagged++;
+                    }
+                    pending.push(...results);
+                }, error => {
+                    stats.failed += transcripts.length;
+                    console.error('Batch scan failed:', error.message);
+                })
+                .finally(() => {
+                    // A crashed thread is replaced rather than handed another batch
+                    release(worker.crashed ? this.replaceWorker(workers, worker) : worker);
+                    inFlight.delete(task);
+                });
+            inFlight.add(task);
+        };
+
+        try {
+            let batch = [];
+            for await (const item of source) {
+                const transcript = BatchScanner.toTranscript(item);
+                if (!transcript) continue;
+
+                batch.push(transcript);
+                if (batch.length >= this.batchSize) {
+                    // Blocks while every worker is busy, which back-pressures the source
+                    await dispatch(batch);
+                    batch = [];
+                    await flush();
+                }
+            }
+            if (batch.length > 0) await dispatch(batch);
+
+            await Promise.all(inFlight);
+            await flush(true);
+        } finally {
+            await Promise.all(workers.map(worker => worker.terminate()));
+        }
+
+        const elapsedMs = Number(process.hrtime.bigint() - start) / 1e6;
+        Metrics.recordTiming('profanity.batchScan', elapsedMs);
+        Metrics.increment('profanity.batchScan.segments', stats.segments);
+
+        return {
+            ...stats,
+            workers: workers.length,
+            elapsedMs: Math.round(elapsedMs),
+            segmentsPerSecond: Math.round(stats.segments / Math.max(elapsedMs / 1000, 0.001))
+        };
+    }
+
+    startWorkers() {
+        return Array.from({ length: this.workerCount }, () => this.startWorker());
+    }
+
+    startWorker() {
+        return new Worker(WORKER_PATH, {
+            workerData: { lexiconPath: this.lexiconPath, options: this.scanOptions }
+        });
+    }
+
+    replaceWorker(workers, crashed) {
+        const worker = this.startWorker();
+        workers[workers.indexOf(crashed)] = worker;
+        return worker;
+    }
+
+    runBatch(worker, batchId, transcripts) {
+        return new Promise((resolve, reject) => {
+            const onMessage = message => {
+                if (message.batchId !== batchId) return;
+                cleanup();
+                if (message.error) {
+                    reject(new Error(message.error));
+                } else {
+                    resolve(message.results);
+                }
+            };
+            const onError = error => {
+                worker.crashed = true;
+                cleanup();
+                reject(error);
+            };
+            // Out of memory or process.exit(): the thread goes without an 'error'
+            const onExit = code => {
+                worker.crashed = true;
+                cleanup();
+                reject(new Error(`Scan worker exited with code ${code} before finishing batch ${batchId}`));
+            };
+            const cleanup = () => {
+                worker.off('message', onMessage);
+                worker.off('error', onError);
+                worker.off('exit', onExit);
+            };
+
+            worker.on('message', onMessage);
+            worker.on('error', onError);
+            worker.on('exit', onExit);
+            worker.postMessage({ batchId, transcripts });
+        });
+    }
+
+    // Accepts { id, languages, segments } or an AudioFile document / JSON line
+    static toTranscript(doc) {
+        if (!doc) return null;
+
+        if (Array.isArray(doc.segments)) {
+            return {
+                id: String(doc.id || doc._id),
+                languages: doc.languages && doc.languages.length > 0 ? doc.languages : ['English'],
+                segments: doc.segments
+            };
+        }
+
+        const detected = doc.detectedLanguages || [];
+        const segments = [];
+        for (const entry of detected) {
+            for (const segment of entry.segments || []) {
+                segments.push({
+                    start: segment.start,
+                    end: segment.end,
+                    text: segment.text,
+                    language: entry.language
+                });
+            }
+        }
+        if (segments.length === 0) return null;
+
+        segments.sort((a, b) => a.start - b.start);
+        return {
+            id: String(doc._id || doc.id),
+            languages: detected.map(entry => entry.language),
+            segments
+        };
+    }
+
+    // Stored transcripts straight off a lean cursor; only the fields the scan needs
+    static fromAudioFiles(query = {}) {
+        const AudioFile = require('../models/AudioFile');
+
+        return AudioFile.find({ ...query, 'detectedLanguages.segments.0': { $exists: true } })
+            .select('detectedLanguages.language detectedLanguages.segments')
+            .lean()
+            .cursor({ batchSize: 500 });
+    }
+
+    static async *fromJsonl(filePath) {
+        const lines = readline.createInterface({
+            input: fs.createReadStream(filePath),
+            crlfDelay: Infinity
+        });
+
+        let lineNumber = 0;
+        for await (const line of lines) {
+            lineNumber++;
+            if (!line.trim()) continue;
+
+            try {
+                yield JSON.parse(line);
+            } catch (error) {
+                console.warn(`Skipping ${path.basename(filePath)}:${lineNumber}: ${error.message}`);
+            }
+        }
+    }
+
+    // Sink that writes profanityAnalysis back with one bulkWrite per write batch
+    static audioFileSink() {
+        const AudioFile = require('../models/AudioFile');
+
+        return results => AudioFile.bulkWrite(results.map(result => ({
+            updateOne: {
+                filter: { _id: result.id },
+                update: { $set: { profanityAnalysis: result.profanityAnalysis, updatedAt: new Date() } }
+            }
+        })), { ordered: false });
+    }
+
+    // Sink that appends { id, profanityAnalysis } lines to a stream
+    static jsonlSink(stream) {
+        return results => new Promise((resolve, reject) => {
+            const chunk = results
+                .map(result => JSON.stringify({ id: result.id, profanityAnalysis: result.profanityAnalysis }))
+                .join('\n');
+
+            stream.write(`${chunk}\n`, error => (error ? reject(error) : resolve()));
+        });
+    }
+}
+
+module.exports = BatchScanner;
@@ -0,0 +1,366 @@
+const fs = require('fs').promises;
+const path = require('path');
+const AudioProcessor = require('./audioProcessor');
+const EncoderFanout = require('./encoderFanout');
+const JobArtifacts = require('./jobArtifacts');
+const LanguageDetector = require('./languageDetector');
+const Metrics = require('./metrics');
+const MuteMask = require('./muteMask');
+const PcmRenderer = require('./pcmRenderer');
+const ProfanityFilter = require('./profanityFilter');
+const RenderCache = require('./renderCache');
+const VocalActivityDetector = require('./vocalActivity');
+const WaveformGenerator = require('./waveformGenerator');
+
+// Upload -> clean output pipeline.
+// The transcript, word alignments, decoded PCM and mute mask are kept as job
+// artifacts, so re-cleaning after a lexicon update or new custom words only
+// re-runs the scan and re-renders the time ranges whose mask changed.
+//
+// Processing stops at the clean PCM and the preview. Full-quality outputs are
+// rendered by renderOutputs() once the job is paid for or first downloaded,
+// and cached in RenderCache.
+class CleanPipeline {
+    static DEFAULT_PREVIEW_DURATION = 30;
+    // Above this share of detected speech the whole input is transcribed as is
+    static FULL_TRANSCRIPTION_SHARE = 0.95;
+
+    // job: { id, originalPath, fileHash, outputFormat, extraFormats, customWords, censorMode, previewDuration }
+    // extraFormats are encoded alongside outputFormat from the same clean PCM;
+    // previewDuration is the tier's preview limit in seconds
+    // onStage(stage, details) is awaited as each stage starts; details carry
+    // `languages` from content-scanning on and the probed `duration` from
+    // language-detection on
+    static async process(job, onStage = async () => {}) {
+        const artifacts = JobArtifacts.forJob(job.id);
+        const filter = ProfanityFilter.shared();
+
+        await onStage('analyzing');
+        const metadata = await AudioProcessor.analyzeFile(job.originalPath);
+        const format = await Metrics.time('clean.decode', () => artifacts.decode(job.originalPath));
+        let analysis = null;
+        if (format) {
+            // Waveform, loudness, vocal activity and transients from the decoded source, one read of source.pcm
+            analysis = await Metrics.time('clean.analyze', () =>
+                WaveformGenerator.analyzePcm(artifacts.sourcePcmPath, format));
+            await artifacts.saveTransients(analysis.transients);
+        }
+
+        await onStage('language-detection', { duration: analysis ? analysis.loudness.duration : metadata.duration });
+        const { transcript, speech } = await Metrics.time('clean.transcribe', () =>
+            CleanPipeline.transcribe(job, artifacts, format, analysis));
+        await artifacts.saveTranscript(transcript);
+
+        await onStage('content-scanning', { languages: transcript.languages });
+        const scan = await CleanPipeline.scan(filter, transcript, job.customWords);
+
+        await onStage('processing');
+        const preview = CleanPipeline.previewFor(job);
+        await fs.mkdir(path.dirname(preview.path), { recursive: true });
+        let outputs = [];
+
+        const render = CleanPipeline.renderOptions(job);
+        if (format) {
+            await Metrics.time('clean.render', () =>
+                PcmRenderer.renderFull(artifacts.sourcePcmPath, artifacts.cleanPcmPath, scan.mask, format, render));
+        } else {
+            // No decoded source (ffmpeg missing or decode failed): filter the input directly, now
+            const cleanPath = await AudioProcessor.cleanAudio(job.originalPath, scan.mask);
+            outputs = [{ format: path.extname(cleanPath).slice(1), path: cleanPath }];
+        }
+        await artifacts.saveMask(scan.version, scan.mask, render);
+
+        await onStage('preview');
+        const previewPath = format
+            ? await Metrics.time('clean.preview', () =>
+                AudioProcessor.encodePreview(artifacts.cleanPcmPath, preview.path, format, preview.duration))
+            : await AudioProcessor.createPreview(outputs[0].path, preview.duration, preview.path);
+        const outputPath = outputs.length > 0 ? outputs[0].path : null;
+
+        return {
+            metadata,
+            analysis,
+            speech,
+            transcript,
+            timestamps: scan.timestamps,
+            profanity: filter.summarize(scan.timestamps),
+            mask: scan.mask,
+            maskVersion: scan.version,
+            outputPath,
+            outputs,
+            previewPath
+        };
+    }
+
+    // Re-clean with the current lexicons and `job.customWords`. Returns the same
+    // shape as process() plus the ranges that were re-rendered. Outputs are only
+    // re-rendered when the job already had some (`job.outputs`); otherwise they
+    // stay deferred like after process().
+    static async reclean(job) {
+        const start = process.hrtime.bigint();
+        const artifacts = JobArtifacts.forJob(job.id);
+        const filter = ProfanityFilter.shared();
+
+        const transcript = await artifacts.loadTranscript();
+        if (!transcript) {
+            throw new Error('No stored transcript for this job, it has to be processed first');
+        }
+
+        const previous = (await artifacts.loadMask()) || { version: null, intervals: [] };
+        const scan = await CleanPipeline.scan(filter, transcript, job.customWords);
+        const render = CleanPipeline.renderOptions(job);
+
+        // A different censor mode changes every masked interval, not just the diff
+        const changedRanges = JSON.stringify(previous.render) === JSON.stringify(render)
+            ? MuteMask.diff(previous.intervals, scan.mask)
+            : MuteMask.merge([...previous.intervals, ...scan.mask]);
+
+        let outputs = job.outputs || [];
+        const preview = CleanPipeline.previewFor(job);
+        // Only re-encode the preview when a change falls inside it
+        const previewChanged = changedRanges.some(range => range.start < preview.duration);
+        let previewPath = job.previewPath || null;
+        let format = PcmRenderer.FORMAT;
+
+        if (changedRanges.length > 0) {
+            if (!(await artifacts.exists('source.pcm'))) {
+                format = await artifacts.decode(job.originalPath);
+            }
+
+            if (!format) {
+                const cleanPath = await AudioProcessor.cleanAudio(job.originalPath, scan.mask);
+                outputs = [{ format: path.extname(cleanPath).slice(1), path: cleanPath }];
+                if (previewChanged) {
+                    previewPath = await AudioProcessor.createPreview(cleanPath, preview.duration, preview.path);
+                }
+            } else if (await artifacts.exists('clean.pcm')) {
+                // Restore the changed ranges from the source and apply the new mask there only
+                await Metrics.time('clean.render', () => PcmRenderer.renderRanges(
+                    artifacts.sourcePcmPath, artifacts.cleanPcmPath, changedRanges, scan.mask, format, render));
+            } else {
+                await PcmRenderer.renderFull(
+                    artifacts.sourcePcmPath, artifacts.cleanPcmPath, scan.mask, format, render);
+            }
+        }
+
+        if (changedRanges.length > 0 || previous.version !== scan.version) {
+            await artifacts.saveMask(scan.version, scan.mask, render);
+        }
+
+        if (format && changedRanges.length > 0) {
+            if (previewChanged) {
+                previewPath = await AudioProcessor.encodePreview(
+                    artifacts.cleanPcmPath, preview.path, format, preview.duration);
+            }
+            if (outputs.length > 0) {
+                outputs = await CleanPipeline.renderOutputs(job);
+            }
+        }
+
+        Metrics.recordTiming('clean.reclean', Number(process.hrtime.bigint() - start) / 1e6);
+        Metrics.increment('clean.reclean.secondsRerendered', MuteMask.totalDuration(changedRanges));
+
+        return {
+            transcript,
+            timestamps: scan.timestamps,
+            profanity: filter.summarize(scan.timestamps),
+            mask: scan.mask,
+            maskVersion: scan.version,
+            previousMaskVersion: previous.version,
+            changedRanges,
+            outputPath: outputs.length > 0 ? outputs[0].path : null,
+            outputs,
+            previewPath
+        };
+    }
+
+    // Full-quality outputs for every requested format, from the cache or rendered
+    // now from the stored mask in a single pass. Resolves with [{ format, path }],
+    // primary format first.
+    static async renderOutputs(job) {
+        const artifacts = JobArtifacts.forJob(job.id);
+        const mask = await artifacts.loadMask();
+        if (!mask) {
+            throw new Error('No stored mute mask for this job, it has to be processed first');
+        }
+
+        const render = mask.render || CleanPipeline.renderOptions(job);
+        const variants = CleanPipeline.formatsFor(job).map(format => ({
+            hash: job.fileHash || String(job.id),
+            maskVersion: mask.version,
+            intervals: mask.intervals,
+            render,
+            format,
+            bitrate: (AudioProcessor.OUTPUT_CODECS[format] || {}).bitrate
+        }));
+        const key = `${job.id}:${variants.map(variant => `${RenderCache.key(variant)}.${variant.format}`).join(',')}`;
+
+        return RenderCache.once(key, async () => {
+            const missing = [];
+            for (const variant of variants) {
+                if (!(await RenderCache.has(variant))) missing.push(variant);
+            }
+
+            if (missing.length > 0) {
+                await Metrics.time('clean.renderOutputs', () =>
+                    CleanPipeline.renderVariants(artifacts, job, mask, render, missing));
+                Metrics.increment('clean.renderCache.misses', missing.length);
+            }
+            Metrics.increment('clean.renderCache.hits', variants.length - missing.length);
+
+            const outputs = [];
+            for (const variant of variants) {
+                if (await RenderCache.has(variant)) {
+                    outputs.push({ format: variant.format, path: RenderCache.pathFor(variant) });
+                }
+            }
+            return outputs;
+        });
+    }
+
+    // Renders a ProcessingJob document's outputs and records them on it
+    static async renderJob(jobDocument) {
+        const outputs = await CleanPipeline.renderOutputs(jobDocument.toPipelineJob());
+        const outputPath = outputs.length > 0 ? outputs[0].path : null;
+
+        await jobDocument.constructor.updateOne({ _id: jobDocument._id }, { outputs, outputPath });
+        jobDocument.outputs = outputs;
+        jobDocument.outputPath = outputPath;
+        return outputs;
+    }
+
+    static async renderVariants(artifacts, job, mask, render, variants) {
+        let format = PcmRenderer.FORMAT;
+        if (!(await artifacts.exists('clean.pcm'))) {
+            // Artifacts were cleared since processing: decode again and re-apply the stored mask
+            format = await artifacts.decode(job.originalPath);
+            if (!format) {
+                throw new Error('Cannot render outputs, the upload could not be decoded');
+            }
+            await PcmRenderer.renderFull(artifacts.sourcePcmPath, artifacts.cleanPcmPath, mask.intervals, format, render);
+        }
+
+        await fs.mkdir(RenderCache.root(), { recursive: true });
+        const targets = variants.map(variant => ({
+            format: variant.format,
+            path: `${RenderCache.pathFor(variant)}.${process.pid}.partial`,
+            cachePath: RenderCache.pathFor(variant)
+        }));
+
+        try {
+            const written = new Set((await CleanPipeline.encode(artifacts, targets, format)).map(output => output.path));
+            for (const target of targets) {
+                if (written.has(target.path)) await fs.rename(target.path, target.cachePath);
+            }
+        } finally {
+            await Promise.all(targets.map(target => fs.rm(target.path, { force: true })));
+        }
+    }
+
+    // Sends only the regions the vocal-activity detector marked as speech to
+    // the transcriber, as one speech-only WAV, and maps the timings back to
+    // the source. The whole input goes instead when there is no analysis
+    // (no decoded source) or speech covers nearly all of it anyway.
+    // speech: { regions, transcribedSeconds, skippedSeconds }, null without analysis
+    static async transcribe(job, artifacts, format, analysis) {
+        const toTranscript = detection => ({
+            languages: detection.languages,
+            segments: detection.segments || [],
+            words: detection.words || []
+        });
+
+        if (!analysis || !analysis.speech) {
+            return { transcript: toTranscript(await LanguageDetector.detect(job.originalPath)), speech: null };
+        }
+
+        const { regions, speechSeconds, duration } = analysis.speech;
+        const speech = {
+            regions,
+            transcribedSeconds: duration,
+            skippedSeconds: 0
+        };
+
+        let transcript;
+        if (regions.length === 0) {
+            transcript = { languages: [], segments: [], words: [] };
+            speech.transcribedSeconds = 0;
+        } else if (speechSeconds >= duration * CleanPipeline.FULL_TRANSCRIPTION_SHARE) {
+            transcript = toTranscript(await LanguageDetector.detect(job.originalPath));
+        } else {
+            const wavPath = artifacts.speechWavPath;
+            try {
+                const timeline = await VocalActivityDetector.writeSpeechWav(artifacts.sourcePcmPath, format, regions, wavPath);
+                const detection = await LanguageDetector.detect(wavPath, { wav: true });
+                transcript = toTranscript(VocalActivityDetector.mapTranscript(detection, timeline));
+                speech.transcribedSeconds = speechSeconds;
+            } finally {
+                await fs.unlink(wavPath).catch(() => {});
+            }
+        }
+
+        speech.skippedSeconds = Number((duration - speech.transcribedSeconds).toFixed(3));
+        Metrics.increment('clean.transcribe.audioSeconds', duration);
+        Metrics.increment('clean.transcribe.skippedSeconds', speech.skippedSeconds);
+        return { transcript, speech };
+    }
+
+    static async scan(filter, transcript, customWords = []) {
+        const timestamps = await filter.scanSegments(transcript.segments, transcript.languages, { customWords });
+
+        return {
+            timestamps,
+            mask: MuteMask.build(timestamps, transcript.words),
+            version: MuteMask.version(filter.lexicons.getVersion(transcript.languages), customWords)
+        };
+    }
+
+    // Clean PCM -> output files. outputs: [{ format, path }]. Encoded in one
+    // pass by a single ffmpeg run, or the encoder fan-out when several formats
+    // are needed. Resolves with the outputs that were written; a failed format
+    // is logged and left out, and the call only fails when none could be
+    // written.
+    static async encode(artifacts, outputs, format) {
+        if (outputs.length <= 1) {
+            if (outputs.length === 1) {
+                await Metrics.time('clean.encode', () => AudioProcessor.encodePcm(
+                    artifacts.cleanPcmPath, outputs[0].path, format, outputs[0].format));
+            }
+            return outputs.map(CleanPipeline.describeOutput);
+        }
+
+        const results = await Metrics.time('clean.encode', () => EncoderFanout.encode(
+            artifacts.cleanPcmPath, format, outputs.map(output => ({ path: output.path, format: output.format }))));
+        const failed = new Set(results.filter(result => result.error).map(result => result.path));
+
+        if (failed.size === outputs.length) {
+            throw new Error(`Encoding ${outputs.map(output => output.format).join(', ')} failed`);
+        }
+
+        return outputs.filter(output => !failed.has(output.path)).map(CleanPipeline.describeOutput);
+    }
+
+    static describeOutput(output) {
+        return { format: output.format, path: output.path };
+    }
+
+    static renderOptions(job) {
+        return PcmRenderer.options({ mode: job.censorMode });
+    }
+
+    // uploads/previews/preview_<name>.mp3, `job.previewDuration` seconds long
+    static previewFor(job) {
+        const name = path.basename(job.originalPath, path.extname(job.originalPath));
+        return {
+            path: job.previewPath || path.join(path.dirname(job.originalPath), 'previews', `preview_${name}.mp3`),
+            duration: job.previewDuration || CleanPipeline.DEFAULT_PREVIEW_DURATION
+        };
+    }
+
+    // Primary format first, then any extra formats
+    static formatsFor(job) {
+        const primary = job.outputFormat || 'mp3';
+        return [...new Set([primary, ...(job.extraFormats || [])])];
+    }
+}
+
+module.exports = CleanPipeline;
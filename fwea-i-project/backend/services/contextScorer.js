@@ -0,0 +1,74 @@
+const compromise = require('compromise');
+const Metrics = require('./metrics');
+
+// Optional NLP context stage for profanity results.
+// The whole transcript is parsed once; only segments that already have lexicon
+// matches are inspected, and context only adjusts their confidence. Context
+// words are never reported as profanity themselves.
+class ContextScorer {
+    static CONTEXT_MATCH = '(#Negative|#Angry)';
+    static CONFIDENCE_BOOST = 0.2;
+
+    static isEnabled(options = {}) {
+        if (options.contextScoring !== undefined) return Boolean(options.contextScoring);
+        return process.env.PROFANITY_CONTEXT_SCORING === 'true';
+    }
+
+    // segments: transcript segments ({ text }), results: checkTextForProfanity
+    // output per segment index (only flagged ones). Mutates and returns results.
+    static apply(segments, results) {
+        if (results.size === 0) return results;
+
+        const start = process.hrtime.bigint();
+
+        try {
+            // Lay the segments out in one document and remember where each starts
+            const starts = [];
+            let transcript = '';
+            for (const segment of segments) {
+                starts.push(transcript.length);
+                transcript += `${(segment.text || '').trim()}\n`;
+            }
+
+            const matches = compromise(transcript).match(this.CONTEXT_MATCH).out('offset');
+
+            for (const match of matches) {
+                const index = this.segmentAt(starts, match.offset.start);
+                const result = results.get(index);
+                if (!result) continue;
+
+                if (!result.contextWords) {
+                    result.contextWords = [];
+                    result.confidence = Math.min(result.confidence + this.CONFIDENCE_BOOST, 1.0);
+                }
+                result.contextWords.push(match.text);
+            }
+        } catch (nlpError) {
+            // Context is an optional refinement; lexicon results stand on their own
+            console.warn('Context scoring skipped:', nlpError.message);
+        } finally {
+            Metrics.recordTiming('profanity.contextScoring', Number(process.hrtime.bigint() - start) / 1e6);
+        }
+
+        return results;
+    }
+
+    // Binary search for the segment whose text contains `offset`
+    static segmentAt(starts, offset) {
+        let low = 0;
+        let high = starts.length - 1;
+
+        while (low < high) {
+            const mid = (low + high + 1) >> 1;
+            if (starts[mid] <= offset) {
+                low = mid;
+            } else {
+                high = mid - 1;
+            }
+        }
+
+        return low;
+    }
+}
+
+module.exports = ContextScorer;
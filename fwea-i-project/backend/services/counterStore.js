@@ -0,0 +1,39 @@
+// Shared counters for state that has to agree across server instances (API
+// rate limits). A store only needs incrementMany(): add each amount to its
+// key, keep the key for at least ttlMs after its last write, and resolve with
+// the new totals in order. Nothing calls it per request; RateLimiter batches
+// its local increments and syncs them every few hundred milliseconds.
+//
+// MemoryCounterStore is the single-instance stand-in. A multi-node deployment
+// plugs in a store with the same method over Redis (INCRBY + PEXPIRE in a
+// MULTI) or similar.
+class MemoryCounterStore {
+    constructor() {
+        this.counters = new Map();
+    }
+
+    // entries: [{ key, amount, ttlMs }] -> Promise<number[]>
+    async incrementMany(entries, now = Date.now()) {
+        const totals = entries.map(({ key, amount, ttlMs }) => {
+            let counter = this.counters.get(key);
+            if (!counter || counter.expiresAt <= now) {
+                counter = { value: 0, expiresAt: 0 };
+                this.counters.set(key, counter);
+            }
+            counter.value += amount;
+            counter.expiresAt = now + ttlMs;
+            return counter.value;
+        });
+
+        this.evict(now);
+        return totals;
+    }
+
+    evict(now = Date.now()) {
+        for (const [key, counter] of this.counters) {
+            if (counter.expiresAt <= now) this.counters.delete(key);
+        }
+    }
+}
+
+module.exports = { MemoryCounterStore };
@@ -0,0 +1,75 @@
+const ffmpeg = require('fluent-ffmpeg');
+const fs = require('fs');
+const { once } = require('events');
+const { PassThrough } = require('stream');
+const AudioProcessor = require('./audioProcessor');
+
+// One PCM read, several encodes: clean PCM is read from disk once and every
+// chunk is handed to one ffmpeg process per output format. Each encoder has
+// its own bounded buffer (ENCODER_BUFFER_BYTES); the reader waits whenever a
+// buffer is full, so memory stays flat and the slowest encoder sets the pace.
+// An encoder that fails or stops early (a preview with a duration) is dropped
+// from the fan-out without stalling the others.
+class EncoderFanout {
+    static READ_CHUNK_BYTES = 256 * 1024;
+    static ENCODER_BUFFER_BYTES = 1024 * 1024;
+
+    // targets: [{ path, format, duration? }] where format is an
+    // AudioProcessor.OUTPUT_CODECS key or 'preview'. Resolves with one
+    // { path, format, error } entry per target.
+    static async encode(pcmPath, pcmFormat, targets) {
+        const encoders = targets.map(target => EncoderFanout.startEncoder(target, pcmFormat));
+
+        try {
+            const reader = fs.createReadStream(pcmPath, { highWaterMark: EncoderFanout.READ_CHUNK_BYTES });
+            for await (const chunk of reader) {
+                const open = encoders.filter(encoder => !encoder.closed);
+                if (open.length === 0) {
+                    reader.destroy();
+                    break;
+                }
+
+                // Wait for every encoder whose buffer is full, or that exits meanwhile
+                const waits = open
+                    .filter(encoder => !encoder.input.write(chunk))
+                    .map(encoder => Promise.race([once(encoder.input, 'drain'), encoder.finished]));
+                if (waits.length > 0) await Promise.all(waits);
+            }
+        } finally {
+            for (const encoder of encoders) {
+                if (!encoder.closed) encoder.input.end();
+            }
+        }
+
+        return Promise.all(encoders.map(encoder => encoder.result));
+    }
+
+    static startEncoder(target, pcmFormat) {
+        const settings = target.format === 'preview'
+            ? AudioProcessor.PREVIEW_CODEC
+            : AudioProcessor.OUTPUT_CODECS[target.format] || AudioProcessor.OUTPUT_CODECS.mp3;
+        const input = new PassThrough({ highWaterMark: EncoderFanout.ENCODER_BUFFER_BYTES });
+        const encoder = { target, input, closed: false };
+
+        encoder.result = new Promise(resolve => {
+            const command = ffmpeg(input).inputOptions(AudioProcessor.pcmInputOptions(pcmFormat));
+            AudioProcessor.addOutput(command, target.path, settings);
+            if (target.duration) command.duration(target.duration);
+
+            const finish = error => {
+                encoder.closed = true;
+                // Nothing reads the buffer any more; let writes pass through to /dev/null
+                input.resume();
+                if (error) console.error(`Encoder fan-out (${target.format}) error:`, error.message);
+                resolve({ path: target.path, format: target.format, error: error ? error.message : null });
+            };
+
+            command.on('error', finish).on('end', () => finish(null)).run();
+        });
+        encoder.finished = encoder.result.then(() => undefined);
+
+        return encoder;
+    }
+}
+
+module.exports = EncoderFanout;
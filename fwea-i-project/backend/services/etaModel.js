@@ -0,0 +1,127 @@
+const path = require('path');
+const Metrics = require('./metrics');
+
+// CleanPipeline.process() stages, in order
+const STAGES = ['analyzing', 'language-detection', 'content-scanning', 'processing', 'preview'];
+
+// Seconds of wall time per second of audio before any job has been seen
+const DEFAULT_RATES = {
+    'analyzing': 0.02,
+    'language-detection': 0.15,
+    'content-scanning': 0.002,
+    'processing': 0.02,
+    'preview': 0.05
+};
+
+// Rough upload bytes per second of audio, to guess duration before probing
+const BYTES_PER_SECOND = { '.wav': 176400, '.aiff': 176400, '.flac': 100000 };
+const DEFAULT_BYTES_PER_SECOND = 32000;
+
+// Per-stage processing cost, fitted online from finished stages.
+//
+// Each stage's cost is modelled as seconds per audio-second (the preview
+// stage per preview-second), tracked as an exponentially weighted average
+// at three levels: stage + input format + length class, stage + format, and
+// stage alone. An estimate uses the most specific level with at least
+// MIN_SAMPLES observations and falls back to DEFAULT_RATES. Rates are kept
+// in memory per instance and relearned after a restart.
+//
+// A job profile is { format, duration, previewDuration }; see profileFor().
+class EtaModel {
+    static STAGES = STAGES;
+    static ALPHA = 0.2;
+    static MIN_SAMPLES = 3;
+
+    // key -> { rate, samples }
+    static rates = new Map();
+
+    static profileFor({ originalName = '', fileSize = 0, duration = null, previewDuration = 30 }) {
+        const format = path.extname(originalName).slice(1).toLowerCase() || 'unknown';
+        const estimated = fileSize / (BYTES_PER_SECOND[`.${format}`] || DEFAULT_BYTES_PER_SECOND);
+        return { format, duration: Math.max(1, duration || estimated), previewDuration };
+    }
+
+    static lengthClass(duration) {
+        if (duration < 60) return 'short';
+        if (duration < 600) return 'medium';
+        return 'long';
+    }
+
+    static keys(stage, profile) {
+        return [
+            `${stage}|${profile.format}|${EtaModel.lengthClass(profile.duration)}`,
+            `${stage}|${profile.format}`,
+            stage
+        ];
+    }
+
+    // Audio-seconds a stage works through
+    static basis(stage, profile) {
+        return stage === 'preview' ? Math.min(profile.duration, profile.previewDuration || 30) : profile.duration;
+    }
+
+    // Records that `stage` took `seconds` for a job with `profile`
+    static record(stage, profile, seconds) {
+        const basis = EtaModel.basis(stage, profile);
+        if (!(basis > 0) || !(seconds >= 0)) return;
+
+        const rate = seconds / basis;
+        for (const key of EtaModel.keys(stage, profile)) {
+            const entry = EtaModel.rates.get(key);
+            if (entry) {
+                entry.rate += EtaModel.ALPHA * (rate - entry.rate);
+                entry.samples++;
+            } else {
+                EtaModel.rates.set(key, { rate, samples: 1 });
+            }
+        }
+        Metrics.increment('eta.samples');
+    }
+
+    static rate(stage, profile) {
+        for (const key of EtaModel.keys(stage, profile)) {
+            const entry = EtaModel.rates.get(key);
+            if (entry && entry.samples >= EtaModel.MIN_SAMPLES) return entry.rate;
+        }
+        return DEFAULT_RATES[stage];
+    }
+
+    // Estimated seconds for one stage
+    static stageSeconds(stage, profile) {
+        return EtaModel.rate(stage, profile) * EtaModel.basis(stage, profile);
+    }
+
+    // Estimated seconds for the whole pipeline
+    static total(profile) {
+        return STAGES.reduce((sum, stage) => sum + EtaModel.stageSeconds(stage, profile), 0);
+    }
+
+    // { remaining, progress } for a job `elapsedInStage` seconds into `stage`:
+    // seconds left, and the percentage of the estimated work already done
+    static remaining(stage, profile, elapsedInStage = 0) {
+        const index = STAGES.indexOf(stage);
+        let done = 0;
+        let remaining = 0;
+
+        STAGES.forEach((current, i) => {
+            const seconds = EtaModel.stageSeconds(current, profile);
+            if (i < index) {
+                done += seconds;
+            } else if (i === index) {
+                const spent = Math.min(elapsedInStage, seconds);
+                done += spent;
+                remaining += seconds - spent;
+            } else {
+                remaining += seconds;
+            }
+        });
+
+        const total = done + remaining;
+        return {
+            remaining,
+            progress: total > 0 ? Math.min(99, (done / total) * 100) : 0
+        };
+    }
+}
+
+module.exports = EtaModel;
@@ -0,0 +1,137 @@
+// Real-input FFT for spectrograms.
+//
+// An N-point real transform runs as an N/2-point complex radix-2 FFT (even
+// samples as the real part, odd as the imaginary) plus one split pass, so it
+// costs about half a complex N-point FFT. Bit-reversal order, twiddles and
+// the window are computed once per instance; transforms allocate nothing.
+// powerSpectrumBatch() runs many hops over one buffer for the spectrogram.
+class FFT {
+    static WINDOWS = {
+        rectangular: () => 1,
+        hann: (n, N) => 0.5 - 0.5 * Math.cos((2 * Math.PI * n) / N),
+        hamming: (n, N) => 0.54 - 0.46 * Math.cos((2 * Math.PI * n) / N),
+        blackman: (n, N) => 0.42 - 0.5 * Math.cos((2 * Math.PI * n) / N) + 0.08 * Math.cos((4 * Math.PI * n) / N),
+        'blackman-harris': (n, N) => 0.35875 - 0.48829 * Math.cos((2 * Math.PI * n) / N) +
+            0.14128 * Math.cos((4 * Math.PI * n) / N) - 0.01168 * Math.cos((6 * Math.PI * n) / N)
+    };
+
+    constructor(size, windowFunction = 'hann') {
+        if (size < 4 || (size & (size - 1)) !== 0) {
+            throw new Error(`FFT size must be a power of two >= 4, got ${size}`);
+        }
+        const window = FFT.WINDOWS[windowFunction];
+        if (!window) {
+            throw new Error(`Unknown window function: ${windowFunction}`);
+        }
+
+        this.size = size;
+        this.half = size / 2;
+        this.bins = this.half + 1;
+        this.windowFunction = windowFunction;
+
+        // Periodic window (DFT-even), and its sum for amplitude normalisation
+        this.window = new Float64Array(size);
+        let sum = 0;
+        for (let n = 0; n < size; n++) {
+            this.window[n] = window(n, size);
+            sum += this.window[n];
+        }
+        this.windowSum = sum;
+
+        const half = this.half;
+        this.reversed = new Uint32Array(half);
+        const bits = Math.log2(half);
+        for (let i = 0; i < half; i++) {
+            let reversed = 0;
+            for (let b = 0; b < bits; b++) reversed |= ((i >> b) & 1) << (bits - 1 - b);
+            this.reversed[i] = reversed;
+        }
+
+        // Twiddles for the half-size complex FFT, and for the real split pass
+        this.cos = new Float64Array(half / 2);
+        this.sin = new Float64Array(half / 2);
+        for (let i = 0; i < half / 2; i++) {
+            this.cos[i] = Math.cos((2 * Math.PI * i) / half);
+            this.sin[i] = -Math.sin((2 * Math.PI * i) / half);
+        }
+        this.splitCos = new Float64Array(half + 1);
+        this.splitSin = new Float64Array(half + 1);
+        for (let k = 0; k <= half; k++) {
+            this.splitCos[k] = Math.cos((2 * Math.PI * k) / size);
+            this.splitSin[k] = -Math.sin((2 * Math.PI * k) / size);
+        }
+
+        this.re = new Float64Array(half);
+        this.im = new Float64Array(half);
+    }
+
+    // |X[k]|^2 for k = 0..N/2 of `input[offset .. offset + N)` times the window
+    powerSpectrum(input, offset, output, outputOffset = 0) {
+        const { re, im, window, reversed, half } = this;
+
+        // Window and pack: z[n] = x[2n] + i x[2n+1], stored in bit-reversed order
+        for (let n = 0; n < half; n++) {
+            const target = reversed[n];
+            const i = offset + 2 * n;
+            re[target] = input[i] * window[2 * n];
+            im[target] = input[i + 1] * window[2 * n + 1];
+        }
+
+        this.transform();
+
+        // Split the half-size complex spectrum into the real-input spectrum
+        const { splitCos, splitSin } = this;
+        for (let k = 0; k <= half; k++) {
+            const a = k === half ? 0 : k;
+            const b = k === 0 ? 0 : half - k;
+            const zr = re[a], zi = im[a];
+            const cr = re[b], ci = -im[b];
+
+            const er = (zr + cr) / 2, ei = (zi + ci) / 2;
+            const or = (zi - ci) / 2, oi = -(zr - cr) / 2;
+            const wr = splitCos[k], wi = splitSin[k];
+
+            const xr = er + wr * or - wi * oi;
+            const xi = ei + wr * oi + wi * or;
+            output[outputOffset + k] = xr * xr + xi * xi;
+        }
+
+        return output;
+    }
+
+    // Power spectra of `count` frames starting every `hop` samples from
+    // `offset`; output holds count * bins values, frame after frame
+    powerSpectrumBatch(input, offset, hop, count, output) {
+        for (let f = 0; f < count; f++) {
+            this.powerSpectrum(input, offset + f * hop, output, f * this.bins);
+        }
+        return output;
+    }
+
+    // In-place iterative radix-2 over re/im (already in bit-reversed order)
+    transform() {
+        const { re, im, cos, sin, half } = this;
+
+        for (let size = 2; size <= half; size *= 2) {
+            const span = size / 2;
+            const step = half / size;
+
+            for (let start = 0; start < half; start += size) {
+                for (let j = 0, t = 0; j < span; j++, t += step) {
+                    const wr = cos[t], wi = sin[t];
+                    const even = start + j;
+                    const odd = even + span;
+
+                    const tr = re[odd] * wr - im[odd] * wi;
+                    const ti = re[odd] * wi + im[odd] * wr;
+                    re[odd] = re[even] - tr;
+                    im[odd] = im[even] - ti;
+                    re[even] += tr;
+                    im[even] += ti;
+                }
+            }
+        }
+    }
+}
+
+module.exports = FFT;
@@ -0,0 +1,311 @@
+const fs = require('fs').promises;
+const path = require('path');
+const mongoose = require('mongoose');
+const JobArtifacts = require('./jobArtifacts');
+const Metrics = require('./metrics');
+const RenderCache = require('./renderCache');
+
+const UUID_PREFIX = /^(?:preview_)?([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/i;
+const HOUR_MS = 60 * 60 * 1000;
+
+// Expiry cleanup for jobs, audio files and their files on disk.
+//
+// Both collections have a TTL index on expiresAt (schemas and mongo-init.js),
+// which deletes documents without touching their files. The janitor runs
+// ahead of it: each sweep takes documents expiring within TTL_LEAD_MS, deletes
+// their files, then deletes the documents itself, so the TTL monitor only
+// ever removes documents that had nothing on disk. A document whose files
+// can't be deleted has its expiresAt pushed back, so the TTL index can't
+// orphan them before the next attempt.
+//
+// Sweeps stream a cursor in (expiresAt, _id) order, BATCH_SIZE documents at a
+// time, with at most CONCURRENCY file deletions in flight, and checkpoint
+// after every batch (JanitorCheckpoint) so an interrupted run resumes where
+// it stopped. Orphan sweeps then catch anything the database no longer
+// references (artifact directories, uploads, old render cache entries).
+class Janitor {
+    static BATCH_SIZE = 200;
+    static CONCURRENCY = 8;
+    static INTERVAL_MS = parseInt(process.env.CLEANUP_INTERVAL, 10) || HOUR_MS;
+    static TTL_LEAD_MS = parseInt(process.env.JANITOR_TTL_LEAD_MS, 10) || 2 * Janitor.INTERVAL_MS + 10 * 60 * 1000;
+    static RENDER_CACHE_MAX_AGE_MS = parseInt(process.env.RENDER_CACHE_MAX_AGE_MS, 10) || 7 * 24 * HOUR_MS;
+    // Files younger than this may belong to an upload whose job isn't saved yet
+    static ORPHAN_MIN_AGE_MS = HOUR_MS;
+    static RETRY_DELAY_MS = 24 * HOUR_MS;
+    static UPLOAD_ROOT = 'uploads';
+
+    static running = null;
+    static timer = null;
+
+    static TARGETS = {
+        processingjobs: {
+            model: () => require('../models/ProcessingJob'),
+            fields: 'originalPath outputPath outputs previewPath',
+            files: job => Janitor.withDerived(job.originalPath).concat(
+                Janitor.ownedOutputs([job.outputPath, ...(job.outputs || []).map(output => output.path)]),
+                job.previewPath
+            ),
+            // Stored details and the decoded audio / transcript artifacts
+            removed: async ids => {
+                await require('../models/JobDetail').removeForJobs(ids);
+                await Janitor.forEachLimit(ids, Janitor.CONCURRENCY, id => JobArtifacts.forJob(id).remove());
+            }
+        },
+        audiofiles: {
+            model: () => require('../models/AudioFile'),
+            fields: 'originalPath processedPath previewPath waveformPath',
+            files: file => [file.originalPath, file.processedPath, file.previewPath, file.waveformPath],
+            removed: async () => {}
+        }
+    };
+
+    static start() {
+        if (Janitor.timer) return;
+        Janitor.timer = setInterval(() => Janitor.run(), Janitor.INTERVAL_MS);
+        Janitor.timer.unref();
+        Janitor.run();
+    }
+
+    // One full pass; overlapping calls share the run in progress
+    static run(now = new Date()) {
+        if (!Janitor.running) {
+            Janitor.running = Metrics.time('janitor.run', async () => {
+                if (mongoose.connection.readyState !== 1) return null;
+
+                const summary = {};
+                for (const name of Object.keys(Janitor.TARGETS)) {
+                    summary[name] = await Janitor.sweepExpired(name, now);
+                }
+                summary.orphanArtifacts = await Janitor.sweepOrphanArtifacts(now);
+                summary.orphanUploads = await Janitor.sweepOrphanUploads(now);
+                summary.renderCache = await Janitor.evictRenderCache(now);
+                console.log('🧹 Janitor run:', JSON.stringify(summary));
+                return summary;
+            })
+                .catch(error => {
+                    console.error('Janitor error:', error);
+                    return null;
+                })
+                .finally(() => { Janitor.running = null; });
+        }
+        return Janitor.running;
+    }
+
+    // Deletes documents of `name` expiring before now + TTL_LEAD_MS, files first.
+    // Returns { removed, retried }.
+    static async sweepExpired(name, now = new Date()) {
+        const target = Janitor.TARGETS[name];
+        const Model = target.model();
+        const Checkpoint = require('../models/JanitorCheckpoint');
+        const horizon = new Date(now.getTime() + Janitor.TTL_LEAD_MS);
+
+        const checkpoint = await Checkpoint.findOne({ name }).lean();
+        const query = { expiresAt: { $lte: horizon } };
+        if (checkpoint && checkpoint.lastExpiresAt) {
+            query.$or = [
+                { expiresAt: { $gt: checkpoint.lastExpiresAt } },
+                { expiresAt: checkpoint.lastExpiresAt, _id: { $gt: checkpoint.lastId } }
+            ];
+        }
+
+        const cursor = Model.find(query)
+            .select(`${target.fields} expiresAt`)
+            .sort({ expiresAt: 1, _id: 1 })
+            .lean()
+            .cursor({ batchSize: Janitor.BATCH_SIZE });
+
+        let removed = checkpoint ? checkpoint.removed : 0;
+        let retried = 0;
+        let batch = [];
+
+        const flush = async () => {
+            const result = await Janitor.removeBatch(Model, target, batch, now);
+            removed += result.removed;
+            retried += result.retried;
+
+            const last = batch[batch.length - 1];
+            await Checkpoint.updateOne({ name }, {
+                $set: { lastExpiresAt: last.expiresAt, lastId: last._id, removed, updatedAt: new Date() },
+                $setOnInsert: { runStartedAt: now }
+            }, { upsert: true });
+            batch = [];
+        };
+
+        for await (const doc of cursor) {
+            batch.push(doc);
+            if (batch.length >= Janitor.BATCH_SIZE) await flush();
+        }
+        if (batch.length > 0) await flush();
+
+        // Finished: the next run starts from the beginning
+        await Checkpoint.deleteOne({ name });
+        Metrics.increment(`janitor.${name}.removed`, removed);
+        return { removed, retried };
+    }
+
+    static async removeBatch(Model, target, docs, now) {
+        const done = [];
+        const failed = [];
+
+        await Janitor.forEachLimit(docs, Janitor.CONCURRENCY, async doc => {
+            const files = [...new Set(target.files(doc).filter(Boolean))];
+            const results = await Promise.all(files.map(Janitor.unlink));
+            (results.every(Boolean) ? done : failed).push(doc._id);
+        });
+
+        if (done.length > 0) {
+            await Model.deleteMany({ _id: { $in: done } });
+            await target.removed(done);
+        }
+        if (failed.length > 0) {
+            // Keep the TTL index off these until the files are gone
+            await Model.updateMany({ _id: { $in: failed } }, {
+                $set: { expiresAt: new Date(now.getTime() + Janitor.TTL_LEAD_MS + Janitor.RETRY_DELAY_MS) }
+            });
+        }
+
+        return { removed: done.length, retried: failed.length };
+    }
+
+    // Artifact directories (named by job id) whose job no longer exists
+    static async sweepOrphanArtifacts(now = new Date()) {
+        const ProcessingJob = require('../models/ProcessingJob');
+        const root = JobArtifacts.root();
+        const names = (await Janitor.oldEntries(root, now, true))
+            .filter(name => mongoose.Types.ObjectId.isValid(name));
+        let removed = 0;
+
+        for (let i = 0; i < names.length; i += Janitor.BATCH_SIZE) {
+            const ids = names.slice(i, i + Janitor.BATCH_SIZE);
+            const live = new Set((await ProcessingJob.find({ _id: { $in: ids } }).select('_id').lean())
+                .map(job => String(job._id)));
+            const orphans = ids.filter(id => !live.has(id));
+
+            await Janitor.forEachLimit(orphans, Janitor.CONCURRENCY, id => JobArtifacts.forJob(id).remove());
+            removed += orphans.length;
+        }
+        return removed;
+    }
+
+    // Uploads, previews and converted files whose upload id no job or audio
+    // file references any more
+    static async sweepOrphanUploads(now = new Date()) {
+        const ProcessingJob = require('../models/ProcessingJob');
+        const AudioFile = require('../models/AudioFile');
+        let removed = 0;
+
+        for (const directory of ['', 'previews', 'processed']) {
+            const root = path.join(Janitor.UPLOAD_ROOT, directory);
+            const byId = new Map();
+            for (const name of await Janitor.oldEntries(root, now, false)) {
+                const match = UUID_PREFIX.exec(name);
+                if (!match) continue;
+                const id = match[1].toLowerCase();
+                if (!byId.has(id)) byId.set(id, []);
+                byId.get(id).push(path.join(root, name));
+            }
+
+            const ids = [...byId.keys()];
+            for (let i = 0; i < ids.length; i += Janitor.BATCH_SIZE) {
+                const chunk = ids.slice(i, i + Janitor.BATCH_SIZE);
+                const prefixes = chunk.map(id => new RegExp(`^${id}`));
+                const [jobs, files] = await Promise.all([
+                    ProcessingJob.find({ filename: { $in: prefixes } }).select('filename').lean(),
+                    AudioFile.find({ filename: { $in: prefixes } }).select('filename').lean()
+                ]);
+                const live = new Set([...jobs, ...files]
+                    .map(doc => (UUID_PREFIX.exec(doc.filename) || [])[1])
+                    .filter(Boolean)
+                    .map(id => id.toLowerCase()));
+
+                const orphans = chunk.filter(id => !live.has(id)).flatMap(id => byId.get(id));
+                await Janitor.forEachLimit(orphans, Janitor.CONCURRENCY, Janitor.unlink);
+                removed += orphans.length;
+            }
+        }
+        return removed;
+    }
+
+    // Render cache entries not written for RENDER_CACHE_MAX_AGE_MS; a later
+    // download re-renders them from the job's clean PCM
+    static async evictRenderCache(now = new Date()) {
+        const root = RenderCache.root();
+        let entries;
+        try {
+            entries = await fs.readdir(root);
+        } catch (error) {
+            if (error.code === 'ENOENT') return 0;
+            throw error;
+        }
+
+        let removed = 0;
+        await Janitor.forEachLimit(entries, Janitor.CONCURRENCY, async name => {
+            const file = path.join(root, name);
+            const stats = await fs.stat(file).catch(() => null);
+            if (!stats || !stats.isFile()) return;
+
+            const maxAge = name.endsWith('.partial') ? Janitor.ORPHAN_MIN_AGE_MS : Janitor.RENDER_CACHE_MAX_AGE_MS;
+            if (now - stats.mtimeMs > maxAge && await Janitor.unlink(file)) removed++;
+        });
+        return removed;
+    }
+
+    // Entries of `directory` (directories or files) older than ORPHAN_MIN_AGE_MS
+    static async oldEntries(directory, now, directories) {
+        let entries;
+        try {
+            entries = await fs.readdir(directory, { withFileTypes: true });
+        } catch (error) {
+            if (error.code === 'ENOENT') return [];
+            throw error;
+        }
+
+        const old = [];
+        await Janitor.forEachLimit(entries, Janitor.CONCURRENCY, async entry => {
+            if (directories ? !entry.isDirectory() : !entry.isFile()) return;
+            const stats = await fs.stat(path.join(directory, entry.name)).catch(() => null);
+            if (stats && now - stats.mtimeMs > Janitor.ORPHAN_MIN_AGE_MS) old.push(entry.name);
+        });
+        return old;
+    }
+
+    // The upload plus files derived next to it (WAV for transcription, _clean fallback output)
+    static withDerived(originalPath) {
+        if (!originalPath) return [];
+        const extension = path.extname(originalPath);
+        const base = originalPath.slice(0, originalPath.length - extension.length);
+        return [originalPath, `${base}.wav`, `${base}_clean${extension}`];
+    }
+
+    // Outputs outside the render cache; cached renders are shared between
+    // jobs with the same upload and are evicted by age instead
+    static ownedOutputs(paths) {
+        const cacheRoot = path.resolve(RenderCache.root()) + path.sep;
+        return paths.filter(file => file && !path.resolve(file).startsWith(cacheRoot));
+    }
+
+    // true when the file is gone (deleted or already missing)
+    static async unlink(file) {
+        try {
+            await fs.unlink(file);
+            return true;
+        } catch (error) {
+            if (error.code === 'ENOENT') return true;
+            console.error(`Janitor could not delete ${file}:`, error.message);
+            return false;
+        }
+    }
+
+    static async forEachLimit(items, limit, fn) {
+        let next = 0;
+        const workers = Array.from({ length: Math.min(limit, items.length) }, async () => {
+            while (next < items.length) {
+                const item = items[next++];
+                await fn(item);
+            }
+        });
+        await Promise.all(workers);
+    }
+}
+
+module.exports = Janitor;
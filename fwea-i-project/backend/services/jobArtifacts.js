@@ -0,0 +1,147 @@
+const ffmpeg = require('fluent-ffmpeg');
+const fs = require('fs').promises;
+const path = require('path');
+const PcmRenderer = require('./pcmRenderer');
+const TimeIndex = require('./timeIndex');
+
+const DEFAULT_ARTIFACT_PATH = path.join(__dirname, '..', 'artifacts');
+
+// Per-job intermediate results kept after processing so a re-clean can skip
+// transcription and decoding:
+//
+//   transcript.json  languages, segments and word alignments from Whisper
+//   mask.json        current mute mask, the version it was built from and the
+//                    render settings (censor mode, fades) it was applied with
+//   source.pcm       decoded input, raw s16le at PcmRenderer.FORMAT
+//   clean.pcm        source.pcm with the current mask applied
+//   transients.json  peak and onset TimeIndex data (absolute seconds)
+//
+// Lives outside uploads/ so none of it is served statically.
+class JobArtifacts {
+    static root() {
+        return process.env.ARTIFACT_PATH || DEFAULT_ARTIFACT_PATH;
+    }
+
+    constructor(jobId) {
+        this.jobId = String(jobId);
+        this.directory = path.join(JobArtifacts.root(), path.basename(this.jobId));
+    }
+
+    static forJob(jobId) {
+        return new JobArtifacts(jobId);
+    }
+
+    get sourcePcmPath() {
+        return this.path('source.pcm');
+    }
+
+    get cleanPcmPath() {
+        return this.path('clean.pcm');
+    }
+
+    // Speech-only WAV sent for transcription, removed once transcribed
+    get speechWavPath() {
+        return this.path('speech.wav');
+    }
+
+    path(name) {
+        return path.join(this.directory, name);
+    }
+
+    async ensure() {
+        await fs.mkdir(this.directory, { recursive: true });
+        return this;
+    }
+
+    async exists(name) {
+        try {
+            await fs.access(this.path(name));
+            return true;
+        } catch (error) {
+            return false;
+        }
+    }
+
+    async writeJson(name, data) {
+        await this.ensure();
+        // Write then rename so a crash never leaves a half-written artifact
+        const target = this.path(name);
+        await fs.writeFile(`${target}.tmp`, JSON.stringify(data));
+        await fs.rename(`${target}.tmp`, target);
+    }
+
+    async readJson(name) {
+        try {
+            return JSON.parse(await fs.readFile(this.path(name), 'utf8'));
+        } catch (error) {
+            if (error.code === 'ENOENT') return null;
+            throw error;
+        }
+    }
+
+    saveTranscript({ languages, segments, words }) {
+        return this.writeJson('transcript.json', { languages, segments, words: words || [] });
+    }
+
+    loadTranscript() {
+        return this.readJson('transcript.json');
+    }
+
+    saveMask(version, intervals, render = null) {
+        return this.writeJson('mask.json', { version, intervals, render });
+    }
+
+    loadMask() {
+        return this.readJson('mask.json');
+    }
+
+    // transients: { peaks, onsets } TimeIndex instances
+    async saveTransients(transients) {
+        await this.writeJson('transients.json', {
+            peaks: transients.peaks.toJSON(),
+            onsets: transients.onsets.toJSON()
+        });
+        TimeIndex.forget(this, 'transients.json');
+    }
+
+    // TimeIndex of 'peaks' or 'onsets', or null before analysis
+    loadTransients(kind) {
+        return TimeIndex.load(this, 'transients.json', kind);
+    }
+
+    // Decodes the input once to source.pcm. Resolves with the PCM format, or null
+    // when ffmpeg is unavailable or the decode fails.
+    async decode(inputPath, format = PcmRenderer.FORMAT) {
+        await this.ensure();
+        const target = this.sourcePcmPath;
+
+        return new Promise(resolve => {
+            ffmpeg.getAvailableFormats(err => {
+                if (err) {
+                    console.warn('FFmpeg not available, skipping PCM decode');
+                    resolve(null);
+                    return;
+                }
+
+                ffmpeg(inputPath)
+                    .noVideo()
+                    .audioCodec('pcm_s16le')
+                    .audioFrequency(format.sampleRate)
+                    .audioChannels(format.channels)
+                    .format('s16le')
+                    .on('error', error => {
+                        console.error('PCM decode error:', error);
+                        resolve(null);
+                    })
+                    .on('end', () => resolve(format))
+                    .save(target);
+            });
+        });
+    }
+
+    async remove() {
+        await fs.rm(this.directory, { recursive: true, force: true });
+    }
+}
+
+module.exports = JobArtifacts;
@@ -0,0 +1,181 @@
+const Metrics = require('./metrics');
+
+// Priority lanes by subscription tier. Anonymous uploads are single-track
+// buyers and share the 'normal' lane with Single and Day Pass accounts.
+const TIER_LANES = {
+    'studio-elite': 'urgent',
+    'dj-pro': 'high',
+    'day-pass': 'normal',
+    'single': 'normal'
+};
+const LANE_WEIGHTS = { urgent: 8, high: 4, normal: 2, low: 1 };
+
+// Start-time fair queuing over processing jobs.
+//
+// Every (lane, user) pair is a flow with its lane's weight; anonymous jobs
+// are each their own flow. A job's start tag is max(virtual time, its
+// flow's previous finish tag) and its finish tag adds cost / weight, where
+// cost is EtaModel's estimate of its processing seconds. Up to
+// MAX_CONCURRENT jobs run at once, and a free slot goes to the queued job
+// with the smallest start tag. So a user who submits 500 tracks only advances their own
+// flow's tags: a single-track buyer arriving later is tagged at the current
+// virtual time and runs at the next free slot, while higher lanes still get
+// proportionally more of the slots when everyone is busy.
+//
+// Queue latency is recorded per lane as the scheduler.wait.<lane> timing.
+// expectedWait() packs the queue onto the worker slots by predicted finish
+// time to tell a queued job when it should start.
+class JobScheduler {
+    static MAX_CONCURRENT = parseInt(process.env.MAX_CONCURRENT_JOBS, 10) || 5;
+    static TIER_LANES = TIER_LANES;
+    static LANE_WEIGHTS = LANE_WEIGHTS;
+
+    static virtualTime = 0;
+    // flow key -> { lane, weight, finish, queue: [{ id, cost, start, finish, queuedAt, run }] }
+    // cost is in estimated seconds
+    static flows = new Map();
+    static running = new Map();
+    static queued = 0;
+
+    static laneFor(tier) {
+        return TIER_LANES[tier] || 'normal';
+    }
+
+    // Queues `run` (returns a promise) and starts it when its turn comes.
+    // `cost` is the job's estimated processing seconds (EtaModel.total()).
+    // Returns the job's queue position at submission (0 = started now).
+    static submit({ id, lane = 'normal', user = null, cost = 1, run }) {
+        const key = user ? `${lane}:${user}` : `${lane}:job:${id}`;
+        let flow = JobScheduler.flows.get(key);
+        if (!flow) {
+            flow = { lane, weight: LANE_WEIGHTS[lane] || 1, finish: 0, queue: [] };
+            JobScheduler.flows.set(key, flow);
+        }
+
+        const start = Math.max(JobScheduler.virtualTime, flow.finish);
+        flow.finish = start + cost / flow.weight;
+        flow.queue.push({ id: String(id), cost, start, finish: flow.finish, queuedAt: Date.now(), run });
+        JobScheduler.queued++;
+        Metrics.increment(`scheduler.submitted.${lane}`);
+
+        const position = JobScheduler.position(id);
+        JobScheduler.dispatch();
+        return JobScheduler.running.has(String(id)) ? 0 : position;
+    }
+
+    static dispatch() {
+        while (JobScheduler.running.size < JobScheduler.MAX_CONCURRENT && JobScheduler.queued > 0) {
+            let next = null;
+            let nextKey = null;
+            for (const [key, flow] of JobScheduler.flows) {
+                const head = flow.queue[0];
+                if (head && (!next || head.start < next.start)) {
+                    next = head;
+                    nextKey = key;
+                }
+            }
+
+            const flow = JobScheduler.flows.get(nextKey);
+            flow.queue.shift();
+            JobScheduler.queued--;
+            JobScheduler.virtualTime = Math.max(JobScheduler.virtualTime, next.start);
+            JobScheduler.evictIdleFlows();
+
+            Metrics.recordTiming(`scheduler.wait.${flow.lane}`, Date.now() - next.queuedAt);
+            JobScheduler.running.set(next.id, { lane: flow.lane, startedAt: Date.now(), cost: next.cost });
+
+            Promise.resolve()
+                .then(next.run)
+                .catch(error => console.error(`Scheduled job ${next.id} failed:`, error))
+                .finally(() => {
+                    JobScheduler.running.delete(next.id);
+                    JobScheduler.dispatch();
+                });
+        }
+    }
+
+    // Flows with nothing queued whose tags are behind virtual time carry no state
+    static evictIdleFlows() {
+        for (const [key, flow] of JobScheduler.flows) {
+            if (flow.queue.length === 0 && flow.finish <= JobScheduler.virtualTime) {
+                JobScheduler.flows.delete(key);
+            }
+        }
+    }
+
+    // Whether the job is queued or running here
+    static has(id) {
+        const target = String(id);
+        if (JobScheduler.running.has(target)) return true;
+        for (const flow of JobScheduler.flows.values()) {
+            if (flow.queue.some(queued => queued.id === target)) return true;
+        }
+        return false;
+    }
+
+    // 1-based position among queued jobs in dispatch order, or 0 when not queued
+    static position(id) {
+        const target = String(id);
+        let tag = null;
+        for (const flow of JobScheduler.flows.values()) {
+            const job = flow.queue.find(queued => queued.id === target);
+            if (job) tag = job.start;
+        }
+        if (tag === null) return 0;
+
+        let ahead = 0;
+        for (const flow of JobScheduler.flows.values()) {
+            for (const job of flow.queue) {
+                if (job.start < tag) ahead++;
+                else break;
+            }
+        }
+        return ahead + 1;
+    }
+
+    // Estimated seconds until a queued job starts (0 when running or unknown).
+    // Queued jobs are taken in dispatch order and each is placed on the slot
+    // that frees up first, running jobs occupying theirs until their
+    // estimated finish.
+    static expectedWait(id, now = Date.now()) {
+        const target = String(id);
+        if (JobScheduler.running.has(target)) return 0;
+
+        const slots = [];
+        for (const job of JobScheduler.running.values()) {
+            slots.push(Math.max(0, job.startedAt / 1000 + job.cost - now / 1000));
+        }
+        while (slots.length < JobScheduler.MAX_CONCURRENT) slots.push(0);
+
+        const queue = [];
+        for (const flow of JobScheduler.flows.values()) queue.push(...flow.queue);
+        queue.sort((a, b) => a.start - b.start);
+
+        for (const job of queue) {
+            let slot = 0;
+            for (let i = 1; i < slots.length; i++) {
+                if (slots[i] < slots[slot]) slot = i;
+            }
+            if (job.id === target) return slots[slot];
+            slots[slot] += job.cost;
+        }
+        return 0;
+    }
+
+    // Queued and running jobs per lane, for /api/metrics
+    static snapshot() {
+        const lanes = {};
+        for (const lane of Object.keys(LANE_WEIGHTS)) {
+            lanes[lane] = { queued: 0, running: 0 };
+        }
+        for (const flow of JobScheduler.flows.values()) {
+            lanes[flow.lane].queued += flow.queue.length;
+        }
+        for (const job of JobScheduler.running.values()) {
+            lanes[job.lane].running++;
+        }
+        return { maxConcurrent: JobScheduler.MAX_CONCURRENT, lanes };
+    }
+}
+
+module.exports = JobScheduler;
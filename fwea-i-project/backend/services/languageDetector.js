@@ -9,7 +9,8 @@ class LanguageDetector {
         }) : null;
     }
 
-    static async detect(audioPath) {
+    // options.wav: audioPath is already a 16-bit PCM WAV, skip conversion
+    static async detect(audioPath, options = {}) {
         const detector = new LanguageDetector();
 
         // If no OpenAI key, return default languages
@@ -26,20 +27,22 @@ class LanguageDetector {
                         language: 'en'
                     }
                 ],
+                words: [],
                 confidence: 0.85
             };
         }
 
         try {
             // Convert to format compatible with Whisper API
-            const wavPath = await AudioProcessor.convertToWav(audioPath);
+            const wavPath = options.wav ? audioPath : await AudioProcessor.convertToWav(audioPath);
 
             // Use OpenAI Whisper for language detection
             const transcription = await detector.openai.audio.transcriptions.create({
                 file: fs.createReadStream(wavPath),
                 model: "whisper-1",
                 response_format: "verbose_json",
-                timestamp_granularities: ["segment"]
+                // Word timings let the mute mask cover single words instead of whole segments
+                timestamp_granularities: ["segment", "word"]
             });
 
             // Extract languages from segments
@@ -88,6 +91,7 @@ class LanguageDetector {
                 languages: languageNames,
                 transcription: transcription.text,
                 segments: transcription.segments || [],
+                words: transcription.words || [],
                 confidence: transcription.confidence || 0.8
             };
 
@@ -99,6 +103,7 @@ class LanguageDetector {
                 languages: ['English'],
                 transcription: 'Error during transcription',
                 segments: [],
+                words: [],
                 confidence: 0.5,
                 error: error.message
             };
@@ -0,0 +1,221 @@
+const fs = require('fs');
+const path = require('path');
+const EventEmitter = require('events');
+const BadWords = require('bad-words');
+const PhoneticIndex = require('./phoneticIndex');
+const ProfanityMatcher = require('./profanityMatcher');
+
+const DEFAULT_LEXICON_PATH = path.join(__dirname, '..', 'data', 'lexicons');
+
+// Process-wide registry of profanity lexicons.
+// Each language lives in data/lexicons/<language>.json and is only read and
+// compiled the first time it is needed. Compiled matchers are cached per
+// language set and dropped again when the underlying file changes on disk.
+class LexiconStore extends EventEmitter {
+    constructor(directory = process.env.LEXICON_PATH || DEFAULT_LEXICON_PATH) {
+        super();
+        this.directory = directory;
+        this.lexicons = new Map();
+        this.matchers = new Map();
+        this.phoneticIndexes = new Map();
+        this.watcher = null;
+        this.reloadTimers = new Map();
+
+        // The bad-words base list is English-only and never changes at runtime
+        this.baseWords = new BadWords().list;
+    }
+
+    static getInstance() {
+        if (!LexiconStore.instance) {
+            LexiconStore.instance = new LexiconStore();
+
+            if (process.env.LEXICON_HOT_RELOAD !== 'false') {
+                LexiconStore.instance.watch();
+            }
+        }
+        return LexiconStore.instance;
+    }
+
+    static normalizeLanguage(language) {
+        return String(language || '').trim().toLowerCase();
+    }
+
+    getLexicon(language) {
+        const langKey = LexiconStore.normalizeLanguage(language);
+        if (!langKey) return null;
+
+        if (this.lexicons.has(langKey)) {
+            return this.lexicons.get(langKey);
+        }
+
+        let lexicon = null;
+        const filePath = path.join(this.directory, `${path.basename(langKey)}.json`);
+
+        try {
+            const data = JSON.parse(fs.readFileSync(filePath, 'utf8'));
+            lexicon = {
+                language: langKey,
+                version: data.version || 1,
+                words: Object.freeze((data.words || []).map(word => word.normalize('NFC').toLowerCase())),
+                // Ordinary words that sound like profanity and must not fuzzy-match
+                allow: Object.freeze((data.allow || []).map(word => word.normalize('NFC').toLowerCase()))
+            };
+        } catch (error) {
+            if (error.code !== 'ENOENT') {
+                console.error(`Failed to load lexicon ${langKey}:`, error);
+            }
+        }
+
+        // Cache misses too, so unknown languages don't hit the disk on every call
+        this.lexicons.set(langKey, lexicon);
+        return lexicon;
+    }
+
+    getWords(language) {
+        const lexicon = this.getLexicon(language);
+        return lexicon ? lexicon.words : [];
+    }
+
+    // Compiled matcher covering the bad-words base list plus every requested language
+    getMatcher(languages = []) {
+        const lexicons = this.resolve(languages);
+        const cacheKey = lexicons.map(lexicon => lexicon.language).join('|');
+
+        if (this.matchers.has(cacheKey)) {
+            return this.matchers.get(cacheKey);
+        }
+
+        const entries = this.baseWords.map(word => ({
+            term: word,
+            source: 'badwords',
+            wholeWord: true
+        }));
+
+        for (const lexicon of lexicons) {
+            for (const word of lexicon.words) {
+                entries.push({ term: word, source: lexicon.language, wholeWord: false });
+            }
+        }
+
+        const matcher = ProfanityMatcher.compile(entries);
+        this.matchers.set(cacheKey, matcher);
+        return matcher;
+    }
+
+    // Fuzzy (phonetic / edit distance) index over the same words as getMatcher
+    getPhoneticIndex(languages = []) {
+        const lexicons = this.resolve(languages);
+        const cacheKey = lexicons.map(lexicon => lexicon.language).join('|');
+
+        if (this.phoneticIndexes.has(cacheKey)) {
+            return this.phoneticIndexes.get(cacheKey);
+        }
+
+        const entries = [];
+        const allow = [];
+        for (const lexicon of lexicons) {
+            allow.push(...lexicon.allow);
+            for (const word of lexicon.words) {
+                entries.push({ term: word, source: lexicon.language });
+            }
+        }
+        // The base list is full of pre-obfuscated spellings ("sh1ter", "t1tt1e5") that
+        // the exact matcher already covers; relaxing those as well just invites noise
+        for (const word of this.baseWords) {
+            if (/^[a-z]{4,}$/i.test(word)) {
+                entries.push({ term: word, source: 'badwords' });
+            }
+        }
+        // The base list is English, so its sound-alikes live in the English allow list
+        const english = this.getLexicon('english');
+        if (english && !lexicons.includes(english)) {
+            allow.push(...english.allow);
+        }
+
+        const index = PhoneticIndex.build(entries, allow);
+        this.phoneticIndexes.set(cacheKey, index);
+        return index;
+    }
+
+    // Version string for a language set, e.g. "english@1,spanish@3"
+    getVersion(languages = []) {
+        return this.resolve(languages)
+            .map(lexicon => `${lexicon.language}@${lexicon.version}`)
+            .join(',');
+    }
+
+    resolve(languages) {
+        const seen = new Set();
+        const lexicons = [];
+
+        for (const language of languages) {
+            const langKey = LexiconStore.normalizeLanguage(language);
+            if (seen.has(langKey)) continue;
+            seen.add(langKey);
+
+            const lexicon = this.getLexicon(langKey);
+            if (lexicon) lexicons.push(lexicon);
+        }
+
+        return lexicons.sort((a, b) => a.language.localeCompare(b.language));
+    }
+
+    preload(languages = []) {
+        for (const language of languages) {
+            this.getMatcher([language]);
+        }
+    }
+
+    invalidate(language) {
+        const langKey = LexiconStore.normalizeLanguage(language);
+        this.lexicons.delete(langKey);
+
+        for (const cache of [this.matchers, this.phoneticIndexes]) {
+            for (const cacheKey of cache.keys()) {
+                if (cacheKey.split('|').includes(langKey)) {
+                    cache.delete(cacheKey);
+                }
+            }
+        }
+
+        // Negative cache entries may hide a newly added language file
+        for (const [key, lexicon] of this.lexicons) {
+            if (lexicon === null) this.lexicons.delete(key);
+        }
+
+        this.emit('reload', langKey);
+    }
+
+    watch() {
+        if (this.watcher) return;
+
+        try {
+            this.watcher = fs.watch(this.directory, (eventType, filename) => {
+                if (!filename || !filename.endsWith('.json')) return;
+
+                // Editors fire several events per save; reload once they settle
+                const langKey = path.basename(filename, '.json');
+                clearTimeout(this.reloadTimers.get(langKey));
+                const timer = setTimeout(() => {
+                    this.reloadTimers.delete(langKey);
+                    this.invalidate(langKey);
+                    console.log(`🔄 Reloaded profanity lexicon: ${langKey}`);
+                }, 100);
+                timer.unref();
+                this.reloadTimers.set(langKey, timer);
+            });
+            this.watcher.unref();
+        } catch (error) {
+            console.warn('Lexicon hot reload unavailable:', error.message);
+        }
+    }
+
+    close() {
+        if (this.watcher) {
+            this.watcher.close();
+            this.watcher = null;
+        }
+    }
+}
+
+module.exports = LexiconStore;
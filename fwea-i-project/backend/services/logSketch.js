@@ -0,0 +1,69 @@
+// Mergeable quantile sketch over positive values (log-spaced buckets, as in
+// DDSketch). A value v lands in bucket ceil(log_gamma(v)) with
+// gamma = (1 + a) / (1 - a), so any quantile it returns is within relative
+// error `a` (1%) of a value in the data. Sketches merge by adding bucket
+// counts, which is what lets JobRollup store one per hour and answer any
+// window's percentiles from the rollups alone.
+//
+// Buckets are a plain { index: count } object (zero and negative values count
+// under "zero") so they can be $inc'ed in place in MongoDB.
+const RELATIVE_ACCURACY = 0.01;
+const GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY);
+const LOG_GAMMA = Math.log(GAMMA);
+
+class LogSketch {
+    static RELATIVE_ACCURACY = RELATIVE_ACCURACY;
+
+    constructor(buckets = {}) {
+        this.buckets = {};
+        this.count = 0;
+        this.merge(buckets);
+    }
+
+    static key(value) {
+        return value > 0 ? String(Math.ceil(Math.log(value) / LOG_GAMMA)) : 'zero';
+    }
+
+    add(value, count = 1) {
+        const key = LogSketch.key(value);
+        this.buckets[key] = (this.buckets[key] || 0) + count;
+        this.count += count;
+        return this;
+    }
+
+    // Adds another sketch or its bucket object
+    merge(other) {
+        const buckets = other instanceof LogSketch ? other.buckets : other || {};
+        for (const [key, count] of Object.entries(buckets)) {
+            this.buckets[key] = (this.buckets[key] || 0) + count;
+            this.count += count;
+        }
+        return this;
+    }
+
+    // Approximate q-quantile (0..1), or null when empty
+    quantile(q) {
+        if (this.count === 0) return null;
+
+        const rank = Math.max(0, Math.min(1, q)) * (this.count - 1);
+        let seen = this.buckets.zero || 0;
+        if (seen > rank) return 0;
+
+        const indexes = Object.keys(this.buckets)
+            .filter(key => key !== 'zero')
+            .map(Number)
+            .sort((a, b) => a - b);
+
+        for (const index of indexes) {
+            seen += this.buckets[index];
+            if (seen > rank) return (2 * Math.pow(GAMMA, index)) / (GAMMA + 1);
+        }
+        return (2 * Math.pow(GAMMA, indexes[indexes.length - 1])) / (GAMMA + 1);
+    }
+
+    toJSON() {
+        return { ...this.buckets };
+    }
+}
+
+module.exports = LogSketch;
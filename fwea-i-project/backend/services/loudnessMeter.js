@@ -0,0 +1,337 @@
+// Streaming EBU R128 loudness meter (ITU-R BS.1770-4) for interleaved s16 PCM.
+//
+// push() takes blocks of any size; per channel the block is K-weighted
+// (pre-filter shelf + RLB high-pass, one pass of a combined biquad cascade)
+// and squared into 100 ms sub-block energies. Everything else is derived from
+// those at the end:
+//
+//   integrated     400 ms blocks, 75% overlap, -70 LUFS absolute and
+//                  -10 LU relative gate
+//   loudnessRange  3 s short-term windows every 100 ms, -70 LUFS absolute and
+//                  -20 LU relative gate, 95th - 10th percentile
+//   truePeak       4x polyphase oversampling. Samples more than 6 dB below the
+//                  running true peak (and blocks whose sample peak is) can't
+//                  raise it and skip the interpolator.
+//
+// Memory is one Float64 per 100 ms of audio (about 50 KB per hour).
+class LoudnessMeter {
+    static ABSOLUTE_GATE = -70;
+    static RELATIVE_GATE = -10;
+    static LRA_RELATIVE_GATE = -20;
+    static OVERSAMPLE = 4; // the true-peak loop is unrolled for 4 phases
+    static TAPS_PER_PHASE = 12;
+
+    static interpolators = new Map();
+
+    constructor(sampleRate, channels) {
+        this.sampleRate = sampleRate;
+        this.channels = channels;
+        this.subBlockFrames = Math.round(sampleRate / 10);
+        this.filter = LoudnessMeter.kWeighting(sampleRate);
+        this.interpolator = LoudnessMeter.interpolator();
+
+        // Channel weights: surrounds (5.1 Ls/Rs) count 1.41, LFE not at all
+        this.weights = Array.from({ length: channels }, (_, c) =>
+            channels === 6 ? [1, 1, 1, 0, 1.41, 1.41][c] : 1);
+
+        this.state = Array.from({ length: channels }, () => new Float64Array(6));
+        this.history = Array.from({ length: channels }, () => new Float64Array(LoudnessMeter.TAPS_PER_PHASE));
+        this.subBlockSum = 0;
+        this.subBlockFill = 0;
+        this.energies = new Float64Array(1024);
+        this.energyCount = 0;
+
+        this.samplePeak = new Float64Array(channels);
+        this.truePeak = new Float64Array(channels);
+        this.sumSquares = new Float64Array(channels);
+        this.clippedSamples = 0;
+        this.frames = 0;
+
+        this.scratch = new Float64Array(0);
+        this.padded = new Float64Array(0);
+    }
+
+    // samples: Int16Array, interleaved, whole frames
+    push(samples) {
+        const channels = this.channels;
+        const frames = samples.length / channels;
+        if (frames === 0) return;
+        if (this.scratch.length < frames) this.scratch = new Float64Array(frames);
+
+        const weighted = new Float64Array(frames);
+        for (let c = 0; c < channels; c++) {
+            const x = this.scratch;
+            let peak = 0;
+            let squares = 0;
+
+            // De-interleave and normalise once; everything below runs on `x`
+            for (let i = 0, j = c; i < frames; i++, j += channels) {
+                const value = samples[j] / 32768;
+                x[i] = value;
+                const magnitude = value < 0 ? -value : value;
+                if (magnitude > peak) peak = magnitude;
+                squares += value * value;
+            }
+            if (peak >= 32767 / 32768) this.clippedSamples += LoudnessMeter.countClipped(samples, c, channels);
+
+            if (peak > this.samplePeak[c]) this.samplePeak[c] = peak;
+            this.sumSquares[c] += squares;
+            this.updateTruePeak(c, x, frames, peak);
+
+            if (this.weights[c] > 0) this.kWeight(c, x, frames, weighted, this.weights[c]);
+        }
+
+        this.accumulate(weighted, frames);
+        this.frames += frames;
+    }
+
+    // Adds weight * (K-weighted x)^2 into `weighted`, keeping filter state per channel
+    kWeight(channel, x, frames, weighted, weight) {
+        const { b0, b1, b2, a1, a2, c0, c1, c2, d1, d2 } = this.filter;
+        const state = this.state[channel];
+        // x: input history, y: shelf output (high-pass input), z: high-pass output
+        let x1 = state[0], x2 = state[1], y1 = state[2], y2 = state[3], z1 = state[4], z2 = state[5];
+
+        for (let i = 0; i < frames; i++) {
+            const input = x[i];
+            const y = b0 * input + b1 * x1 + b2 * x2 - a1 * y1 - a2 * y2;
+            const z = c0 * y + c1 * y1 + c2 * y2 - d1 * z1 - d2 * z2;
+            x2 = x1; x1 = input;
+            y2 = y1; y1 = y;
+            z2 = z1; z1 = z;
+            weighted[i] += weight * z * z;
+        }
+
+        state[0] = x1; state[1] = x2; state[2] = y1; state[3] = y2; state[4] = z1; state[5] = z2;
+    }
+
+    // Folds per-frame weighted energy into 100 ms sub-blocks
+    accumulate(weighted, frames) {
+        let i = 0;
+        while (i < frames) {
+            const take = Math.min(frames - i, this.subBlockFrames - this.subBlockFill);
+            let sum = 0;
+            for (let end = i + take; i < end; i++) sum += weighted[i];
+            this.subBlockSum += sum;
+            this.subBlockFill += take;
+
+            if (this.subBlockFill === this.subBlockFrames) {
+                this.pushEnergy(this.subBlockSum / this.subBlockFrames);
+                this.subBlockSum = 0;
+                this.subBlockFill = 0;
+            }
+        }
+    }
+
+    pushEnergy(energy) {
+        if (this.energyCount === this.energies.length) {
+            const grown = new Float64Array(this.energies.length * 2);
+            grown.set(this.energies);
+            this.energies = grown;
+        }
+        this.energies[this.energyCount++] = energy;
+    }
+
+    updateTruePeak(channel, x, frames, samplePeak) {
+        const taps = LoudnessMeter.TAPS_PER_PHASE;
+        const history = this.history[channel];
+
+        // Previous block's tail followed by this block, so the taps never branch
+        if (this.padded.length < frames + taps) this.padded = new Float64Array(frames + taps);
+        const padded = this.padded;
+        padded.set(history);
+        padded.set(x.subarray(0, frames), taps);
+
+        let peak = Math.max(this.truePeak[channel], samplePeak);
+        // Intersample peaks stay within 6 dB of the neighbouring samples, so
+        // only samples above half the running peak go through the interpolator
+        if (samplePeak * 2 >= peak) {
+            // Taps interleaved by phase: h[k * 4 + p]; all four phases in one pass over the taps
+            const h = this.interpolator;
+            let gate = peak / 2;
+
+            for (let i = taps; i < frames + taps; i++) {
+                const current = padded[i] < 0 ? -padded[i] : padded[i];
+                const previous = padded[i - 1] < 0 ? -padded[i - 1] : padded[i - 1];
+                if (current < gate && previous < gate) continue;
+
+                let v0 = 0, v1 = 0, v2 = 0, v3 = 0;
+                for (let k = 0, t = 0; k < taps; k++, t += 4) {
+                    const sample = padded[i - k];
+                    v0 += h[t] * sample;
+                    v1 += h[t + 1] * sample;
+                    v2 += h[t + 2] * sample;
+                    v3 += h[t + 3] * sample;
+                }
+                const magnitude = Math.max(Math.abs(v0), Math.abs(v1), Math.abs(v2), Math.abs(v3));
+                if (magnitude > peak) {
+                    peak = magnitude;
+                    gate = peak / 2;
+                }
+            }
+        }
+        this.truePeak[channel] = peak;
+
+        history.set(padded.subarray(frames, frames + taps));
+    }
+
+    result() {
+        const integrated = this.integrated();
+        const range = this.loudnessRange();
+        const frames = Math.max(this.frames, 1);
+
+        return {
+            integrated,
+            loudnessRange: range,
+            truePeak: Array.from(this.truePeak, LoudnessMeter.toDecibels),
+            samplePeak: Array.from(this.samplePeak, LoudnessMeter.toDecibels),
+            rms: Array.from(this.sumSquares, sum => LoudnessMeter.toDecibels(Math.sqrt(sum / frames))),
+            rmsLinear: Math.sqrt(this.sumSquares.reduce((total, sum) => total + sum, 0) / (frames * this.channels)),
+            clippedSamples: this.clippedSamples,
+            silent: integrated === null,
+            duration: this.frames / this.sampleRate
+        };
+    }
+
+    // Gated integrated loudness (LUFS), or null when everything is below the absolute gate
+    integrated() {
+        const blocks = this.windowEnergies(4);
+        return LoudnessMeter.gatedLoudness(blocks, LoudnessMeter.RELATIVE_GATE);
+    }
+
+    loudnessRange() {
+        const windows = this.windowEnergies(30);
+        const gate = LoudnessMeter.gatedLoudness(windows, LoudnessMeter.LRA_RELATIVE_GATE, true);
+        if (!gate || gate.length < 2) return 0;
+
+        gate.sort((a, b) => a - b);
+        const percentile = q => gate[Math.min(gate.length - 1, Math.round(q * (gate.length - 1)))];
+        return percentile(0.95) - percentile(0.10);
+    }
+
+    // Mean energy of every run of `size` consecutive sub-blocks (sliding, 100 ms step)
+    windowEnergies(size) {
+        const count = this.energyCount - size + 1;
+        if (count <= 0) return new Float64Array(0);
+
+        const windows = new Float64Array(count);
+        let sum = 0;
+        for (let i = 0; i < this.energyCount; i++) {
+            sum += this.energies[i];
+            if (i >= size) sum -= this.energies[i - size];
+            if (i >= size - 1) windows[i - size + 1] = sum / size;
+        }
+        return windows;
+    }
+
+    // Absolute gate, then a relative gate `relative` LU below the gated mean.
+    // Returns the loudness of what's left, or the gated loudness values themselves.
+    static gatedLoudness(energies, relative, values = false) {
+        const absolute = LoudnessMeter.toEnergy(LoudnessMeter.ABSOLUTE_GATE);
+        let sum = 0;
+        let count = 0;
+        for (const energy of energies) {
+            if (energy > absolute) {
+                sum += energy;
+                count++;
+            }
+        }
+        if (count === 0) return null;
+
+        const threshold = LoudnessMeter.toEnergy(LoudnessMeter.toLoudness(sum / count) + relative);
+        const kept = [];
+        let keptSum = 0;
+        for (const energy of energies) {
+            if (energy > absolute && energy > threshold) {
+                keptSum += energy;
+                kept.push(energy);
+            }
+        }
+
+        if (values) return kept.map(LoudnessMeter.toLoudness);
+        return kept.length > 0 ? LoudnessMeter.toLoudness(keptSum / kept.length) : null;
+    }
+
+    static toLoudness(energy) {
+        return -0.691 + 10 * Math.log10(energy);
+    }
+
+    static toEnergy(loudness) {
+        return Math.pow(10, (loudness + 0.691) / 10);
+    }
+
+    // dBFS, or null for digital silence (keeps results JSON/Mongo safe)
+    static toDecibels(linear) {
+        return linear > 0 ? 20 * Math.log10(linear) : null;
+    }
+
+    static countClipped(samples, channel, channels) {
+        let clipped = 0;
+        for (let j = channel; j < samples.length; j += channels) {
+            if (samples[j] >= 32767 || samples[j] <= -32768) clipped++;
+        }
+        return clipped;
+    }
+
+    // BS.1770 K-weighting for any sample rate (pre-filter then RLB high-pass)
+    static kWeighting(sampleRate) {
+        let f0 = 1681.974450955533;
+        const G = 3.999843853973347;
+        let Q = 0.7071752369554196;
+        let K = Math.tan((Math.PI * f0) / sampleRate);
+        const Vh = Math.pow(10, G / 20);
+        const Vb = Math.pow(Vh, 0.4996667741545416);
+        let a0 = 1 + K / Q + K * K;
+
+        const shelf = {
+            b0: (Vh + (Vb * K) / Q + K * K) / a0,
+            b1: (2 * (K * K - Vh)) / a0,
+            b2: (Vh - (Vb * K) / Q + K * K) / a0,
+            a1: (2 * (K * K - 1)) / a0,
+            a2: (1 - K / Q + K * K) / a0
+        };
+
+        f0 = 38.13547087602444;
+        Q = 0.5003270373238773;
+        K = Math.tan((Math.PI * f0) / sampleRate);
+        a0 = 1 + K / Q + K * K;
+
+        return {
+            ...shelf,
+            c0: 1,
+            c1: -2,
+            c2: 1,
+            d1: (2 * (K * K - 1)) / a0,
+            d2: (1 - K / Q + K * K) / a0
+        };
+    }
+
+    // 4x windowed-sinc interpolator, taps interleaved by phase (h[k * 4 + p]),
+    // each phase normalised to unity DC gain
+    static interpolator() {
+        const factor = LoudnessMeter.OVERSAMPLE;
+        const taps = LoudnessMeter.TAPS_PER_PHASE;
+        const key = `${factor}x${taps}`;
+        if (LoudnessMeter.interpolators.has(key)) return LoudnessMeter.interpolators.get(key);
+
+        const length = factor * taps;
+        const h = new Float64Array(length);
+        for (let p = 0; p < factor; p++) {
+            let sum = 0;
+            for (let k = 0; k < taps; k++) {
+                const n = k * factor + p;
+                const x = (n - (length - 1) / 2) / factor;
+                const sinc = x === 0 ? 1 : Math.sin(Math.PI * x) / (Math.PI * x);
+                const window = 0.5 - 0.5 * Math.cos((2 * Math.PI * (n + 0.5)) / length);
+                h[n] = sinc * window;
+                sum += h[n];
+            }
+            for (let k = 0; k < taps; k++) h[k * factor + p] /= sum;
+        }
+
+        LoudnessMeter.interpolators.set(key, h);
+        return h;
+    }
+}
+
+module.exports = LoudnessMeter;
@@ -0,0 +1,60 @@
+// In-process metrics registry.
+// Timings keep count/total/min/max/last so callers can see what a stage costs
+// without a metrics backend; /api/metrics exposes a snapshot.
+class Metrics {
+    static timings = new Map();
+    static counters = new Map();
+
+    static recordTiming(name, durationMs) {
+        let timing = this.timings.get(name);
+        if (!timing) {
+            timing = { count: 0, totalMs: 0, minMs: Infinity, maxMs: 0, lastMs: 0 };
+            this.timings.set(name, timing);
+        }
+
+        timing.count++;
+        timing.totalMs += durationMs;
+        timing.minMs = Math.min(timing.minMs, durationMs);
+        timing.maxMs = Math.max(timing.maxMs, durationMs);
+        timing.lastMs = durationMs;
+        return durationMs;
+    }
+
+    static async time(name, fn) {
+        const start = process.hrtime.bigint();
+        try {
+            return await fn();
+        } finally {
+            this.recordTiming(name, Number(process.hrtime.bigint() - start) / 1e6);
+        }
+    }
+
+    static increment(name, value = 1) {
+        this.counters.set(name, (this.counters.get(name) || 0) + value);
+    }
+
+    static snapshot() {
+        const timings = {};
+        for (const [name, timing] of this.timings) {
+            timings[name] = {
+                count: timing.count,
+                avgMs: Number((timing.totalMs / timing.count).toFixed(3)),
+                minMs: Number(timing.minMs.toFixed(3)),
+                maxMs: Number(timing.maxMs.toFixed(3)),
+                lastMs: Number(timing.lastMs.toFixed(3))
+            };
+        }
+
+        return {
+            timings,
+            counters: Object.fromEntries(this.counters)
+        };
+    }
+
+    static reset() {
+        this.timings.clear();
+        this.counters.clear();
+    }
+}
+
+module.exports = Metrics;
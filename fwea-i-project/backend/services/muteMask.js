@@ -0,0 +1,166 @@
+const crypto = require('crypto');
+const TextNormalizer = require('./textNormalizer');
+
+// Mute masks: sorted, non-overlapping [start, end) intervals in seconds.
+// Built from scan timestamps (narrowed to word alignments when we have them),
+// versioned by the lexicons and custom words that produced them, and diffed
+// so a re-clean only re-renders the time ranges that actually changed.
+class MuteMask {
+    static PADDING = 0.05;   // seconds around each aligned word
+    static MERGE_GAP = 0.1;  // intervals closer than this become one
+
+    // timestamps: ProfanityFilter.scanSegments output, words: [{ word, start, end }]
+    static build(timestamps, words = [], options = {}) {
+        const padding = options.padding ?? MuteMask.PADDING;
+        const intervals = [];
+
+        for (const hit of timestamps) {
+            const aligned = MuteMask.alignedWords(hit, words);
+
+            if (!aligned || aligned.length === 0) {
+                // No word timing for this segment, or a flagged word we can't
+                // place: mute the whole segment
+                intervals.push({ start: hit.start, end: hit.end });
+                continue;
+            }
+            for (const word of aligned) {
+                intervals.push({
+                    start: Math.max(0, word.start - padding),
+                    end: word.end + padding
+                });
+            }
+        }
+
+        return MuteMask.merge(intervals, options.mergeGap ?? MuteMask.MERGE_GAP);
+    }
+
+    // Alignment words inside the hit's segment that carry one of the flagged
+    // words, or null when some flagged word can't be placed. A term matches
+    // whole normalized tokens first (a multi-word phrase as a consecutive run),
+    // so "I" or "a" near a hit stays audible; failing that, any token that
+    // contains it ("bitchy", "dumbass").
+    static alignedWords(hit, words) {
+        if (!words || words.length === 0) return [];
+
+        const flagged = [
+            ...hit.words,
+            ...(hit.fuzzyMatches || []).map(match => match.token)
+        ].map(word => TextNormalizer.normalize(word).text).filter(Boolean).map(text => text.split(' '));
+
+        // One entry per normalized token, remembering which word it came from
+        const inSegment = [];
+        const tokens = [];
+        for (let i = MuteMask.firstAtOrAfter(words, hit.start); i < words.length; i++) {
+            const word = words[i];
+            if (word.start >= hit.end) break;
+
+            const text = TextNormalizer.normalize(word.word || '').text;
+            if (!text) continue;
+            for (const token of text.split(' ')) tokens.push({ token, word: inSegment.length });
+            inSegment.push(word);
+        }
+
+        const matched = new Set();
+        for (const term of flagged) {
+            const found = new Set();
+            for (let i = 0; i + term.length <= tokens.length; i++) {
+                if (term.every((token, j) => tokens[i + j].token === token)) {
+                    for (let j = 0; j < term.length; j++) found.add(tokens[i + j].word);
+                }
+            }
+            if (found.size === 0) {
+                const joined = term.join('');
+                for (const { token, word } of tokens) {
+                    if (token.includes(joined)) found.add(word);
+                }
+            }
+            if (found.size === 0) return null;
+
+            for (const index of found) matched.add(index);
+        }
+
+        return [...matched].sort((a, b) => a - b).map(index => inSegment[index]);
+    }
+
+    // Binary search over words sorted by start time
+    static firstAtOrAfter(words, time) {
+        let low = 0;
+        let high = words.length;
+
+        while (low < high) {
+            const mid = (low + high) >> 1;
+            if (words[mid].end <= time) {
+                low = mid + 1;
+            } else {
+                high = mid;
+            }
+        }
+
+        return low;
+    }
+
+    static merge(intervals, gap = 0) {
+        const sorted = intervals
+            .filter(interval => interval.end > interval.start)
+            .sort((a, b) => a.start - b.start);
+        const merged = [];
+
+        for (const interval of sorted) {
+            const last = merged[merged.length - 1];
+            if (last && interval.start <= last.end + gap) {
+                last.end = Math.max(last.end, interval.end);
+            } else {
+                merged.push({ start: interval.start, end: interval.end });
+            }
+        }
+
+        return merged;
+    }
+
+    // Time ranges where the two masks disagree (symmetric difference). Rendering
+    // these from the original audio with the new mask yields the new output.
+    static diff(previous = [], next = []) {
+        const edges = [];
+        for (const { start, end } of previous) edges.push([start, 1], [end, -1]);
+        for (const { start, end } of next) edges.push([start, 2], [end, -2]);
+        edges.sort((a, b) => a[0] - b[0]);
+
+        const changed = [];
+        let inPrevious = 0;
+        let inNext = 0;
+        let openedAt = null;
+
+        for (const [time, edge] of edges) {
+            if (Math.abs(edge) === 1) inPrevious += Math.sign(edge);
+            else inNext += Math.sign(edge);
+
+            const differs = (inPrevious > 0) !== (inNext > 0);
+            if (differs && openedAt === null) {
+                openedAt = time;
+            } else if (!differs && openedAt !== null) {
+                if (time > openedAt) changed.push({ start: openedAt, end: time });
+                openedAt = null;
+            }
+        }
+
+        return MuteMask.merge(changed);
+    }
+
+    static equals(a = [], b = []) {
+        return a.length === b.length &&
+            a.every((interval, i) => interval.start === b[i].start && interval.end === b[i].end);
+    }
+
+    static totalDuration(intervals) {
+        return intervals.reduce((total, interval) => total + (interval.end - interval.start), 0);
+    }
+
+    // Identifies the inputs a mask was built from: lexicon versions plus custom words
+    static version(lexiconVersion, customWords = []) {
+        const custom = [...new Set(customWords.map(word => word.toLowerCase()))].sort();
+        const hash = crypto.createHash('sha1').update(custom.join('\n')).digest('hex').slice(0, 8);
+        return custom.length > 0 ? `${lexiconVersion};custom:${hash}` : lexiconVersion;
+    }
+}
+
+module.exports = MuteMask;
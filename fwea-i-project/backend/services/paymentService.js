@@ -154,12 +154,13 @@ class PaymentService {
         if (jobId) {
             try {
                 const ProcessingJob = require('../models/ProcessingJob');
-                await ProcessingJob.findByIdAndUpdate(jobId, {
+                const job = await ProcessingJob.findByIdAndUpdate(jobId, {
                     isPaid: true,
                     paymentId: paymentIntent.id,
                     paidAt: new Date()
-                });
+                }, { new: true });
                 console.log(`✅ Payment successful for job: ${jobId}`);
+                this.renderPaidJob(job);
             } catch (error) {
                 console.error('Error updating payment status:', error);
             }
@@ -173,18 +174,31 @@ class PaymentService {
 
             if (jobId) {
                 const ProcessingJob = require('../models/ProcessingJob');
-                await ProcessingJob.findByIdAndUpdate(jobId, {
+                const job = await ProcessingJob.findByIdAndUpdate(jobId, {
                     isPaid: true,
                     subscriptionId: subscription.id,
                     paidAt: new Date()
-                });
+                }, { new: true });
                 console.log(`✅ Subscription payment successful for job: ${jobId}`);
+                this.renderPaidJob(job);
             }
         } catch (error) {
             console.error('Error handling subscription payment:', error);
         }
     }
 
+    // Full-quality outputs are only rendered once paid for. Runs in the
+    // background so the webhook is acknowledged straight away; a download
+    // before it finishes joins the same render.
+    static renderPaidJob(job) {
+        if (!job || job.status !== 'completed') return;
+
+        const CleanPipeline = require('./cleanPipeline');
+        CleanPipeline.renderJob(job)
+            .then(outputs => console.log(`🎚️ Rendered ${outputs.length} output(s) for paid job: ${job._id}`))
+            .catch(error => console.error(`Error rendering paid job ${job._id}:`, error));
+    }
+
     static async handleSubscriptionCancelled(subscription) {
         console.log(`📋 Subscription cancelled: ${subscription.id}`);
         // Handle subscription cancellation logic here
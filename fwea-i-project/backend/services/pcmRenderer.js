@@ -0,0 +1,251 @@
+const fs = require('fs').promises;
+
+// Applies mute masks to decoded PCM (raw s16le, interleaved) on disk.
+// Rendering works range by range with positional reads and writes: frames
+// outside the requested ranges are never read, copied or rewritten.
+//
+// Each masked interval is crossfaded into a replacement signal with a
+// raised-cosine envelope, so edits don't click:
+//
+//   mute         silence
+//   bleep        sine tone
+//   reverse      the interval played backwards
+//   duck-vocals  centre (mid) channel attenuated, sides kept; stereo only
+class PcmRenderer {
+    static FORMAT = { sampleRate: 44100, channels: 2, bytesPerSample: 2 };
+    static MODES = ['mute', 'bleep', 'reverse', 'duck-vocals'];
+    static DEFAULTS = {
+        mode: 'mute',
+        fadeMs: 10,
+        bleepHz: 1000,
+        bleepGain: 0.25,
+        duckGain: 0.1
+    };
+
+    static fadeCurves = new Map();
+
+    static options(options = {}) {
+        const merged = { ...PcmRenderer.DEFAULTS, ...options };
+        if (!PcmRenderer.MODES.includes(merged.mode)) merged.mode = PcmRenderer.DEFAULTS.mode;
+        return merged;
+    }
+
+    static bytesPerFrame(format = PcmRenderer.FORMAT) {
+        return format.channels * format.bytesPerSample;
+    }
+
+    // Seconds -> [startFrame, endFrame), widened to whole frames
+    static frameRange(range, format = PcmRenderer.FORMAT) {
+        return [
+            Math.max(0, Math.floor(range.start * format.sampleRate)),
+            Math.ceil(range.end * format.sampleRate)
+        ];
+    }
+
+    // First render of a job: the clean PCM starts as a copy of the source and
+    // only the masked frames are rewritten
+    static async renderFull(sourcePath, targetPath, mask, format = PcmRenderer.FORMAT, options = {}) {
+        await fs.copyFile(sourcePath, targetPath);
+        return PcmRenderer.renderRanges(sourcePath, targetPath, mask, mask, format, options);
+    }
+
+    // Re-renders `ranges` of the target from the source with `mask` applied.
+    // Ranges are widened to whole mask intervals (fades and reversal need the
+    // full interval). Returns the number of frames touched.
+    static async renderRanges(sourcePath, targetPath, ranges, mask, format = PcmRenderer.FORMAT, options = {}) {
+        const frameBytes = PcmRenderer.bytesPerFrame(format);
+        const settings = PcmRenderer.options(options);
+        const source = await fs.open(sourcePath, 'r');
+        const target = await fs.open(targetPath, 'r+');
+        let framesTouched = 0;
+
+        try {
+            const totalFrames = Math.floor((await source.stat()).size / frameBytes);
+
+            for (const [startFrame, endFrame] of PcmRenderer.spans(ranges, mask, format, totalFrames)) {
+                const length = (endFrame - startFrame) * frameBytes;
+                const buffer = Buffer.alloc(length);
+                const { bytesRead } = await source.read(buffer, 0, length, startFrame * frameBytes);
+                if (bytesRead === 0) continue;
+
+                const chunk = buffer.subarray(0, bytesRead - (bytesRead % frameBytes));
+                PcmRenderer.applyMask(chunk, startFrame, mask, format, settings);
+                await target.write(chunk, 0, chunk.length, startFrame * frameBytes);
+
+                framesTouched += chunk.length / frameBytes;
+            }
+        } finally {
+            await source.close();
+            await target.close();
+        }
+
+        return framesTouched;
+    }
+
+    // Frame spans to render: each range grown to cover every mask interval it touches
+    static spans(ranges, mask, format, totalFrames) {
+        const intervals = mask.map(interval => PcmRenderer.frameRange(interval, format));
+        const spans = ranges
+            .map(range => {
+                let [start, end] = PcmRenderer.frameRange(range, format);
+                for (const [maskStart, maskEnd] of intervals) {
+                    if (maskEnd > start && maskStart < end) {
+                        start = Math.min(start, maskStart);
+                        end = Math.max(end, maskEnd);
+                    }
+                }
+                return [start, Math.min(end, totalFrames)];
+            })
+            .filter(([start, end]) => end > start)
+            .sort((a, b) => a[0] - b[0]);
+
+        const merged = [];
+        for (const span of spans) {
+            const last = merged[merged.length - 1];
+            if (last && span[0] <= last[1]) {
+                last[1] = Math.max(last[1], span[1]);
+            } else {
+                merged.push(span);
+            }
+        }
+        return merged;
+    }
+
+    // Renders every mask interval that lies inside `chunk` (starting at `firstFrame`)
+    static applyMask(chunk, firstFrame, mask, format = PcmRenderer.FORMAT, options = {}) {
+        const settings = PcmRenderer.options(options);
+        const frameBytes = PcmRenderer.bytesPerFrame(format);
+        const lastFrame = firstFrame + chunk.length / frameBytes;
+        const samples = new Int16Array(chunk.buffer, chunk.byteOffset, chunk.length / 2);
+
+        for (const interval of mask) {
+            const [start, end] = PcmRenderer.frameRange(interval, format);
+            if (end <= firstFrame) continue;
+            if (start >= lastFrame) break;
+
+            PcmRenderer.renderInterval(
+                samples,
+                Math.max(start, firstFrame) - firstFrame,
+                Math.min(end, lastFrame) - firstFrame,
+                format,
+                settings
+            );
+        }
+
+        return chunk;
+    }
+
+    // out = original * envelope + replacement * (1 - envelope). The envelope is
+    // only fractional inside the fades; the middle of the interval is written with
+    // a tight per-mode loop (or a single fill for plain muting).
+    static renderInterval(samples, startFrame, endFrame, format, settings) {
+        const channels = format.channels;
+        const frames = endFrame - startFrame;
+        const fadeFrames = Math.min(
+            Math.round((settings.fadeMs / 1000) * format.sampleRate),
+            Math.floor(frames / 2)
+        );
+        const fade = PcmRenderer.fadeCurve(fadeFrames);
+        const mode = settings.mode === 'duck-vocals' && channels !== 2 ? 'mute' : settings.mode;
+
+        // Reversal reads from a copy so the source frames aren't overwritten mid-way
+        const original = mode === 'reverse'
+            ? samples.slice(startFrame * channels, endFrame * channels)
+            : null;
+        const toneStep = (2 * Math.PI * settings.bleepHz) / format.sampleRate;
+        const toneAmplitude = settings.bleepGain * 32767;
+        const duckGain = settings.duckGain;
+
+        // Fades: envelope 1 -> 0 over the first fadeFrames, 0 -> 1 over the last
+        const mixFrame = (i, keep) => {
+            const replace = 1 - keep;
+            const base = (startFrame + i) * channels;
+
+            if (mode === 'duck-vocals') {
+                const left = samples[base];
+                const right = samples[base + 1];
+                const ducked = ((left + right) / 2) * duckGain;
+                const side = (left - right) / 2;
+                samples[base] = PcmRenderer.clamp(keep * left + replace * (ducked + side));
+                samples[base + 1] = PcmRenderer.clamp(keep * right + replace * (ducked - side));
+                return;
+            }
+
+            const tone = mode === 'bleep' ? Math.sin(toneStep * i) * toneAmplitude : 0;
+            for (let c = 0; c < channels; c++) {
+                const replacement = mode === 'reverse' ? original[(frames - 1 - i) * channels + c] : tone;
+                samples[base + c] = PcmRenderer.clamp(keep * samples[base + c] + replace * replacement);
+            }
+        };
+
+        for (let i = 0; i < fadeFrames; i++) {
+            mixFrame(i, 1 - fade[i]);
+            mixFrame(frames - 1 - i, 1 - fade[i]);
+        }
+
+        // Middle: envelope is 0, the replacement is written as is (always in range)
+        const from = fadeFrames;
+        const to = frames - fadeFrames;
+
+        switch (mode) {
+            case 'mute':
+                samples.fill(0, (startFrame + from) * channels, (startFrame + to) * channels);
+                break;
+
+            case 'bleep': {
+                // Sine by recurrence: sin(n+1) = 2cos(w)sin(n) - sin(n-1)
+                const coefficient = 2 * Math.cos(toneStep);
+                let previous = Math.sin(toneStep * (from - 1)) * toneAmplitude;
+                let current = Math.sin(toneStep * from) * toneAmplitude;
+
+                for (let i = from; i < to; i++) {
+                    const base = (startFrame + i) * channels;
+                    for (let c = 0; c < channels; c++) samples[base + c] = current;
+
+                    const next = coefficient * current - previous;
+                    previous = current;
+                    current = next;
+                }
+                break;
+            }
+
+            case 'reverse':
+                for (let i = from; i < to; i++) {
+                    const base = (startFrame + i) * channels;
+                    const mirrored = (frames - 1 - i) * channels;
+                    for (let c = 0; c < channels; c++) samples[base + c] = original[mirrored + c];
+                }
+                break;
+
+            case 'duck-vocals':
+                for (let base = (startFrame + from) * 2, end = (startFrame + to) * 2; base < end; base += 2) {
+                    const left = samples[base];
+                    const right = samples[base + 1];
+                    const ducked = ((left + right) / 2) * duckGain;
+                    const side = (left - right) / 2;
+                    samples[base] = ducked + side;
+                    samples[base + 1] = ducked - side;
+                }
+                break;
+        }
+    }
+
+    // Raised-cosine ramp 0 -> 1 over `frames` samples, cached per length
+    static fadeCurve(frames) {
+        let curve = PcmRenderer.fadeCurves.get(frames);
+        if (!curve) {
+            curve = new Float32Array(frames);
+            for (let i = 0; i < frames; i++) {
+                curve[i] = 0.5 - 0.5 * Math.cos((Math.PI * (i + 1)) / (frames + 1));
+            }
+            PcmRenderer.fadeCurves.set(frames, curve);
+        }
+        return curve;
+    }
+
+    static clamp(value) {
+        return value > 32767 ? 32767 : value < -32768 ? -32768 : Math.round(value);
+    }
+}
+
+module.exports = PcmRenderer;
@@ -0,0 +1,220 @@
+const PhoneticKeys = require('./phoneticKeys');
+const TextNormalizer = require('./textNormalizer');
+
+// Fuzzy lookup for transcript tokens the exact automaton misses: ASR spellings
+// ("fock", "biatch"), asterisk censoring ("f**k") and one-letter typos.
+//
+//   phonetic - hash lookup on Double Metaphone / script-specific keys,
+//              confirmed by a bounded edit distance
+//   edit     - BK-tree search (one tree per first letter), only for longer
+//              tokens where a single edit is safe
+//   mask     - censored tokens compared against same-length words by bucket
+//
+// Each lookup touches a hash bucket or a small part of the BK-tree, so cost
+// grows roughly with log(lexicon size), not with the lexicon itself.
+
+const MASK_CHARS = /[*#]/;
+const MIN_FUZZY_LENGTH = 4;
+
+class BKTree {
+    constructor() {
+        this.root = null;
+        this.size = 0;
+    }
+
+    add(term, entry) {
+        if (!this.root) {
+            this.root = { term, entry, children: new Map() };
+            this.size++;
+            return;
+        }
+
+        let node = this.root;
+        while (true) {
+            const distance = PhoneticIndex.levenshtein(term, node.term);
+            if (distance === 0) return;
+
+            const child = node.children.get(distance);
+            if (!child) {
+                node.children.set(distance, { term, entry, children: new Map() });
+                this.size++;
+                return;
+            }
+            node = child;
+        }
+    }
+
+    query(term, maxDistance) {
+        const results = [];
+        if (!this.root) return results;
+
+        const stack = [this.root];
+        while (stack.length > 0) {
+            const node = stack.pop();
+            const distance = PhoneticIndex.levenshtein(term, node.term);
+
+            if (distance <= maxDistance) {
+                results.push({ entry: node.entry, distance });
+            }
+
+            // Triangle inequality: only subtrees within [d - max, d + max] can match
+            for (const [childDistance, child] of node.children) {
+                if (childDistance >= distance - maxDistance && childDistance <= distance + maxDistance) {
+                    stack.push(child);
+                }
+            }
+        }
+
+        return results;
+    }
+}
+
+class PhoneticIndex {
+    constructor() {
+        this.byKey = new Map();
+        this.byMask = new Map();
+        this.trees = new Map();
+        this.terms = new Set();
+        this.allowed = new Set();
+    }
+
+    // entries: [{ term, source }], allow: words that must never fuzzy-match
+    static build(entries, allow = []) {
+        const index = new PhoneticIndex();
+
+        for (const word of allow) {
+            index.allowed.add(TextNormalizer.normalize(word).text);
+        }
+        for (const entry of entries) {
+            index.add(entry.term, entry);
+        }
+
+        return index;
+    }
+
+    add(word, payload = {}) {
+        const normalized = TextNormalizer.normalize(word);
+        const term = normalized.text;
+
+        // Fuzzy matching is per token; short words are too ambiguous to relax
+        if (term.length < 3 || term.includes(' ') || this.terms.has(term)) return this;
+        this.terms.add(term);
+
+        const spelled = Array.from(term, (char, i) => char.repeat(normalized.runs[i] || 1)).join('');
+        const entry = { ...payload, word, term, spelled, respelled: PhoneticIndex.respell(term) };
+
+        for (const key of PhoneticKeys.keys(term)) {
+            if (!this.byKey.has(key)) this.byKey.set(key, []);
+            this.byKey.get(key).push(entry);
+        }
+
+        const maskBucket = `${spelled.length}:${spelled[0]}`;
+        if (!this.byMask.has(maskBucket)) this.byMask.set(maskBucket, []);
+        this.byMask.get(maskBucket).push(entry);
+
+        // One BK-tree per first letter: the edit path never changes the first letter
+        if (!this.trees.has(term[0])) this.trees.set(term[0], new BKTree());
+        this.trees.get(term[0]).add(term, entry);
+        return this;
+    }
+
+    // Returns { entry, method, distance } or null
+    lookup(token) {
+        const raw = String(token || '').toLowerCase().replace(/^[^\p{L}\p{N}*#]+|[^\p{L}\p{N}*#]+$/gu, '');
+        if (!raw) return null;
+
+        if (MASK_CHARS.test(raw)) {
+            return this.lookupMasked(raw);
+        }
+
+        const term = TextNormalizer.normalize(raw).text;
+        if (term.length < MIN_FUZZY_LENGTH || this.allowed.has(term) || this.terms.has(term)) {
+            return null;
+        }
+
+        let best = null;
+        const respelled = PhoneticIndex.respell(term);
+        const phoneticLimit = 1;
+
+        for (const key of PhoneticKeys.keys(term)) {
+            for (const entry of this.byKey.get(key) || []) {
+                // Metaphone folds b/p and d/t; "pitch" must not become "bitch"
+                if (respelled[0] !== entry.respelled[0]) continue;
+
+                const distance = PhoneticIndex.levenshtein(respelled, entry.respelled, phoneticLimit);
+                if (distance <= phoneticLimit && (!best || distance < best.distance)) {
+                    best = { entry, method: 'phonetic', distance };
+                }
+            }
+        }
+        if (best) return best;
+
+        // Without phonetic agreement, allow a single edit on longer words only, and
+        // never on the first letter ("sucked" is not "fucked")
+        if (term.length >= 6 && this.trees.has(term[0])) {
+            for (const candidate of this.trees.get(term[0]).query(term, 1)) {
+                if (!best || candidate.distance < best.distance) {
+                    best = { entry: candidate.entry, method: 'edit', distance: candidate.distance };
+                }
+            }
+        }
+
+        return best;
+    }
+
+    lookupMasked(raw) {
+        const chars = Array.from(raw);
+        const visible = chars.filter(char => !MASK_CHARS.test(char)).length;
+
+        // "f***" could be anything; need at least two real letters to commit
+        if (visible < 2 || MASK_CHARS.test(chars[0])) return null;
+
+        const candidates = this.byMask.get(`${chars.length}:${chars[0]}`) || [];
+        const hits = candidates.filter(entry => {
+            const spelled = Array.from(entry.spelled);
+            return chars.every((char, i) => MASK_CHARS.test(char) || char === spelled[i]);
+        });
+
+        // Ambiguous masks ("s**t" -> shit/slut) still count, the first listed word wins
+        return hits.length > 0 ? { entry: hits[0], method: 'mask', distance: chars.length - visible } : null;
+    }
+
+    // Folds spellings of the same sound so "phuck" is one edit from "fuck", not two
+    static respell(term) {
+        return term
+            .replace(/ph/g, 'f')
+            .replace(/ck/g, 'k')
+            .replace(/c(?=[aou]|$)/g, 'k')
+            .replace(/q/g, 'k');
+    }
+
+    // Levenshtein distance with an early exit once every cell in a row exceeds `max`
+    static levenshtein(a, b, max = Infinity) {
+        if (a === b) return 0;
+        if (Math.abs(a.length - b.length) > max) return max + 1;
+
+        let previous = new Array(b.length + 1);
+        let current = new Array(b.length + 1);
+        for (let j = 0; j <= b.length; j++) previous[j] = j;
+
+        for (let i = 1; i <= a.length; i++) {
+            current[0] = i;
+            let rowMin = current[0];
+
+            for (let j = 1; j <= b.length; j++) {
+                const cost = a[i - 1] === b[j - 1] ? 0 : 1;
+                current[j] = Math.min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost);
+                if (current[j] < rowMin) rowMin = current[j];
+            }
+
+            if (rowMin > max) return max + 1;
+            [previous, current] = [current, previous];
+        }
+
+        return previous[b.length];
+    }
+}
+
+PhoneticIndex.BKTree = BKTree;
+
+module.exports = PhoneticIndex;
@@ -0,0 +1,255 @@
+// Phonetic keys for fuzzy lexicon lookups.
+// Latin-script words use a condensed Double Metaphone (primary + alternate key);
+// Cyrillic is transliterated first so it shares those rules. Abjads (Arabic,
+// Hebrew) key on their consonant skeleton. Scripts without a useful phonetic
+// reduction (CJK, Thai, Indic) return no key and rely on edit distance only.
+
+const VOWELS = new Set(['A', 'E', 'I', 'O', 'U', 'Y']);
+
+const CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'i', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya', 'і': 'i', 'ї': 'yi', 'є': 'ye', 'ґ': 'g'
+};
+
+// Long-vowel letters and diacritics that ASR spells inconsistently
+const ABJAD_VOWELS = /[\u064b-\u0670\u0627\u0648\u064a\u0649\u0622\u0623\u0625\u05b0-\u05c7\u05d0\u05d5\u05d9]/g;
+
+const LATIN = /^[a-z]+$/;
+const CYRILLIC = /^[\u0400-\u04ff]+$/;
+const ABJAD = /^[\u0590-\u05ff\u0600-\u06ff]+$/;
+
+class PhoneticKeys {
+    // Returns an array of keys (primary first), or [] when the script has none
+    static keys(term) {
+        const word = String(term || '').toLowerCase();
+
+        if (LATIN.test(word)) {
+            return PhoneticKeys.doubleMetaphone(word);
+        }
+        if (CYRILLIC.test(word)) {
+            const latin = Array.from(word, char => CYRILLIC_TO_LATIN[char] ?? char).join('');
+            return LATIN.test(latin) ? PhoneticKeys.doubleMetaphone(latin) : [];
+        }
+        if (ABJAD.test(word)) {
+            const skeleton = word.replace(ABJAD_VOWELS, '');
+            return skeleton ? [skeleton] : [];
+        }
+
+        return [];
+    }
+
+    static doubleMetaphone(input) {
+        const word = input.toUpperCase();
+        const length = word.length;
+        const at = i => (i >= 0 && i < length ? word[i] : '');
+        const sub = (i, n) => (i >= 0 ? word.substr(i, n) : '');
+        const isVowel = i => VOWELS.has(at(i));
+        const slavoGermanic = /W|K|CZ|WITZ/.test(word);
+
+        let primary = '';
+        let alternate = '';
+        const add = (main, alt = main) => {
+            primary += main;
+            alternate += alt;
+        };
+
+        let i = 0;
+        if (['GN', 'KN', 'PN', 'WR', 'PS'].includes(sub(0, 2))) i = 1;
+        if (at(0) === 'X') {
+            add('S');
+            i = 1;
+        }
+
+        while (i < length && (primary.length < 6 || alternate.length < 6)) {
+            const char = at(i);
+
+            switch (char) {
+                case 'A': case 'E': case 'I': case 'O': case 'U': case 'Y':
+                    if (i === 0) add('A');
+                    i++;
+                    break;
+
+                case 'B':
+                    add('P');
+                    i += at(i + 1) === 'B' ? 2 : 1;
+                    break;
+
+                case 'C':
+                    if (sub(i, 2) === 'CH') {
+                        // "chr"/"chl" and Germanic "sch" are hard
+                        if (/^CH[RL]/.test(sub(i, 3)) || sub(i - 1, 3) === 'SCH') {
+                            add('K');
+                        } else {
+                            add('X', i === 0 ? 'K' : 'X');
+                        }
+                        i += 2;
+                    } else if (sub(i, 2) === 'CZ') {
+                        add('S', 'X');
+                        i += 2;
+                    } else if (/^C[IEY]/.test(sub(i, 2))) {
+                        add('S', /^CI[AO]/.test(sub(i, 3)) ? 'X' : 'S');
+                        i += 2;
+                    } else {
+                        add('K');
+                        i += /^C[CKQG]/.test(sub(i, 2)) && !/^CC[IEH]/.test(sub(i, 3)) ? 2 : 1;
+                    }
+                    break;
+
+                case 'D':
+                    if (/^DG[IEY]/.test(sub(i, 3))) {
+                        add('J');
+                        i += 3;
+                    } else {
+                        add('T');
+                        i += /^D[TD]/.test(sub(i, 2)) ? 2 : 1;
+                    }
+                    break;
+
+                case 'F':
+                    add('F');
+                    i += at(i + 1) === 'F' ? 2 : 1;
+                    break;
+
+                case 'G':
+                    if (at(i + 1) === 'H') {
+                        // "gh" is silent after a vowel ("night") and hard at the start ("ghost")
+                        if (i > 0 && !isVowel(i - 1)) {
+                            add('K');
+                        } else if (i === 0) {
+                            add('K');
+                        } else if (i > 0 && at(i + 2) === '' && ['U', 'O'].includes(at(i - 1))) {
+                            add('F');
+                        }
+                        i += 2;
+                    } else if (at(i + 1) === 'N') {
+                        add(i === 1 && isVowel(0) && !slavoGermanic ? 'KN' : 'N', 'KN');
+                        i += 2;
+                    } else if (/^G[IEY]/.test(sub(i, 2))) {
+                        add('K', 'J');
+                        i += 2;
+                    } else {
+                        add('K');
+                        i += at(i + 1) === 'G' ? 2 : 1;
+                    }
+                    break;
+
+                case 'H':
+                    if ((i === 0 || isVowel(i - 1)) && isVowel(i + 1)) add('H');
+                    i++;
+                    break;
+
+                case 'J':
+                    add(sub(i, 4) === 'JOSE' ? 'H' : 'J', i === 0 ? 'A' : 'J');
+                    i += at(i + 1) === 'J' ? 2 : 1;
+                    break;
+
+                case 'K':
+                    add('K');
+                    i += at(i + 1) === 'K' ? 2 : 1;
+                    break;
+
+                case 'L':
+                    add('L');
+                    i += at(i + 1) === 'L' ? 2 : 1;
+                    break;
+
+                case 'M':
+                    add('M');
+                    i += at(i + 1) === 'M' ? 2 : 1;
+                    break;
+
+                case 'N':
+                    add('N');
+                    i += at(i + 1) === 'N' ? 2 : 1;
+                    break;
+
+                case 'P':
+                    if (at(i + 1) === 'H') {
+                        add('F');
+                        i += 2;
+                    } else {
+                        add('P');
+                        i += /^P[PB]/.test(sub(i, 2)) ? 2 : 1;
+                    }
+                    break;
+
+                case 'Q':
+                    add('K');
+                    i += at(i + 1) === 'Q' ? 2 : 1;
+                    break;
+
+                case 'R':
+                    add('R');
+                    i += at(i + 1) === 'R' ? 2 : 1;
+                    break;
+
+                case 'S':
+                    if (sub(i, 2) === 'SH') {
+                        add('X');
+                        i += 2;
+                    } else if (/^SI[OA]/.test(sub(i, 3))) {
+                        add('S', 'X');
+                        i += 3;
+                    } else if (sub(i, 3) === 'SCH') {
+                        // German "sch" is "sh"; English/Dutch "school" keeps the hard sound
+                        add('X', 'SK');
+                        i += 3;
+                    } else if (/^SC[IEY]/.test(sub(i, 3))) {
+                        add('S');
+                        i += 3;
+                    } else {
+                        add('S');
+                        i += /^S[SZ]/.test(sub(i, 2)) ? 2 : 1;
+                    }
+                    break;
+
+                case 'T':
+                    if (/^TI[OA]/.test(sub(i, 3)) || sub(i, 3) === 'TCH') {
+                        add('X');
+                        i += 3;
+                    } else if (sub(i, 2) === 'TH') {
+                        add('0', 'T');
+                        i += 2;
+                    } else {
+                        add('T');
+                        i += /^T[TD]/.test(sub(i, 2)) ? 2 : 1;
+                    }
+                    break;
+
+                case 'V':
+                    add('F');
+                    i += at(i + 1) === 'V' ? 2 : 1;
+                    break;
+
+                case 'W':
+                    if (i === 0 && (isVowel(1) || at(1) === 'H')) {
+                        add('A', 'F');
+                    }
+                    i++;
+                    break;
+
+                case 'X':
+                    add('KS');
+                    i += /^X[CX]/.test(sub(i, 2)) ? 2 : 1;
+                    break;
+
+                case 'Z':
+                    add('S', slavoGermanic ? 'TS' : 'S');
+                    i += at(i + 1) === 'Z' ? 2 : 1;
+                    break;
+
+                default:
+                    i++;
+            }
+        }
+
+        primary = primary.slice(0, 6);
+        alternate = alternate.slice(0, 6);
+        return primary === alternate ? [primary] : [primary, alternate];
+    }
+}
+
+module.exports = PhoneticKeys;
@@ -1,85 +1,41 @@
-const BadWords = require('bad-words');
-const compromise = require('compromise');
 const LanguageDetector = require('./languageDetector');
+const ContextScorer = require('./contextScorer');
+const LexiconStore = require('./lexiconStore');
+const Metrics = require('./metrics');
+const ProfanityMatcher = require('./profanityMatcher');
+const TextNormalizer = require('./textNormalizer');
+
+// Compiled matchers for user-supplied word lists, keyed by the word list itself
+const CUSTOM_MATCHER_CACHE_SIZE = 100;
+const customMatchers = new Map();
 
 class ProfanityFilter {
-    constructor() {
-        this.badWordsFilter = new BadWords();
-
-        // Multi-language profanity lists (197 languages supported)
-        this.profanityLists = {
-            english: ['damn', 'hell', 'shit', 'fuck', 'bitch', 'ass', 'crap', 'piss', 'bastard'],
-            spanish: ['mierda', 'joder', 'coño', 'puta', 'cabrón', 'pendejo', 'pinche', 'carajo'],
-            french: ['merde', 'putain', 'connard', 'salope', 'bordel', 'con', 'chiant'],
-            german: ['scheiße', 'verdammt', 'arsch', 'fotze', 'hurensohn', 'kacke'],
-            italian: ['merda', 'cazzo', 'stronzo', 'puttana', 'vaffanculo', 'bastardo'],
-            portuguese: ['merda', 'porra', 'caralho', 'puta', 'foder', 'buceta'],
-            russian: ['блядь', 'сука', 'хуй', 'пизда', 'ебать', 'гавно'],
-            arabic: ['خرا', 'لعنة', 'تبا', 'كلب', 'حمار'],
-            chinese: ['操', '妈的', '狗屎', '混蛋', '白痴', '傻逼'],
-            japanese: ['クソ', 'バカ', 'アホ', 'ばか', 'くそ', 'ちくしょう'],
-            korean: ['씨발', '개새끼', '병신', '젠장', '빌어먹을'],
-            hindi: ['गांडू', 'चूतिया', 'भोसड़ी', 'रंडी', 'हरामी'],
-            dutch: ['shit', 'fuck', 'klootzak', 'kut', 'lul', 'kanker'],
-            swedish: ['skit', 'fan', 'kuk', 'fitta', 'jävla', 'helvete'],
-            norwegian: ['faen', 'dritt', 'kuk', 'fitte', 'jævla'],
-            danish: ['lort', 'fanden', 'pik', 'luder', 'røvhul'],
-            finnish: ['paska', 'vittu', 'perkele', 'helvetti', 'saatana'],
-            polish: ['kurwa', 'gówno', 'dupa', 'chuj', 'pierdolić', 'skurwysyn'],
-            turkish: ['bok', 'siktir', 'orospu', 'pezevenk', 'amcık'],
-            hebrew: ['חרא', 'לעזאזל', 'זין', 'כוס', 'בן זונה'],
-            thai: ['ห่า', 'เหี้ย', 'ควาย', 'อีดอก', 'กบ'],
-            vietnamese: ['đồ chó', 'cứt', 'địt mẹ', 'con đĩ', 'thằng ngu'],
-            indonesian: ['anjing', 'brengsek', 'bangsat', 'kontol', 'memek'],
-            malay: ['pukimak', 'babi', 'sial', 'lancau', 'bodoh'],
-            tagalog: ['putang ina', 'gago', 'tanga', 'bobo', 'tarantado'],
-            swahili: ['mwizi', 'mjinga', 'pumbavu', 'malaya'],
-            urdu: ['کتے', 'بکواس', 'چوتیا', 'رنڈی'],
-            bengali: ['শালা', 'মাগী', 'বেশ্যা', 'হারামী'],
-            tamil: ['பொறுக்கி', 'தேவடியா', 'ஓத்த'],
-            telugu: ['గుద్ద', 'తేవడియా', 'కామ్మ'],
-            marathi: ['रंडी', 'कुत्रा', 'गधा'],
-            gujarati: ['કુતરો', 'ગધેડો', 'રંડી'],
-            punjabi: ['کتے', 'مجھے', 'رندی'],
-            malayalam: ['പൂറി', 'കുണ്ണ', 'തേവടിച്ചി'],
-            kannada: ['ಮಗ', 'ದೇವಡಿ', 'ಕುತ್ತೆ'],
-            oriya: ['କୁତା', 'ରଣ୍ଡି', 'ଗଧ'],
-            assamese: ['কুত্তা', 'গাধ', 'ৰণ্ডী'],
-            // Add more languages as needed up to 197 total languages
-        };
+    constructor(lexiconStore = LexiconStore.getInstance()) {
+        // Lexicons are compiled once per process and shared by every scan
+        this.lexicons = lexiconStore;
+    }
+
+    static shared() {
+        if (!ProfanityFilter.instance) {
+            ProfanityFilter.instance = new ProfanityFilter();
+        }
+        return ProfanityFilter.instance;
+    }
+
+    static preload(languages = ['English']) {
+        ProfanityFilter.shared().lexicons.preload(languages);
     }
 
-    static async scan(audioPath, detectedLanguages) {
-        const filter = new ProfanityFilter();
+    static async scan(audioPath, detectedLanguages, options = {}) {
+        const filter = ProfanityFilter.shared();
 
         try {
             // Get transcription with timestamps from language detection
             const languageResult = await LanguageDetector.detect(audioPath);
             const segments = languageResult.segments || [];
+            const languages = detectedLanguages.languages || ['English'];
 
-            const profanityTimestamps = [];
-
-            for (const segment of segments) {
-                const text = segment.text ? segment.text.toLowerCase() : '';
-                const startTime = segment.start || 0;
-                const endTime = segment.end || startTime + 5;
-
-                // Check for profanity in multiple languages
-                const hasProfanity = await filter.checkTextForProfanity(text, detectedLanguages.languages || ['English']);
-
-                if (hasProfanity.found) {
-                    profanityTimestamps.push({
-                        start: startTime,
-                        end: endTime,
-                        text: segment.text || '',
-                        words: hasProfanity.words,
-                        confidence: hasProfanity.confidence,
-                        language: segment.language || 'unknown'
-                    });
-                }
-            }
-
-            return profanityTimestamps;
+            return await filter.scanSegments(segments, languages, options);
 
         } catch (error) {
             console.error('Profanity scanning error:', error);
@@ -87,71 +43,182 @@ class ProfanityFilter {
         }
     }
 
-    async checkTextForProfanity(text, languages = ['English']) {
+    // Scans already-transcribed segments ({ start, end, text, language }); shared by
+    // scan() and the batch re-scanner so both produce identical timestamps
+    async scanSegments(segments, languages = ['English'], options = {}) {
+        // Lexicon pass: find the candidate segments
+        const lexiconStart = process.hrtime.bigint();
+        const results = new Map();
+
+        for (let i = 0; i < segments.length; i++) {
+            const text = segments[i].text ? segments[i].text.toLowerCase() : '';
+
+            // Check for profanity in multiple languages
+            const hasProfanity = await this.checkTextForProfanity(text, languages, options);
+            if (hasProfanity.found) {
+                results.set(i, hasProfanity);
+            }
+        }
+
+        Metrics.recordTiming('profanity.lexiconScan', Number(process.hrtime.bigint() - lexiconStart) / 1e6);
+
+        // Optional context pass: one parse of the whole transcript, candidates only
+        if (ContextScorer.isEnabled(options)) {
+            ContextScorer.apply(segments, results);
+        }
+
+        const profanityTimestamps = [];
+
+        for (const [index, hasProfanity] of results) {
+            const segment = segments[index];
+            const startTime = segment.start || 0;
+            const endTime = segment.end || startTime + 5;
+
+            profanityTimestamps.push({
+                start: startTime,
+                end: endTime,
+                text: segment.text || '',
+                words: hasProfanity.words,
+                confidence: hasProfanity.confidence,
+                language: segment.language || 'unknown',
+                ...(hasProfanity.fuzzyMatches && { fuzzyMatches: hasProfanity.fuzzyMatches })
+            });
+        }
+
+        return profanityTimestamps;
+    }
+
+    // Shapes scan timestamps into AudioFile.profanityAnalysis
+    summarize(profanityTimestamps) {
+        const timestamps = [];
+        const byLanguage = new Map();
+
+        for (const hit of profanityTimestamps) {
+            const severity = this.calculateSeverity(hit.words);
+
+            for (const word of hit.words) {
+                timestamps.push({
+                    start: hit.start,
+                    end: hit.end,
+                    word,
+                    confidence: hit.confidence,
+                    language: hit.language,
+                    severity
+                });
+
+                if (!byLanguage.has(hit.language)) byLanguage.set(hit.language, new Set());
+                byLanguage.get(hit.language).add(word);
+            }
+        }
+
+        const words = timestamps.map(timestamp => timestamp.word);
+        return {
+            found: timestamps.length > 0,
+            count: timestamps.length,
+            severity: this.calculateSeverity(words),
+            timestamps,
+            languageSpecific: Array.from(byLanguage, ([language, languageWords]) => ({
+                language,
+                count: timestamps.filter(timestamp => timestamp.language === language).length,
+                words: [...languageWords]
+            }))
+        };
+    }
+
+    // Opt-in: the allow lists only cover compromise's lexicon, and common words
+    // outside it ("sheet", "duck") still come back as sound-alikes
+    static isFuzzyEnabled(options = {}) {
+        if (options.fuzzyMatching !== undefined) return Boolean(options.fuzzyMatching);
+        return process.env.PROFANITY_FUZZY_MATCHING === 'true';
+    }
+
+    async checkTextForProfanity(text, languages = ['English'], options = {}) {
         const words = text.split(/\s+/);
         const foundProfanity = [];
         let confidence = 0;
 
-        // Check against English filter first
-        if (this.badWordsFilter.isProfane(text)) {
-            const profaneWords = this.badWordsFilter.list.filter(word => 
-                text.toLowerCase().includes(word.toLowerCase())
-            );
-            foundProfanity.push(...profaneWords);
-            confidence += 0.3;
-        }
+        // Normalize once (leetspeak, separators, diacritics, stretched letters), then
+        // make a single pass against the bad-words list and every language lexicon
+        const normalized = TextNormalizer.normalize(text);
+        const matcher = this.lexicons.getMatcher(languages);
+        let baseListHit = false;
+        const languageHits = new Set();
+        const seenTerms = new Set();
 
-        // Check against language-specific lists
-        for (const language of languages) {
-            const langKey = language.toLowerCase();
-            if (this.profanityLists[langKey]) {
-                for (const profanityWord of this.profanityLists[langKey]) {
-                    if (text.toLowerCase().includes(profanityWord.toLowerCase())) {
-                        foundProfanity.push(profanityWord);
-                        confidence += 0.4;
-                    }
-                }
+        for (const match of matcher.match(normalized)) {
+            // Many list spellings ("sh1t", "sh!t", "s_h_i_t") share one normalized term,
+            // so report what was actually said rather than whichever spelling matched
+            if (match.source === 'badwords') {
+                baseListHit = true;
+            } else {
+                languageHits.add(match.term);
+            }
+
+            if (!seenTerms.has(match.term)) {
+                seenTerms.add(match.term);
+                foundProfanity.push(match.source === 'badwords'
+                    ? ProfanityFilter.originalSpan(text, normalized, match)
+                    : match.word);
             }
         }
 
-        // Use NLP for context analysis if compromise is available
-        try {
-            const doc = compromise(text);
-            const negativeWords = doc.match('#Negative').out('array');
-            const angryWords = doc.match('#Angry').out('array');
+        // User-supplied words (re-clean with custom words) count like lexicon hits
+        if (options.customWords && options.customWords.length > 0) {
+            for (const match of ProfanityFilter.getCustomMatcher(options.customWords).match(normalized)) {
+                if (seenTerms.has(match.term)) continue;
 
-            if (negativeWords.length > 0 || angryWords.length > 0) {
-                confidence += 0.2;
-                foundProfanity.push(...negativeWords, ...angryWords);
+                seenTerms.add(match.term);
+                languageHits.add(match.term);
+                foundProfanity.push(match.word);
             }
-        } catch (nlpError) {
-            // Continue without NLP analysis
         }
 
-        // Pattern matching for common profanity patterns
-        const profanityPatterns = [
-            /f[\*\-_]?u[\*\-_]?c[\*\-_]?k/gi,
-            /s[\*\-_]?h[\*\-_]?i[\*\-_]?t/gi,
-            /b[\*\-_]?i[\*\-_]?t[\*\-_]?c[\*\-_]?h/gi,
-            /d[\*\-_]?a[\*\-_]?m[\*\-_]?n/gi,
-            /a[\*\-_]?s[\*\-_]?s/gi,
-            /h[\*\-_]?e[\*\-_]?l[\*\-_]?l/gi
-        ];
-
-        for (const pattern of profanityPatterns) {
-            const matches = text.match(pattern);
-            if (matches) {
-                foundProfanity.push(...matches);
-                confidence += 0.3;
+        // Fuzzy pass for what the automaton cannot see: ASR misspellings ("fock"),
+        // censored tokens ("f**k") and one-letter typos. Lower confidence than exact hits.
+        const fuzzyMatches = [];
+        if (ProfanityFilter.isFuzzyEnabled(options)) {
+            const index = this.lexicons.getPhoneticIndex(languages);
+
+            for (const token of words) {
+                const hit = index.lookup(token);
+                if (!hit || seenTerms.has(hit.entry.term)) continue;
+
+                seenTerms.add(hit.entry.term);
+                foundProfanity.push(hit.entry.word);
+                fuzzyMatches.push({
+                    token,
+                    word: hit.entry.word,
+                    method: hit.method,
+                    distance: hit.distance
+                });
+                confidence += 0.25;
             }
         }
 
-        return {
+        if (baseListHit) {
+            confidence += 0.3;
+        }
+        confidence += languageHits.size * 0.4;
+
+        const result = {
             found: foundProfanity.length > 0,
             words: [...new Set(foundProfanity)], // Remove duplicates
             confidence: Math.min(confidence, 1.0), // Cap at 1.0
             severity: this.calculateSeverity(foundProfanity)
         };
+        if (fuzzyMatches.length > 0) {
+            result.fuzzyMatches = fuzzyMatches;
+        }
+        return result;
+    }
+
+    // Maps a match in normalized text back to the characters it came from
+    static originalSpan(text, normalized, match) {
+        const source = text.normalize('NFC');
+        const start = normalized.offsets[match.start];
+        const end = match.end < normalized.offsets.length ? normalized.offsets[match.end] : source.length;
+
+        return source.slice(start, end).trim().replace(/[!?.,;:]+$/, '').toLowerCase();
     }
 
     calculateSeverity(profanityWords) {
@@ -162,18 +229,38 @@ class ProfanityFilter {
     }
 
     static async customFilter(text, customWords = []) {
-        const filter = new ProfanityFilter();
+        const filter = ProfanityFilter.shared();
+        const normalized = TextNormalizer.normalize(text);
+
+        if (filter.lexicons.getMatcher().test(normalized)) {
+            return true;
+        }
+
+        return customWords.length > 0 && ProfanityFilter.getCustomMatcher(customWords).test(normalized);
+    }
+
+    static getCustomMatcher(customWords) {
+        const cacheKey = customWords.join('\u0000');
+        let matcher = customMatchers.get(cacheKey);
 
-        // Add custom words to filter
-        filter.badWordsFilter.addWords(...customWords);
+        if (!matcher) {
+            matcher = ProfanityMatcher.compile(customWords.map(word => ({
+                term: word,
+                source: 'custom',
+                wholeWord: true
+            })));
+
+            if (customMatchers.size >= CUSTOM_MATCHER_CACHE_SIZE) {
+                customMatchers.delete(customMatchers.keys().next().value);
+            }
+            customMatchers.set(cacheKey, matcher);
+        }
 
-        return filter.badWordsFilter.isProfane(text);
+        return matcher;
     }
 
     static getLanguageSpecificWords(language) {
-        const filter = new ProfanityFilter();
-        const langKey = language.toLowerCase();
-        return filter.profanityLists[langKey] || [];
+        return ProfanityFilter.shared().lexicons.getWords(language);
     }
 }
 
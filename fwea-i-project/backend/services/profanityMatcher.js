@@ -0,0 +1,147 @@
+// Aho-Corasick automaton over a profanity lexicon.
+// Built once per lexicon and then shared, so matching a segment is a single
+// linear pass over the text no matter how many words are in the lexicon.
+// Words and text both go through TextNormalizer, which is what lets a single
+// automaton catch leetspeak, separators and stretched spellings.
+
+const TextNormalizer = require('./textNormalizer');
+
+const WORD_CHAR = /[\p{L}\p{N}]/u;
+
+class ProfanityMatcher {
+    constructor() {
+        this.transitions = [new Map()];
+        this.failure = [0];
+        this.outputs = [[]];
+        this.termCount = 0;
+        this.built = false;
+    }
+
+    static compile(entries) {
+        const matcher = new ProfanityMatcher();
+
+        for (const entry of entries) {
+            matcher.addWord(entry.term, entry);
+        }
+
+        return matcher.build();
+    }
+
+    // Adds a lexicon word in normalized form, remembering which letters were doubled
+    addWord(word, payload = {}) {
+        const normalized = TextNormalizer.normalize(word);
+        if (!normalized.text) return this;
+
+        const runs = normalized.runs.some(run => run > 1) ? normalized.runs : null;
+        return this.add(normalized.text, { ...payload, word, runs });
+    }
+
+    add(term, payload = {}) {
+        const key = String(term || '').toLowerCase();
+        if (!key) return this;
+
+        let state = 0;
+        for (const char of key) {
+            let next = this.transitions[state].get(char);
+            if (next === undefined) {
+                next = this.transitions.length;
+                this.transitions.push(new Map());
+                this.failure.push(0);
+                this.outputs.push([]);
+                this.transitions[state].set(char, next);
+            }
+            state = next;
+        }
+
+        this.outputs[state].push({ ...payload, term: key, length: key.length });
+        this.termCount++;
+        this.built = false;
+        return this;
+    }
+
+    build() {
+        const queue = [];
+
+        for (const next of this.transitions[0].values()) {
+            this.failure[next] = 0;
+            queue.push(next);
+        }
+
+        for (let head = 0; head < queue.length; head++) {
+            const state = queue[head];
+
+            for (const [char, next] of this.transitions[state]) {
+                let fallback = this.failure[state];
+                while (fallback !== 0 && !this.transitions[fallback].has(char)) {
+                    fallback = this.failure[fallback];
+                }
+
+                const target = this.transitions[fallback].get(char);
+                this.failure[next] = target !== undefined && target !== next ? target : 0;
+                this.outputs[next] = this.outputs[next].concat(this.outputs[this.failure[next]]);
+                queue.push(next);
+            }
+        }
+
+        this.built = true;
+        return this;
+    }
+
+    // Returns every lexicon hit as { term, start, end, ...payload }.
+    // Accepts raw text or the output of TextNormalizer.normalize; positions are
+    // in the normalized text. Entries compiled with `wholeWord: true` only
+    // match on word boundaries.
+    match(input) {
+        if (!this.built) this.build();
+
+        const normalized = typeof input === 'object' && input !== null
+            ? input
+            : TextNormalizer.normalize(input);
+        const haystack = normalized.text;
+        const matches = [];
+        let state = 0;
+        let index = 0;
+
+        for (const char of haystack) {
+            while (state !== 0 && !this.transitions[state].has(char)) {
+                state = this.failure[state];
+            }
+            state = this.transitions[state].get(char) || 0;
+            index += char.length;
+
+            for (const output of this.outputs[state]) {
+                const start = index - output.length;
+                if (output.wholeWord && !ProfanityMatcher.isWordBoundary(haystack, start, index)) {
+                    continue;
+                }
+                if (output.runs && !ProfanityMatcher.runsSatisfied(normalized.runs, start, output.runs)) {
+                    continue;
+                }
+                matches.push({ ...output, start, end: index });
+            }
+        }
+
+        return matches;
+    }
+
+    test(text) {
+        return this.match(text).length > 0;
+    }
+
+    // A collapsed match only counts if the text repeats each letter at least as
+    // often as the word does ("as" must not match "ass", "asssss" still should)
+    static runsSatisfied(textRuns, start, termRuns) {
+        for (let i = 0; i < termRuns.length; i++) {
+            if (textRuns[start + i] < termRuns[i]) return false;
+        }
+        return true;
+    }
+
+    static isWordBoundary(text, start, end) {
+        const before = start > 0 ? text[start - 1] : '';
+        const after = end < text.length ? text[end] : '';
+        return !WORD_CHAR.test(before) && !WORD_CHAR.test(after);
+    }
+}
+
+module.exports = ProfanityMatcher;
@@ -0,0 +1,171 @@
+const { MemoryCounterStore } = require('./counterStore');
+const Metrics = require('./metrics');
+
+const HOUR_MS = 60 * 60 * 1000;
+const SECOND_MS = 1000;
+
+// API rate limits per subscription tier: `hourly` over a sliding one-hour
+// window, `burst` requests per second on top of it. A user's own
+// apiAccess.rateLimit raises the hourly limit but never lowers it.
+const DEFAULT_HOURLY = parseInt(process.env.API_RATE_LIMIT, 10) || 100;
+const DEFAULT_BURST = parseInt(process.env.API_BURST_LIMIT, 10) || 10;
+const TIER_LIMITS = {
+    'single': { hourly: DEFAULT_HOURLY, burst: DEFAULT_BURST },
+    'day-pass': { hourly: DEFAULT_HOURLY * 3, burst: DEFAULT_BURST },
+    'dj-pro': { hourly: DEFAULT_HOURLY * 10, burst: DEFAULT_BURST * 2 },
+    'studio-elite': { hourly: DEFAULT_HOURLY * 50, burst: DEFAULT_BURST * 5 }
+};
+
+// Sliding-window counter plus token bucket, decided entirely in memory.
+//
+// The hourly count is the usual sliding-window estimate: the previous
+// window's total weighted by how much of it still overlaps the last hour,
+// plus the current window's total. Totals are what the shared counter store
+// reported at the last sync plus what this instance has counted since, so
+// consume() is a few Map and arithmetic operations with no I/O. Every
+// SYNC_INTERVAL_MS the unsynced counts are pushed to the store in one
+// incrementMany() call and the merged totals come back; across N instances
+// a key can overshoot by at most what the others admit within one sync
+// interval. The burst bucket is per instance.
+class RateLimiter {
+    static TIER_LIMITS = TIER_LIMITS;
+    static SYNC_INTERVAL_MS = parseInt(process.env.RATE_LIMIT_SYNC_MS, 10) || 250;
+
+    static shared = null;
+
+    constructor({ windowMs = HOUR_MS, store = new MemoryCounterStore(), prefix = 'rl' } = {}) {
+        this.windowMs = windowMs;
+        this.store = store;
+        this.prefix = prefix;
+        // key -> { window, synced, pending, previous, tokens, refilledAt, seenAt }
+        this.states = new Map();
+        this.timer = null;
+        this.syncing = null;
+        this.syncedAt = 0;
+    }
+
+    // The process-wide limiter for API keys, syncing in the background
+    static forApiKeys() {
+        if (!RateLimiter.shared) {
+            RateLimiter.shared = new RateLimiter({ prefix: 'rl:api' });
+            RateLimiter.shared.start();
+        }
+        return RateLimiter.shared;
+    }
+
+    // { hourly, burst } for a user (lean or document)
+    static limitsFor(user) {
+        const tier = user.subscription && user.subscription.tier;
+        const limits = TIER_LIMITS[tier] || TIER_LIMITS.single;
+        const own = user.apiAccess && user.apiAccess.rateLimit;
+        return {
+            hourly: Math.max(limits.hourly, own || 0),
+            burst: limits.burst
+        };
+    }
+
+    start() {
+        if (this.timer) return;
+        this.timer = setInterval(() => {
+            this.sync().catch(error => console.error('Rate limit sync error:', error.message));
+        }, RateLimiter.SYNC_INTERVAL_MS);
+        this.timer.unref();
+    }
+
+    async stop() {
+        clearInterval(this.timer);
+        this.timer = null;
+        await this.sync();
+    }
+
+    // Counts one request (or `cost`) against `key` if both limits allow it.
+    // Returns { allowed, limit, remaining, resetMs, retryAfterMs }.
+    consume(key, { hourly, burst }, cost = 1, now = Date.now()) {
+        const state = this.state(key, now);
+
+        // Burst: refill `burst` tokens per second, up to `burst`
+        state.tokens = Math.min(burst, state.tokens + ((now - state.refilledAt) / SECOND_MS) * burst);
+        state.refilledAt = now;
+
+        const window = Math.floor(now / this.windowMs);
+        const elapsed = (now - window * this.windowMs) / this.windowMs;
+        const used = state.previous * (1 - elapsed) + state.synced + state.pending;
+        const resetMs = (window + 1) * this.windowMs - now;
+
+        if (used + cost > hourly) {
+            Metrics.increment('rateLimit.rejected');
+            // Roughly when enough of the previous window slides out
+            const retryAfterMs = state.previous > 0
+                ? Math.min(resetMs, Math.ceil(((used + cost - hourly) / state.previous) * this.windowMs))
+                : resetMs;
+            return { allowed: false, limit: hourly, remaining: 0, resetMs, retryAfterMs };
+        }
+        if (state.tokens < cost) {
+            Metrics.increment('rateLimit.rejected');
+            const retryAfterMs = Math.ceil(((cost - state.tokens) / burst) * SECOND_MS);
+            return { allowed: false, limit: hourly, remaining: Math.floor(hourly - used), resetMs, retryAfterMs };
+        }
+
+        state.tokens -= cost;
+        state.pending += cost;
+        return { allowed: true, limit: hourly, remaining: Math.floor(hourly - used - cost), resetMs, retryAfterMs: 0 };
+    }
+
+    state(key, now) {
+        const window = Math.floor(now / this.windowMs);
+        let state = this.states.get(key);
+
+        if (!state) {
+            state = { window, synced: 0, pending: 0, previous: 0, tokens: Infinity, refilledAt: now, seenAt: now };
+            this.states.set(key, state);
+        } else if (state.window !== window) {
+            // Roll over; the previous window only counts if it was the one just before
+            state.previous = state.window === window - 1 ? state.synced + state.pending : 0;
+            state.window = window;
+            state.synced = 0;
+            // Unsynced requests from the old window are dropped with it
+            state.pending = 0;
+        }
+        state.seenAt = now;
+        return state;
+    }
+
+    // Pushes unsynced counts to the store and takes back the merged totals;
+    // forgets keys idle for two windows
+    sync(now = Date.now()) {
+        if (this.syncing) return this.syncing;
+
+        const sent = [];
+        for (const [key, state] of this.states) {
+            if (now - state.seenAt > 2 * this.windowMs) {
+                this.states.delete(key);
+            } else if (state.pending > 0 || state.seenAt >= this.syncedAt) {
+                // Keys in use also pick up other instances' counts (amount 0)
+                sent.push({ key, state, window: state.window, amount: state.pending });
+            }
+        }
+        this.syncedAt = now;
+        if (sent.length === 0) return Promise.resolve();
+
+        this.syncing = this.store.incrementMany(sent.map(({ key, window, amount }) => ({
+            key: `${this.prefix}:${key}:${window}`,
+            amount,
+            ttlMs: 2 * this.windowMs
+        }))).then(totals => {
+            sent.forEach(({ state, window, amount }, i) => {
+                if (state.window !== window) return;
+                state.pending -= amount;
+                state.synced = totals[i];
+            });
+        }).finally(() => { this.syncing = null; });
+
+        return this.syncing;
+    }
+
+    // Drops a key's local state, e.g. after its API key was rotated
+    forget(key) {
+        this.states.delete(key);
+    }
+}
+
+module.exports = RateLimiter;
@@ -0,0 +1,71 @@
+const crypto = require('crypto');
+const fs = require('fs');
+const path = require('path');
+
+const DEFAULT_RENDER_CACHE_PATH = path.join(__dirname, '..', 'cache', 'renders');
+
+// Full-quality clean outputs, rendered on demand (payment or first download)
+// and cached by what they were rendered from:
+//
+//   <sha256 of upload>-<hash of mask intervals + render settings>-<bitrate>.<format>
+//
+// Identical uploads cleaned the same way share a render. The key covers the
+// mute intervals themselves, not just the lexicon version they came from, so
+// the same upload with a different transcript, or a re-clean that changes
+// the mask or censor mode, gets a new entry instead of another job's render
+// (or overwriting one that may be downloading). Concurrent requests for the
+// same render share one in-flight promise.
+class RenderCache {
+    static inFlight = new Map();
+
+    static root() {
+        return process.env.RENDER_CACHE_PATH || DEFAULT_RENDER_CACHE_PATH;
+    }
+
+    // variant: { hash, maskVersion, intervals, render, format, bitrate }
+    static key(variant) {
+        const intervals = (variant.intervals || []).map(interval => `${interval.start}-${interval.end}`).join(',');
+        const settings = crypto.createHash('sha1')
+            .update(`${variant.maskVersion}\n${intervals}\n${JSON.stringify(variant.render || {})}`)
+            .digest('hex')
+            .slice(0, 16);
+        return `${variant.hash.slice(0, 32)}-${settings}-${variant.bitrate || 'lossless'}`;
+    }
+
+    static pathFor(variant) {
+        return path.join(RenderCache.root(), `${RenderCache.key(variant)}.${variant.format}`);
+    }
+
+    static async has(variant) {
+        try {
+            await fs.promises.access(RenderCache.pathFor(variant));
+            return true;
+        } catch (error) {
+            return false;
+        }
+    }
+
+    // Runs `fn` once per `key` at a time; later callers get the same promise
+    static once(key, fn) {
+        if (!RenderCache.inFlight.has(key)) {
+            const pending = Promise.resolve()
+                .then(fn)
+                .finally(() => RenderCache.inFlight.delete(key));
+            RenderCache.inFlight.set(key, pending);
+        }
+        return RenderCache.inFlight.get(key);
+    }
+
+    // Streaming sha256 of a file, hex
+    static hashFile(filePath) {
+        return new Promise((resolve, reject) => {
+            const hash = crypto.createHash('sha256');
+            fs.createReadStream(filePath)
+                .on('error', reject)
+                .on('data', chunk => hash.update(chunk))
+                .on('end', () => resolve(hash.digest('hex')));
+        });
+    }
+}
+
+module.exports = RenderCache;
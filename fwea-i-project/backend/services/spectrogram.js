@@ -0,0 +1,162 @@
+const FFT = require('./fft');
+
+// Streaming STFT -> log-magnitude uint8 spectrogram, tiled by time.
+//
+// push() takes mono Float64 samples in any block size; every complete frame
+// (fftSize samples, every hopSize) is transformed in batches and quantised:
+//
+//   value = 255 * (dB - floorDb) / -floorDb, clamped to 0..255
+//
+// where 0 dB is a full-scale sine. Frames are grouped into tiles of
+// `tileFrames` columns (Uint8Array, frame-major: tile[frame * bins + bin]),
+// handed to onTile as they complete so clients can load progressively.
+class Spectrogram {
+    static DEFAULTS = {
+        fftSize: 2048,
+        hopSize: 512,
+        windowFunction: 'hann',
+        tileFrames: 256,
+        floorDb: -100
+    };
+    static BATCH_FRAMES = 64;
+
+    constructor(sampleRate, options = {}, onTile = () => {}) {
+        const settings = { ...Spectrogram.DEFAULTS, ...options };
+        this.sampleRate = sampleRate;
+        this.fftSize = settings.fftSize;
+        this.hopSize = settings.hopSize;
+        this.tileFrames = settings.tileFrames;
+        this.floorDb = settings.floorDb;
+        this.onTile = onTile;
+
+        this.fft = new FFT(this.fftSize, settings.windowFunction);
+        this.bins = this.fft.bins;
+        // Power of a full-scale sine at its bin: (windowSum / 2)^2
+        const powerScale = Math.pow(2 / this.fft.windowSum, 2);
+        this.power = new Float64Array(Spectrogram.BATCH_FRAMES * this.bins);
+
+        // Raw power at which level q (1..255) starts, i.e. where the dB value rounds up to q
+        this.thresholds = new Float64Array(256);
+        this.thresholds[0] = -Infinity;
+        for (let q = 1; q < 256; q++) {
+            const db = this.floorDb + ((q - 0.5) * -this.floorDb) / 255;
+            this.thresholds[q] = Math.pow(10, db / 10) / powerScale;
+        }
+
+        this.pending = new Float64Array(this.fftSize * 4);
+        this.pendingLength = 0;
+        this.frames = 0;
+        this.tileIndex = 0;
+        this.tile = new Uint8Array(this.tileFrames * this.bins);
+        this.tileFill = 0;
+    }
+
+    push(samples) {
+        this.append(samples);
+        this.drain();
+    }
+
+    // Emits the last, partly filled tile
+    finish() {
+        if (this.tileFill > 0) this.emitTile();
+        return this.describe();
+    }
+
+    describe() {
+        return {
+            sampleRate: this.sampleRate,
+            fftSize: this.fftSize,
+            hopSize: this.hopSize,
+            windowFunction: this.fft.windowFunction,
+            bins: this.bins,
+            binHz: this.sampleRate / this.fftSize,
+            tileFrames: this.tileFrames,
+            floorDb: this.floorDb,
+            frames: this.frames,
+            tiles: this.tileIndex,
+            frameDuration: this.hopSize / this.sampleRate
+        };
+    }
+
+    append(samples) {
+        const needed = this.pendingLength + samples.length;
+        if (needed > this.pending.length) {
+            const grown = new Float64Array(Math.max(needed, this.pending.length * 2));
+            grown.set(this.pending.subarray(0, this.pendingLength));
+            this.pending = grown;
+        }
+        this.pending.set(samples, this.pendingLength);
+        this.pendingLength = needed;
+    }
+
+    drain() {
+        const { fftSize, hopSize, bins } = this;
+        let offset = 0;
+
+        while (this.pendingLength - offset >= fftSize) {
+            const available = Math.floor((this.pendingLength - offset - fftSize) / hopSize) + 1;
+            const count = Math.min(available, Spectrogram.BATCH_FRAMES, this.tileFrames - this.tileFill);
+
+            this.fft.powerSpectrumBatch(this.pending, offset, hopSize, count, this.power);
+            this.quantize(count, this.tile, this.tileFill * bins);
+
+            this.tileFill += count;
+            this.frames += count;
+            offset += count * hopSize;
+
+            if (this.tileFill === this.tileFrames) this.emitTile();
+        }
+
+        // Keep the unconsumed tail (the overlap with the next frame)
+        this.pending.copyWithin(0, offset, this.pendingLength);
+        this.pendingLength -= offset;
+    }
+
+    // Quantising compares power against the 255 level boundaries (binary
+    // search over a precomputed table) instead of taking a log per bin
+    quantize(count, target, targetOffset) {
+        const { power, thresholds } = this;
+        const total = count * this.bins;
+
+        for (let i = 0; i < total; i++) {
+            const value = power[i];
+            let low = 0;
+            let high = 255;
+            while (low < high) {
+                const mid = (low + high + 1) >> 1;
+                if (value >= thresholds[mid]) low = mid; else high = mid - 1;
+            }
+            target[targetOffset + i] = low;
+        }
+    }
+
+    emitTile() {
+        const frames = this.tileFill;
+        this.onTile({
+            index: this.tileIndex,
+            startFrame: this.tileIndex * this.tileFrames,
+            startTime: (this.tileIndex * this.tileFrames * this.hopSize) / this.sampleRate,
+            frames,
+            bins: this.bins,
+            data: this.tile.slice(0, frames * this.bins)
+        });
+        this.tileIndex++;
+        this.tileFill = 0;
+    }
+
+    // Interleaved s16 -> mono Float64 in [-1, 1)
+    static mixDown(samples, channels) {
+        const frames = samples.length / channels;
+        const mono = new Float64Array(frames);
+        const scale = 1 / (32768 * channels);
+
+        for (let i = 0, j = 0; i < frames; i++) {
+            let sum = 0;
+            for (let c = 0; c < channels; c++) sum += samples[j++];
+            mono[i] = sum * scale;
+        }
+        return mono;
+    }
+}
+
+module.exports = Spectrogram;
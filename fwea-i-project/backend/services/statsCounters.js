@@ -0,0 +1,197 @@
+const mongoose = require('mongoose');
+const StatsBucket = require('../models/StatsBucket');
+
+const MINUTE_MS = 60 * 1000;
+const DAY_MS = 24 * 60 * MINUTE_MS;
+
+// Live counters behind /api/stats: jobs completed today and the average
+// processing time over the last ROLLING_MINUTES, kept in memory and updated
+// as jobs complete, so reading them is O(1) instead of an aggregate over
+// ProcessingJob on every homepage poll.
+//
+// Completions are bucketed by minute and by (server local) day. Unflushed
+// increments are written to StatsBucket with $inc every FLUSH_INTERVAL_MS;
+// each flush then reloads today's and the rolling window's buckets, which
+// picks up completions recorded by other instances and survives restarts.
+class StatsCounters {
+    static ROLLING_MINUTES = 60;
+    static FLUSH_INTERVAL_MS = parseInt(process.env.STATS_FLUSH_INTERVAL_MS, 10) || 15000;
+
+    static today = { key: null, jobs: 0, totalMs: 0 };
+    // Minute buckets inside the rolling window, oldest first
+    static minutes = [];
+    static rolling = { jobs: 0, totalMs: 0 };
+    // Increments not yet written, by bucket key
+    static pending = new Map();
+    static timer = null;
+
+    static start() {
+        if (StatsCounters.timer) return;
+        StatsCounters.timer = setInterval(() => {
+            StatsCounters.flush().catch(error => console.error('Stats flush error:', error.message));
+        }, StatsCounters.FLUSH_INTERVAL_MS);
+        StatsCounters.timer.unref();
+        StatsCounters.refresh().catch(error => console.error('Stats load error:', error.message));
+    }
+
+    static async stop() {
+        clearInterval(StatsCounters.timer);
+        StatsCounters.timer = null;
+        await StatsCounters.flush();
+    }
+
+    static recordCompletion(processingMs, at = new Date()) {
+        const day = StatsCounters.dayKey(at);
+        const minute = Math.floor(at.getTime() / MINUTE_MS);
+
+        StatsCounters.rollDay(day);
+        StatsCounters.today.jobs++;
+        StatsCounters.today.totalMs += processingMs;
+
+        const last = StatsCounters.minutes[StatsCounters.minutes.length - 1];
+        if (last && last.minute === minute) {
+            last.jobs++;
+            last.totalMs += processingMs;
+        } else {
+            StatsCounters.minutes.push({ minute, jobs: 1, totalMs: processingMs });
+        }
+        StatsCounters.rolling.jobs++;
+        StatsCounters.rolling.totalMs += processingMs;
+
+        StatsCounters.addPending(`day:${day}`, 'day', StatsCounters.dayStart(at), processingMs);
+        StatsCounters.addPending(`minute:${minute}`, 'minute', new Date(minute * MINUTE_MS), processingMs);
+    }
+
+    // { tracksProcessedToday, avgProcessingMs (null before any job), rollingJobs }
+    static snapshot(now = new Date()) {
+        StatsCounters.rollDay(StatsCounters.dayKey(now));
+        StatsCounters.evict(now);
+
+        const { today, rolling } = StatsCounters;
+        let avgProcessingMs = null;
+        if (rolling.jobs > 0) {
+            avgProcessingMs = rolling.totalMs / rolling.jobs;
+        } else if (today.jobs > 0) {
+            avgProcessingMs = today.totalMs / today.jobs;
+        }
+
+        return {
+            tracksProcessedToday: today.jobs,
+            avgProcessingMs,
+            rollingJobs: rolling.jobs
+        };
+    }
+
+    static async flush() {
+        if (mongoose.connection.readyState !== 1) return;
+
+        if (StatsCounters.pending.size > 0) {
+            const batch = StatsCounters.pending;
+            StatsCounters.pending = new Map();
+
+            try {
+                await StatsBucket.bulkWrite([...batch].map(([key, bucket]) => ({
+                    updateOne: {
+                        filter: { key },
+                        update: {
+                            $inc: { jobsCompleted: bucket.jobs, totalProcessingMs: bucket.totalMs },
+                            $setOnInsert: {
+                                granularity: bucket.granularity,
+                                start: bucket.start,
+                                expiresAt: new Date(bucket.start.getTime() + (bucket.granularity === 'day' ? 400 * DAY_MS : 2 * DAY_MS))
+                            }
+                        },
+                        upsert: true
+                    }
+                })), { ordered: false });
+            } catch (error) {
+                // Put the increments back for the next flush
+                for (const [key, bucket] of batch) {
+                    StatsCounters.addPending(key, bucket.granularity, bucket.start, bucket.totalMs, bucket.jobs);
+                }
+                throw error;
+            }
+        }
+
+        await StatsCounters.refresh();
+    }
+
+    // Replaces the in-memory counters with the stored buckets plus whatever
+    // hasn't been flushed yet
+    static async refresh(now = new Date()) {
+        if (mongoose.connection.readyState !== 1) return;
+
+        const day = StatsCounters.dayKey(now);
+        const since = new Date((Math.floor(now.getTime() / MINUTE_MS) - StatsCounters.ROLLING_MINUTES + 1) * MINUTE_MS);
+        const [dayBucket, minuteBuckets] = await Promise.all([
+            StatsBucket.findOne({ key: `day:${day}` }).lean(),
+            StatsBucket.find({ granularity: 'minute', start: { $gte: since } }).sort({ start: 1 }).lean()
+        ]);
+
+        const pendingDay = StatsCounters.pending.get(`day:${day}`);
+        StatsCounters.today = {
+            key: day,
+            jobs: (dayBucket ? dayBucket.jobsCompleted : 0) + (pendingDay ? pendingDay.jobs : 0),
+            totalMs: (dayBucket ? dayBucket.totalProcessingMs : 0) + (pendingDay ? pendingDay.totalMs : 0)
+        };
+
+        const minutes = new Map();
+        for (const bucket of minuteBuckets) {
+            const minute = Math.floor(bucket.start.getTime() / MINUTE_MS);
+            minutes.set(minute, { minute, jobs: bucket.jobsCompleted, totalMs: bucket.totalProcessingMs });
+        }
+        for (const [key, bucket] of StatsCounters.pending) {
+            if (bucket.granularity !== 'minute') continue;
+            const minute = Number(key.slice('minute:'.length));
+            const entry = minutes.get(minute) || { minute, jobs: 0, totalMs: 0 };
+            entry.jobs += bucket.jobs;
+            entry.totalMs += bucket.totalMs;
+            minutes.set(minute, entry);
+        }
+
+        StatsCounters.minutes = [...minutes.values()].sort((a, b) => a.minute - b.minute);
+        StatsCounters.rolling = StatsCounters.minutes.reduce((sum, entry) => ({
+            jobs: sum.jobs + entry.jobs,
+            totalMs: sum.totalMs + entry.totalMs
+        }), { jobs: 0, totalMs: 0 });
+        StatsCounters.evict(now);
+    }
+
+    static addPending(key, granularity, start, totalMs, jobs = 1) {
+        const bucket = StatsCounters.pending.get(key) || { granularity, start, jobs: 0, totalMs: 0 };
+        bucket.jobs += jobs;
+        bucket.totalMs += totalMs;
+        StatsCounters.pending.set(key, bucket);
+    }
+
+    // Drops minute buckets that have left the rolling window
+    static evict(now) {
+        const oldest = Math.floor(now.getTime() / MINUTE_MS) - StatsCounters.ROLLING_MINUTES + 1;
+        const { minutes, rolling } = StatsCounters;
+        while (minutes.length > 0 && minutes[0].minute < oldest) {
+            const expired = minutes.shift();
+            rolling.jobs -= expired.jobs;
+            rolling.totalMs -= expired.totalMs;
+        }
+    }
+
+    static rollDay(day) {
+        if (StatsCounters.today.key !== day) {
+            StatsCounters.today = { key: day, jobs: 0, totalMs: 0 };
+        }
+    }
+
+    static dayStart(date) {
+        const start = new Date(date);
+        start.setHours(0, 0, 0, 0);
+        return start;
+    }
+
+    static dayKey(date) {
+        const month = String(date.getMonth() + 1).padStart(2, '0');
+        const day = String(date.getDate()).padStart(2, '0');
+        return `${date.getFullYear()}-${month}-${day}`;
+    }
+}
+
+module.exports = StatsCounters;
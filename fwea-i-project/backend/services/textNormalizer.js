@@ -0,0 +1,178 @@
+// Normalization pipeline shared by lexicon compilation and transcript scanning.
+// Both sides go through the same steps so one automaton catches obfuscated
+// spellings in every language:
+//
+//   1. lowercase + diacritic folding (Latin, Greek, Cyrillic, Arabic, Hebrew)
+//   2. leetspeak folding inside tokens that contain letters ("sh1t" -> "shit")
+//   3. separator stripping inside tokens ("f*u*c*k", "f-u-c-k" -> "fuck")
+//   4. joining runs of spaced-out single letters ("f u c k" -> "fuck")
+//   5. repeated-character collapse ("fuuuuck" -> "fuck")
+//
+// Collapsing loses the run lengths, so they are returned alongside the text and
+// the matcher checks them afterwards. That keeps "ass" from matching "as".
+
+const LEET_MAP = {
+    '0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't', '8': 'b', '9': 'g',
+    '@': 'a', '$': 's', '!': 'i', '|': 'l', '+': 't', '€': 'e', '£': 'l'
+};
+
+const SPECIAL_FOLDS = {
+    'ß': 'ss', 'æ': 'ae', 'œ': 'oe', 'ø': 'o', 'ł': 'l', 'đ': 'd', 'ð': 'd', 'þ': 'th', 'ı': 'i'
+};
+
+// Scripts where combining marks are decoration and can be dropped. Indic and
+// Southeast Asian scripts are excluded because their marks are vowels.
+const FOLDABLE_BASE = /[\p{Script=Latin}\p{Script=Greek}\p{Script=Cyrillic}\p{Script=Arabic}\p{Script=Hebrew}]/u;
+const COMBINING_MARK = /\p{M}/u;
+const LETTER = /\p{L}/u;
+const WORD_CHAR = /[\p{L}\p{N}\p{M}]/u;
+const INVISIBLE = /[\u00ad\u0640\u200b-\u200d\u2060\ufeff]/;
+
+const LEADING_PUNCTUATION = /^[("'\u201c\u2018\u00ab\u00bf\u00a1\[{]+/;
+const TRAILING_PUNCTUATION = /[!?.,;:\u2026"'\u201d\u2019\u00bb)\]}]+$/;
+
+const foldCache = new Map();
+
+class TextNormalizer {
+    // Returns { text, runs, offsets }:
+    //   text    - normalized text, one space between tokens
+    //   runs    - run length of each character of `text` before collapsing
+    //   offsets - index in the (NFC) input each character came from
+    static normalize(input) {
+        const source = String(input || '').normalize('NFC');
+        const tokens = TextNormalizer.tokenize(source);
+        const chars = [];
+        const runs = [];
+        const offsets = [];
+
+        const pushChar = (char, offset) => {
+            const last = chars.length - 1;
+            if (last >= 0 && chars[last] === char && char !== ' ') {
+                runs[last]++;
+                return;
+            }
+            chars.push(char);
+            runs.push(1);
+            offsets.push(offset);
+        };
+
+        for (let t = 0; t < tokens.length; t++) {
+            // Join spaced-out letters: "f u c k" is written to mean one word
+            let group = [tokens[t]];
+            if (TextNormalizer.isSingleLetter(tokens[t])) {
+                let end = t + 1;
+                while (end < tokens.length && TextNormalizer.isSingleLetter(tokens[end])) end++;
+                if (end - t >= 3) {
+                    group = tokens.slice(t, end);
+                    t = end - 1;
+                }
+            }
+
+            if (chars.length > 0) pushChar(' ', group[0].offset);
+
+            for (const token of group) {
+                for (const [char, offset] of token.chars) {
+                    pushChar(char, offset);
+                }
+            }
+        }
+
+        const text = chars.join('');
+        const unitRuns = new Uint16Array(text.length);
+        const unitOffsets = new Int32Array(text.length);
+        let unit = 0;
+
+        for (let i = 0; i < chars.length; i++) {
+            for (let k = 0; k < chars[i].length; k++) {
+                unitRuns[unit] = Math.min(runs[i], 0xffff);
+                unitOffsets[unit] = offsets[i];
+                unit++;
+            }
+        }
+
+        return { text, runs: unitRuns, offsets: unitOffsets };
+    }
+
+    // Splits on whitespace and folds each token into [char, originalOffset] pairs
+    static tokenize(source) {
+        const tokens = [];
+        const pattern = /\S+/g;
+        let match;
+
+        while ((match = pattern.exec(source)) !== null) {
+            let raw = match[0];
+            let offset = match.index;
+
+            const leading = raw.match(LEADING_PUNCTUATION);
+            if (leading) {
+                raw = raw.slice(leading[0].length);
+                offset += leading[0].length;
+            }
+            raw = raw.replace(TRAILING_PUNCTUATION, '');
+            if (!raw) continue;
+
+            const hasLetter = LETTER.test(raw);
+            const chars = [];
+            let index = offset;
+
+            for (const char of raw) {
+                const folded = TextNormalizer.foldChar(char, hasLetter);
+                for (const out of folded) {
+                    chars.push([out, index]);
+                }
+                index += char.length;
+            }
+
+            if (chars.length > 0) {
+                tokens.push({ chars, offset });
+            }
+        }
+
+        return tokens;
+    }
+
+    static foldChar(char, leetAllowed) {
+        const lower = char.toLowerCase();
+
+        if (leetAllowed && LEET_MAP[lower]) {
+            return LEET_MAP[lower];
+        }
+
+        const code = lower.charCodeAt(0);
+        if (code < 0x80) {
+            // ASCII fast path: keep letters/digits, drop separators and symbols
+            return /[a-z0-9]/.test(lower) ? lower : '';
+        }
+
+        let folded = foldCache.get(lower);
+        if (folded === undefined) {
+            folded = TextNormalizer.foldUnicode(lower);
+            foldCache.set(lower, folded);
+        }
+        return folded;
+    }
+
+    static foldUnicode(char) {
+        if (SPECIAL_FOLDS[char]) return SPECIAL_FOLDS[char];
+        if (INVISIBLE.test(char)) return '';
+
+        const decomposed = char.normalize('NFKD');
+        const base = decomposed[0];
+
+        if (FOLDABLE_BASE.test(base)) {
+            return Array.from(decomposed).filter(c => !COMBINING_MARK.test(c)).join('').toLowerCase();
+        }
+
+        // Separators and symbols inside a token are obfuscation, not content
+        if (!WORD_CHAR.test(char)) return '';
+
+        // Compatibility forms (full-width, half-width kana) fold to their canonical letters
+        return char.normalize('NFKC');
+    }
+
+    static isSingleLetter(token) {
+        return token.chars.length === 1 && LETTER.test(token.chars[0][0]);
+    }
+}
+
+module.exports = TextNormalizer;
@@ -0,0 +1,113 @@
+// Sorted (time, value) events, queried by time range with a binary search.
+//
+// Built once during the streaming analysis pass (events arrive in time order)
+// and stored as a job artifact; range() costs O(log n + k) for k results, so
+// the frontend can ask for the peaks or onsets in view without a rescan.
+class TimeIndex {
+    // Loaded indexes by artifact path, most recently used last
+    static cache = new Map();
+    static CACHE_LIMIT = 64;
+
+    constructor(times = [], values = []) {
+        this.times = Float64Array.from(times);
+        this.values = Float32Array.from(values);
+        this.length = this.times.length;
+    }
+
+    get size() {
+        return this.length;
+    }
+
+    // Appends an event; times must not decrease
+    add(time, value) {
+        if (this.length > 0 && time < this.times[this.length - 1]) {
+            throw new Error('TimeIndex events must be added in time order');
+        }
+        if (this.length === this.times.length) {
+            const capacity = Math.max(64, this.times.length * 2);
+            const times = new Float64Array(capacity);
+            const values = new Float32Array(capacity);
+            times.set(this.times);
+            values.set(this.values);
+            this.times = times;
+            this.values = values;
+        }
+        this.times[this.length] = time;
+        this.values[this.length] = value;
+        this.length++;
+    }
+
+    // First position whose time is >= `time`
+    lowerBound(time) {
+        let low = 0;
+        let high = this.length;
+        while (low < high) {
+            const mid = (low + high) >> 1;
+            if (this.times[mid] < time) low = mid + 1; else high = mid;
+        }
+        return low;
+    }
+
+    // Events with start <= time < end, as [{ time, value }]
+    range(start = 0, end = Infinity, limit = Infinity) {
+        const events = [];
+        for (let i = this.lowerBound(start); i < this.length && this.times[i] < end && events.length < limit; i++) {
+            events.push({ time: this.times[i], value: this.values[i] });
+        }
+        return events;
+    }
+
+    count(start = 0, end = Infinity) {
+        return this.lowerBound(end) - this.lowerBound(start);
+    }
+
+    // Closest event to `time`, or null when empty
+    nearest(time) {
+        if (this.length === 0) return null;
+        const i = this.lowerBound(time);
+        const candidate = i === this.length || (i > 0 && time - this.times[i - 1] <= this.times[i] - time) ? i - 1 : i;
+        return { time: this.times[candidate], value: this.values[candidate] };
+    }
+
+    toJSON() {
+        return {
+            times: Array.from(this.times.subarray(0, this.length), time => Number(time.toFixed(4))),
+            values: Array.from(this.values.subarray(0, this.length), value => Number(value.toFixed(4)))
+        };
+    }
+
+    static fromJSON(data) {
+        return new TimeIndex(data ? data.times : [], data ? data.values : []);
+    }
+
+    // Reads an index saved with JobArtifacts.writeJson, keeping recent ones in
+    // memory so repeated range queries don't re-parse the file
+    static async load(artifacts, name, field) {
+        const key = `${artifacts.path(name)}#${field}`;
+        if (TimeIndex.cache.has(key)) {
+            const cached = TimeIndex.cache.get(key);
+            TimeIndex.cache.delete(key);
+            TimeIndex.cache.set(key, cached);
+            return cached;
+        }
+
+        const data = await artifacts.readJson(name);
+        if (!data || !data[field]) return null;
+
+        const index = TimeIndex.fromJSON(data[field]);
+        TimeIndex.cache.set(key, index);
+        if (TimeIndex.cache.size > TimeIndex.CACHE_LIMIT) {
+            TimeIndex.cache.delete(TimeIndex.cache.keys().next().value);
+        }
+        return index;
+    }
+
+    static forget(artifacts, name) {
+        const prefix = `${artifacts.path(name)}#`;
+        for (const key of TimeIndex.cache.keys()) {
+            if (key.startsWith(prefix)) TimeIndex.cache.delete(key);
+        }
+    }
+}
+
+module.exports = TimeIndex;
@@ -0,0 +1,144 @@
+const TimeIndex = require('./timeIndex');
+
+// Peaks and onsets from the streaming analysis pass, with absolute times.
+//
+// The channel mix is cut into hops of 512 samples (about 11.6 ms at 44.1 kHz).
+// Per hop it keeps the largest absolute sample and the mean-square energy:
+//
+//   peaks   hops whose max is a local maximum, at least `minPeakGap` apart,
+//           kept if at or above `peakThreshold` times the loudest peak of the
+//           track (so quiet and brickwalled masters both get useful peaks);
+//           the time is the sample position of the max
+//   onsets  rises in energy: the detection function is the positive change in
+//           hop energy (dB); an onset is a local maximum of it that beats the
+//           mean of the last `onsetWindow` seconds by `onsetRatio` and
+//           `onsetDeltaDb`, at least `minOnsetGap` after the previous one
+//
+// Both come out as TimeIndex instances (value: linear peak / rise in dB).
+class TransientDetector {
+    static DEFAULTS = {
+        hopSize: 512,
+        peakThreshold: 0.7,
+        minPeakGap: 0.1,
+        onsetWindow: 0.5,
+        onsetRatio: 1.5,
+        onsetDeltaDb: 3,
+        minOnsetGap: 0.05,
+        silenceDb: -50
+    };
+
+    constructor(sampleRate, channels, options = {}) {
+        this.settings = { ...TransientDetector.DEFAULTS, ...options };
+        this.sampleRate = sampleRate;
+        this.channels = channels;
+
+        this.peakCandidates = new TimeIndex();
+        this.onsets = new TimeIndex();
+        this.loudestPeak = 0;
+
+        // Current hop
+        this.hopFill = 0;
+        this.hopMax = 0;
+        this.hopMaxAt = 0;
+        this.hopSquares = 0;
+        this.position = 0;
+        this.hops = 0;
+
+        // Previous two hops, for one-hop-lookahead local maxima
+        this.peakHistory = [{ max: 0, at: 0 }, { max: 0, at: 0 }];
+        this.lastPeak = -Infinity;
+        this.previousDb = null;
+        this.flux = [0, 0];
+
+        const windowHops = Math.max(1, Math.round((this.settings.onsetWindow * sampleRate) / this.settings.hopSize));
+        this.fluxWindow = new Float64Array(windowHops);
+        this.fluxSum = 0;
+        this.lastOnset = -Infinity;
+        this.silence = this.settings.silenceDb;
+    }
+
+    // Interleaved Int16Array of whole frames, in order
+    push(samples) {
+        const { channels } = this;
+        const hopSize = this.settings.hopSize;
+        const scale = 1 / (32768 * channels);
+        const frames = samples.length / channels;
+
+        for (let i = 0, j = 0; i < frames; i++) {
+            let sum = 0;
+            for (let c = 0; c < channels; c++) sum += samples[j++];
+            const value = sum * scale;
+            const magnitude = value < 0 ? -value : value;
+
+            if (magnitude > this.hopMax) {
+                this.hopMax = magnitude;
+                this.hopMaxAt = this.position;
+            }
+            this.hopSquares += value * value;
+            this.position++;
+
+            if (++this.hopFill === hopSize) this.endHop();
+        }
+    }
+
+    endHop() {
+        const { settings, sampleRate } = this;
+        const hopStart = this.position - this.hopFill;
+
+        // Peaks: the middle of the last three hops
+        const [older, middle] = this.peakHistory;
+        const current = { max: this.hopMax, at: this.hopMaxAt };
+        if (middle.max > older.max && middle.max >= current.max) {
+            const time = middle.at / sampleRate;
+            if (time - this.lastPeak >= settings.minPeakGap) {
+                this.peakCandidates.add(time, middle.max);
+                this.loudestPeak = Math.max(this.loudestPeak, middle.max);
+                this.lastPeak = time;
+            }
+        }
+        this.peakHistory = [middle, current];
+
+        // Onsets: rectified rise in hop energy, picked one hop late
+        const db = 10 * Math.log10(this.hopSquares / this.hopFill + 1e-12);
+        const rise = this.previousDb === null || db < this.silence ? 0 : Math.max(0, db - this.previousDb);
+        this.previousDb = db;
+
+        const [previousRise, candidate] = this.flux;
+        const mean = this.fluxSum / this.fluxWindow.length;
+        if (candidate > previousRise && candidate >= rise &&
+            candidate >= settings.onsetDeltaDb && candidate > mean * settings.onsetRatio) {
+            // The candidate hop started one hop before this one
+            const time = (hopStart - settings.hopSize) / sampleRate;
+            if (time - this.lastOnset >= settings.minOnsetGap) {
+                this.onsets.add(Math.max(0, time), candidate);
+                this.lastOnset = time;
+            }
+        }
+        this.flux = [candidate, rise];
+
+        const slot = this.hops % this.fluxWindow.length;
+        this.fluxSum += candidate - this.fluxWindow[slot];
+        this.fluxWindow[slot] = candidate;
+        this.hops++;
+
+        this.hopFill = 0;
+        this.hopMax = 0;
+        this.hopSquares = 0;
+    }
+
+    // { peaks: TimeIndex, onsets: TimeIndex }
+    result() {
+        if (this.hopFill > 0) this.endHop();
+
+        const peaks = new TimeIndex();
+        const threshold = this.settings.peakThreshold * this.loudestPeak;
+        const { times, values } = this.peakCandidates;
+        for (let i = 0; i < this.peakCandidates.length; i++) {
+            if (values[i] > 0 && values[i] >= threshold) peaks.add(times[i], values[i]);
+        }
+
+        return { peaks, onsets: this.onsets };
+    }
+}
+
+module.exports = TransientDetector;
@@ -0,0 +1,151 @@
+const mongoose = require('mongoose');
+const UsageCounter = require('../models/UsageCounter');
+
+// Per-user track quotas and usage, without loading or saving the User.
+//
+// record() counts a track in memory (reserve() checks the quota and counts
+// in one step); increments are written to UsageCounter
+// every FLUSH_INTERVAL_MS as one bulk $inc per user and bucket, so a busy API
+// account costs one write per interval instead of one document save per
+// track, and concurrent jobs can't overwrite each other's counts. Quota
+// checks read a per-user cache of today's and this month's totals (stored
+// plus unflushed), reloaded after CACHE_TTL_MS; unlimited tiers never read.
+class UsageCounters {
+    static FLUSH_INTERVAL_MS = parseInt(process.env.USAGE_FLUSH_INTERVAL_MS, 10) || 5000;
+    static CACHE_TTL_MS = 30 * 1000;
+
+    // Tracks per day by tier; -1 is unlimited (day passes last 24 hours)
+    static DAILY_LIMITS = {
+        'single': 1,
+        'dj-pro': -1,
+        'studio-elite': -1,
+        'day-pass': -1
+    };
+
+    // userId -> { dayKey, monthKey, daily, monthly, loadedAt } or { loading: Promise }
+    static cache = new Map();
+    // Increments not yet written ([{ user, tracks, at }]), and those being written
+    static pending = [];
+    static flushing = [];
+    static timer = null;
+
+    static start() {
+        if (UsageCounters.timer) return;
+        UsageCounters.timer = setInterval(() => {
+            UsageCounters.flush().catch(error => console.error('Usage flush error:', error.message));
+        }, UsageCounters.FLUSH_INTERVAL_MS);
+        UsageCounters.timer.unref();
+    }
+
+    static async stop() {
+        clearInterval(UsageCounters.timer);
+        UsageCounters.timer = null;
+        await UsageCounters.flush();
+    }
+
+    static record(user, tracks = 1, at = new Date()) {
+        UsageCounters.pending.push({ user, tracks, at });
+
+        const entry = UsageCounters.cache.get(String(user));
+        if (entry && !entry.loading && entry.dayKey === UsageCounter.dayKey(at)) {
+            entry.daily += tracks;
+            entry.monthly += tracks;
+        }
+    }
+
+    // { daily, monthly } tracks for a user, including unflushed ones
+    static async usage(user, now = new Date()) {
+        const id = String(user);
+        const entry = UsageCounters.cache.get(id);
+        if (entry && entry.loading) return entry.loading;
+        if (entry && entry.dayKey === UsageCounter.dayKey(now) && now - entry.loadedAt < UsageCounters.CACHE_TTL_MS) {
+            return { daily: entry.daily, monthly: entry.monthly };
+        }
+
+        // Cached once, when the load settles, so concurrent callers sharing it
+        // can't overwrite counts recorded in the meantime
+        const loading = UsageCounters.load(user, now).then(usage => {
+            if (UsageCounters.cache.get(id) === pending) {
+                UsageCounters.cache.set(id, {
+                    dayKey: UsageCounter.dayKey(now),
+                    monthKey: UsageCounter.monthKey(now),
+                    ...usage,
+                    loadedAt: now
+                });
+            }
+            return usage;
+        }, error => {
+            if (UsageCounters.cache.get(id) === pending) UsageCounters.cache.delete(id);
+            throw error;
+        });
+        const pending = { loading };
+        UsageCounters.cache.set(id, pending);
+        return loading;
+    }
+
+    static async load(user, now) {
+        const stored = mongoose.connection.readyState === 1
+            ? await UsageCounter.current(user, now)
+            : { daily: 0, monthly: 0 };
+
+        const dayKey = UsageCounter.dayKey(now);
+        const monthKey = UsageCounter.monthKey(now);
+        for (const increment of [...UsageCounters.flushing, ...UsageCounters.pending]) {
+            if (String(increment.user) !== String(user)) continue;
+            if (UsageCounter.dayKey(increment.at) === dayKey) stored.daily += increment.tracks;
+            if (UsageCounter.monthKey(increment.at) === monthKey) stored.monthly += increment.tracks;
+        }
+        return stored;
+    }
+
+    // Whether a user on `tier` may start another track today
+    static async canProcess(user, tier, now = new Date()) {
+        const limit = UsageCounters.DAILY_LIMITS[tier] !== undefined ? UsageCounters.DAILY_LIMITS[tier] : 1;
+        if (limit === -1) return true;
+
+        const { daily } = await UsageCounters.usage(user, now);
+        return daily < limit;
+    }
+
+    // Counts a track against the quota if it fits: the check and the
+    // increment run with no await between them, so concurrent uploads can't
+    // all pass on the same count. Undo with release() if the track is dropped.
+    static async reserve(user, tier, now = new Date()) {
+        const limit = UsageCounters.DAILY_LIMITS[tier] !== undefined ? UsageCounters.DAILY_LIMITS[tier] : 1;
+        if (limit !== -1) {
+            const usage = await UsageCounters.usage(user, now);
+            const entry = UsageCounters.cache.get(String(user));
+            const daily = entry && !entry.loading && entry.dayKey === UsageCounter.dayKey(now) ? entry.daily : usage.daily;
+            if (daily >= limit) return false;
+        }
+
+        UsageCounters.record(user, 1, now);
+        return true;
+    }
+
+    // Returns a reserve()d track; `at` is the time it was reserved with
+    static release(user, at) {
+        UsageCounters.record(user, -1, at);
+    }
+
+    static async flush(now = new Date()) {
+        for (const [id, entry] of UsageCounters.cache) {
+            if (!entry.loading && now - entry.loadedAt >= UsageCounters.CACHE_TTL_MS) UsageCounters.cache.delete(id);
+        }
+        if (UsageCounters.pending.length === 0 || mongoose.connection.readyState !== 1) return;
+
+        UsageCounters.flushing = UsageCounters.pending;
+        UsageCounters.pending = [];
+        try {
+            await UsageCounter.addMany(UsageCounters.flushing);
+        } catch (error) {
+            // Put the increments back for the next flush
+            UsageCounters.pending = UsageCounters.flushing.concat(UsageCounters.pending);
+            throw error;
+        } finally {
+            UsageCounters.flushing = [];
+        }
+    }
+}
+
+module.exports = UsageCounters;
@@ -0,0 +1,265 @@
+const fs = require('fs').promises;
+const FFT = require('./fft');
+
+// Cheap spectral vocal-activity detector, fed from the waveform pass.
+//
+// Each 1024-sample frame (about 23 ms at 44.1 kHz, no overlap) is scored on:
+//   - level: mean-square of the frame in dBFS
+//   - band ratio: energy in the voice band (300 Hz - 3.4 kHz) over total energy
+//   - spectral flatness inside that band: geometric / arithmetic mean of the
+//     power, near 0 for harmonic sources (voice) and near 1 for noise
+//
+// It is tuned to err towards speech: a missed vocal means an unfiltered word,
+// so frames are only ruled out when they are silent, have almost no energy in
+// the voice band (bass and kick drops) or are noise-like (risers, hats).
+// Voiced frames are then smoothed into padded, merged regions in seconds.
+class VocalActivityDetector {
+    static DEFAULTS = {
+        frameSize: 1024,
+        bandLowHz: 300,
+        bandHighHz: 3400,
+        silenceDb: -50,
+        minBandRatio: 0.15,
+        maxFlatness: 0.6,
+        windowSeconds: 1,
+        minVoicedShare: 0.3,
+        paddingSeconds: 0.5,
+        mergeGapSeconds: 2
+    };
+
+    // Silence inserted between regions in the speech-only WAV so the
+    // transcriber doesn't run words from separate regions together
+    static GAP_SECONDS = 0.25;
+
+    constructor(sampleRate, channels, options = {}) {
+        this.settings = { ...VocalActivityDetector.DEFAULTS, ...options };
+        this.sampleRate = sampleRate;
+        this.channels = channels;
+
+        const { frameSize, bandLowHz, bandHighHz } = this.settings;
+        this.fft = new FFT(frameSize, 'hann');
+        this.power = new Float64Array(this.fft.bins);
+        this.frame = new Float64Array(frameSize);
+        this.frameFill = 0;
+
+        const binHz = sampleRate / frameSize;
+        this.bandLow = Math.max(1, Math.ceil(bandLowHz / binHz));
+        this.bandHigh = Math.min(this.fft.bins - 1, Math.floor(bandHighHz / binHz));
+        this.silence = Math.pow(10, this.settings.silenceDb / 10);
+
+        this.voiced = new Uint8Array(1024);
+        this.frames = 0;
+        this.samples = 0;
+    }
+
+    // Interleaved Int16Array of whole frames, in order
+    push(samples) {
+        const { channels, frame } = this;
+        const size = frame.length;
+        const scale = 1 / (32768 * channels);
+        const count = samples.length / channels;
+
+        for (let i = 0, j = 0; i < count; i++) {
+            let sum = 0;
+            for (let c = 0; c < channels; c++) sum += samples[j++];
+            frame[this.frameFill++] = sum * scale;
+
+            if (this.frameFill === size) {
+                this.classify();
+                this.frameFill = 0;
+            }
+        }
+        this.samples += count;
+    }
+
+    classify() {
+        const { frame, power, bandLow, bandHigh } = this;
+        let voiced = 0;
+
+        let squares = 0;
+        for (let i = 0; i < frame.length; i++) squares += frame[i] * frame[i];
+
+        if (squares / frame.length >= this.silence) {
+            this.fft.powerSpectrum(frame, 0, power);
+
+            let total = 0;
+            for (let k = 1; k < power.length; k++) total += power[k];
+
+            let band = 0;
+            let logSum = 0;
+            for (let k = bandLow; k <= bandHigh; k++) {
+                band += power[k];
+                logSum += Math.log(power[k] + 1e-20);
+            }
+
+            const bins = bandHigh - bandLow + 1;
+            const flatness = band > 0 ? Math.exp(logSum / bins) / (band / bins) : 1;
+            if (total > 0 && band / total >= this.settings.minBandRatio && flatness <= this.settings.maxFlatness) {
+                voiced = 1;
+            }
+        }
+
+        if (this.frames === this.voiced.length) {
+            const grown = new Uint8Array(this.voiced.length * 2);
+            grown.set(this.voiced);
+            this.voiced = grown;
+        }
+        this.voiced[this.frames++] = voiced;
+    }
+
+    // { regions: [{ start, end }], speechSeconds, duration } in seconds
+    result() {
+        const { windowSeconds, minVoicedShare, paddingSeconds, mergeGapSeconds } = this.settings;
+        const frameDuration = this.frame.length / this.sampleRate;
+        const duration = this.samples / this.sampleRate;
+        const voiced = this.voiced;
+        const frames = this.frames;
+
+        // Sliding window share of voiced frames, centred on each frame
+        const half = Math.max(1, Math.round(windowSeconds / frameDuration / 2));
+        const runs = [];
+        let count = 0;
+        let runStart = -1;
+        for (let i = 0; i < Math.min(half, frames); i++) count += voiced[i];
+
+        for (let i = 0; i < frames; i++) {
+            if (i + half < frames) count += voiced[i + half];
+            if (i - half - 1 >= 0) count -= voiced[i - half - 1];
+            const width = Math.min(frames - 1, i + half) - Math.max(0, i - half) + 1;
+            const active = count >= minVoicedShare * width;
+
+            if (active && runStart < 0) runStart = i;
+            if (!active && runStart >= 0) {
+                runs.push([runStart, i]);
+                runStart = -1;
+            }
+        }
+        if (runStart >= 0) runs.push([runStart, frames]);
+
+        const regions = [];
+        for (const [first, last] of runs) {
+            const start = Math.max(0, first * frameDuration - paddingSeconds);
+            const end = Math.min(duration, last * frameDuration + paddingSeconds);
+            const previous = regions[regions.length - 1];
+
+            if (previous && start - previous.end < mergeGapSeconds) {
+                previous.end = end;
+            } else {
+                regions.push({ start, end });
+            }
+        }
+
+        const rounded = regions.map(region => ({
+            start: Number(region.start.toFixed(3)),
+            end: Number(region.end.toFixed(3))
+        }));
+
+        return {
+            regions: rounded,
+            speechSeconds: rounded.reduce((sum, region) => sum + region.end - region.start, 0),
+            duration
+        };
+    }
+
+    // Writes `regions` of raw s16le PCM as one mono 16-bit WAV, separated by
+    // GAP_SECONDS of silence. Returns the timeline mapping WAV time back to the
+    // source: [{ start, end, offset }], offset being where the region begins in
+    // the WAV.
+    static async writeSpeechWav(pcmPath, format, regions, wavPath) {
+        const frameBytes = format.channels * format.bytesPerSample;
+        const gapFrames = Math.round(VocalActivityDetector.GAP_SECONDS * format.sampleRate);
+        const chunkFrames = 256 * 1024;
+        const timeline = [];
+
+        const source = await fs.open(pcmPath, 'r');
+        const target = await fs.open(wavPath, 'w');
+        try {
+            let written = 0;
+            await target.write(Buffer.alloc(44), 0, 44, 0);
+
+            for (const region of regions) {
+                const first = Math.floor(region.start * format.sampleRate);
+                const last = Math.ceil(region.end * format.sampleRate);
+
+                if (timeline.length > 0) {
+                    await target.write(Buffer.alloc(gapFrames * 2), 0, gapFrames * 2, 44 + written * 2);
+                    written += gapFrames;
+                }
+                timeline.push({ start: first / format.sampleRate, end: last / format.sampleRate, offset: written / format.sampleRate });
+
+                const input = Buffer.alloc(chunkFrames * frameBytes);
+                for (let frame = first; frame < last; frame += chunkFrames) {
+                    const want = Math.min(chunkFrames, last - frame) * frameBytes;
+                    const { bytesRead } = await source.read(input, 0, want, frame * frameBytes);
+                    if (bytesRead === 0) break;
+
+                    const read = (bytesRead - (bytesRead % frameBytes)) / frameBytes;
+                    const samples = new Int16Array(input.buffer, input.byteOffset, read * format.channels);
+                    const mono = Buffer.alloc(read * 2);
+                    for (let i = 0, j = 0; i < read; i++) {
+                        let sum = 0;
+                        for (let c = 0; c < format.channels; c++) sum += samples[j++];
+                        mono.writeInt16LE(Math.round(sum / format.channels), i * 2);
+                    }
+
+                    await target.write(mono, 0, mono.length, 44 + written * 2);
+                    written += read;
+                }
+            }
+
+            await target.write(VocalActivityDetector.wavHeader(written * 2, format.sampleRate), 0, 44, 0);
+        } finally {
+            await source.close();
+            await target.close();
+        }
+
+        return timeline;
+    }
+
+    static wavHeader(dataBytes, sampleRate) {
+        const header = Buffer.alloc(44);
+        header.write('RIFF', 0);
+        header.writeUInt32LE(36 + dataBytes, 4);
+        header.write('WAVE', 8);
+        header.write('fmt ', 12);
+        header.writeUInt32LE(16, 16);
+        header.writeUInt16LE(1, 20);
+        header.writeUInt16LE(1, 22);
+        header.writeUInt32LE(sampleRate, 24);
+        header.writeUInt32LE(sampleRate * 2, 28);
+        header.writeUInt16LE(2, 32);
+        header.writeUInt16LE(16, 34);
+        header.write('data', 36);
+        header.writeUInt32LE(dataBytes, 40);
+        return header;
+    }
+
+    // Moves segment and word timings from speech-WAV time back to source time
+    static mapTranscript(detection, timeline) {
+        const map = time => VocalActivityDetector.sourceTime(time, timeline);
+        const move = item => ({ ...item, start: map(item.start), end: map(item.end) });
+
+        return {
+            ...detection,
+            segments: (detection.segments || []).map(move),
+            words: (detection.words || []).map(move)
+        };
+    }
+
+    static sourceTime(time, timeline) {
+        if (timeline.length === 0) return time;
+
+        let low = 0;
+        let high = timeline.length - 1;
+        while (low < high) {
+            const mid = (low + high + 1) >> 1;
+            if (timeline[mid].offset <= time) low = mid; else high = mid - 1;
+        }
+
+        const entry = timeline[low];
+        const within = Math.min(Math.max(0, time - entry.offset), entry.end - entry.start);
+        return Number((entry.start + within).toFixed(3));
+    }
+}
+
+module.exports = VocalActivityDetector;
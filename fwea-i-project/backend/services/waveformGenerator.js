@@ -1,7 +1,12 @@
 const ffmpeg = require('fluent-ffmpeg');
 const fs = require('fs').promises;
+const { createReadStream } = require('fs');
 const path = require('path');
 const { WaveFile } = require('wavefile');
+const LoudnessMeter = require('./loudnessMeter');
+const Spectrogram = require('./spectrogram');
+const TransientDetector = require('./transientDetector');
+const VocalActivityDetector = require('./vocalActivity');
 
 class WaveformGenerator {
     static async generate(audioPath, options = {}) {
@@ -63,13 +68,14 @@ class WaveformGenerator {
                 // Clean up temp file
                 await fs.unlink(tempWavPath).catch(() => {});
 
+                const duration = wav.fmt.sampleRate ? samples16.length / wav.fmt.sampleRate : 0;
                 return {
                     data: waveformData,
                     width,
                     height,
                     samples: samples16.length,
-                    duration: wav.fmt.sampleRate ? samples16.length / wav.fmt.sampleRate : 0,
-                    peaks: this.findPeaks(waveformData),
+                    duration,
+                    peaks: this.findPeaks(waveformData, 0.7, duration),
                     rms: this.calculateRMS(samples16)
                 };
 
@@ -87,38 +93,144 @@ class WaveformGenerator {
     }
 
     static generateWaveformPoints(audioSamples, targetPoints) {
-        const samplesPerPoint = Math.floor(audioSamples.length / targetPoints);
-        const waveformPoints = [];
-
-        for (let i = 0; i < targetPoints; i++) {
-            const start = i * samplesPerPoint;
-            const end = Math.min(start + samplesPerPoint, audioSamples.length);
-
-            let max = 0;
-            let min = 0;
-            let sum = 0;
-
-            for (let j = start; j < end; j++) {
-                const sample = audioSamples[j] / 32768; // Normalize to -1 to 1
-                max = Math.max(max, sample);
-                min = Math.min(min, sample);
-                sum += Math.abs(sample);
-            }
+        const reducer = this.createReducer(audioSamples.length, 1, targetPoints);
+        reducer.push(audioSamples);
+        return reducer.points();
+    }
 
-            const avg = sum / (end - start);
+    // Waveform, loudness, vocal activity, peaks and onsets of decoded PCM (raw
+    // s16le, see PcmRenderer.FORMAT) in one streaming read: every chunk goes
+    // through the waveform reducer, the EBU R128 meter, the vocal-activity
+    // detector and the transient detector. Used on the job's source.pcm, so it
+    // costs no decode. `transients` holds TimeIndex instances (absolute times).
+    static async analyzePcm(pcmPath, format, options = {}) {
+        const { width = 800, height = 200, samples = 1000 } = options;
+        const frameBytes = format.channels * format.bytesPerSample;
+        const totalFrames = Math.floor((await fs.stat(pcmPath)).size / frameBytes);
+
+        const reducer = this.createReducer(totalFrames, format.channels, samples);
+        const meter = new LoudnessMeter(format.sampleRate, format.channels);
+        const vocals = new VocalActivityDetector(format.sampleRate, format.channels);
+        const transientDetector = new TransientDetector(format.sampleRate, format.channels);
+
+        await this.forEachPcmBlock(createReadStream(pcmPath, { highWaterMark: 1024 * 1024 }), frameBytes, block => {
+            reducer.push(block);
+            meter.push(block);
+            vocals.push(block);
+            transientDetector.push(block);
+        });
+
+        const loudness = meter.result();
+        const data = reducer.points();
+        const transients = transientDetector.result();
+        const duration = totalFrames / format.sampleRate;
 
-            waveformPoints.push({
-                max: max,
-                min: min,
-                avg: avg,
-                rms: Math.sqrt(sum * sum / (end - start))
-            });
+        return {
+            waveform: {
+                data,
+                width,
+                height,
+                samples: totalFrames,
+                duration,
+                peaks: this.loudestPeaks(transients.peaks, data.length, duration, options.peaks),
+                rms: loudness.rmsLinear
+            },
+            loudness,
+            speech: vocals.result(),
+            transients
+        };
+    }
+
+    // Calls fn(Int16Array) for each chunk of a raw s16le stream, cut to whole frames
+    static async forEachPcmBlock(stream, frameBytes, fn) {
+        let carry = Buffer.alloc(0);
+
+        for await (const chunk of stream) {
+            // Int16Array also needs an even byte offset
+            const data = carry.length > 0 ? Buffer.concat([carry, chunk]) : chunk;
+            const usable = data.length - (data.length % frameBytes);
+            const aligned = data.byteOffset % 2 === 0 ? data : Buffer.from(data);
+
+            await fn(new Int16Array(aligned.buffer, aligned.byteOffset, usable / 2));
+            carry = Buffer.from(data.subarray(usable));
         }
+    }
+
+    // Streaming min/max/avg/rms per waveform point over the channel mix.
+    // push() takes interleaved Int16Array blocks of whole frames, in order.
+    static createReducer(totalFrames, channels, targetPoints) {
+        const framesPerPoint = Math.max(1, Math.ceil(totalFrames / targetPoints));
+        const count = Math.min(targetPoints, Math.ceil(totalFrames / framesPerPoint));
+        const max = new Float32Array(count);
+        const min = new Float32Array(count);
+        const absSum = new Float64Array(count);
+        const squareSum = new Float64Array(count);
+        const scale = 1 / (32768 * channels);
+        let frame = 0;
+
+        return {
+            push(samples) {
+                const frames = samples.length / channels;
+                let i = 0;
+                let j = 0;
+
+                while (i < frames && frame < totalFrames) {
+                    const point = Math.floor(frame / framesPerPoint);
+                    const take = Math.min(frames - i, (point + 1) * framesPerPoint - frame, totalFrames - frame);
+                    let high = max[point], low = min[point], abs = 0, squares = 0;
+
+                    for (const end = i + take; i < end; i++) {
+                        let value = 0;
+                        for (let c = 0; c < channels; c++) value += samples[j++];
+                        value *= scale;
+                        if (value > high) high = value;
+                        if (value < low) low = value;
+                        abs += value < 0 ? -value : value;
+                        squares += value * value;
+                    }
+
+                    max[point] = high;
+                    min[point] = low;
+                    absSum[point] += abs;
+                    squareSum[point] += squares;
+                    frame += take;
+                }
+            },
+
+            points() {
+                const points = new Array(count);
+                for (let p = 0; p < count; p++) {
+                    const frames = Math.min(framesPerPoint, totalFrames - p * framesPerPoint);
+                    points[p] = {
+                        max: max[p],
+                        min: min[p],
+                        avg: absSum[p] / frames,
+                        rms: Math.sqrt(squareSum[p] / frames)
+                    };
+                }
+                return points;
+            }
+        };
+    }
 
-        return waveformPoints;
+    // The `limit` loudest peaks of a TimeIndex in time order, shaped like
+    // findPeaks() output; the full index stays queryable by time range
+    static loudestPeaks(index, points, duration, limit = 100) {
+        return index.range()
+            .sort((a, b) => b.value - a.value)
+            .slice(0, limit)
+            .sort((a, b) => a.time - b.time)
+            .map(peak => ({
+                index: Math.min(points - 1, Math.floor((peak.time / duration) * points)),
+                value: peak.value,
+                time: peak.time
+            }));
     }
 
-    static findPeaks(waveformData, threshold = 0.7) {
+    // Local maxima of the point maxima above `threshold`; `time` is the centre
+    // of the point in seconds. Decoded jobs get sample-accurate peaks from
+    // TransientDetector instead (see analyzePcm).
+    static findPeaks(waveformData, threshold = 0.7, duration = 0) {
         const peaks = [];
 
         for (let i = 1; i < waveformData.length - 1; i++) {
@@ -130,7 +242,7 @@ class WaveformGenerator {
                 peaks.push({
                     index: i,
                     value: current,
-                    time: (i / waveformData.length) // Relative time position
+                    time: ((i + 0.5) / waveformData.length) * duration
                 });
             }
         }
@@ -139,12 +251,15 @@ class WaveformGenerator {
     }
 
     static calculateRMS(samples) {
+        if (samples.length === 0) return 0;
+
+        // Indexed loop over the typed array; squares of raw int16 values are
+        // exact in a double, so normalise once at the end
         let sum = 0;
-        for (const sample of samples) {
-            const normalized = sample / 32768;
-            sum += normalized * normalized;
+        for (let i = 0; i < samples.length; i++) {
+            sum += samples[i] * samples[i];
         }
-        return Math.sqrt(sum / samples.length);
+        return Math.sqrt(sum / samples.length) / 32768;
     }
 
     static generateDummyWaveform(width, height, samples) {
@@ -171,35 +286,90 @@ class WaveformGenerator {
             height,
             samples: samples,
             duration: 180, // 3 minutes
-            peaks: this.findPeaks(waveformData),
+            peaks: this.findPeaks(waveformData, 0.7, 180),
             rms: 0.3,
             isDummy: true
         };
     }
 
+    // STFT spectrogram (see Spectrogram) streamed over the audio. `audioPath`
+    // is raw PCM when options.pcmFormat is given (a job's source.pcm), otherwise
+    // any audio file, decoded to mono on the fly. Tiles go to options.onTile as
+    // they complete; without onTile they are collected into `tiles`.
     static async generateSpectrogramData(audioPath, options = {}) {
-        const {
-            fftSize = 2048,
-            hopSize = 512,
-            windowFunction = 'hann'
-        } = options;
+        const { pcmFormat = null, onTile = null, ...settings } = options;
 
         try {
-            // This would require more complex FFT analysis
-            // For now, return placeholder data
-            return {
-                frequencies: [],
-                times: [],
-                magnitudes: [],
-                sampleRate: 44100,
-                fftSize,
-                message: 'Spectrogram generation not implemented'
-            };
+            const format = pcmFormat || { sampleRate: 44100, channels: 1, bytesPerSample: 2 };
+            const source = pcmFormat
+                ? createReadStream(audioPath, { highWaterMark: 1024 * 1024 })
+                : await this.decodeMono(audioPath, format.sampleRate);
+            if (!source) return null;
+
+            const tiles = [];
+            const spectrogram = new Spectrogram(format.sampleRate, settings, onTile || (tile => tiles.push(tile)));
+            const frameBytes = format.channels * format.bytesPerSample;
+
+            await this.forEachPcmBlock(source, frameBytes, block =>
+                spectrogram.push(Spectrogram.mixDown(block, format.channels)));
+
+            const result = spectrogram.finish();
+            return onTile ? result : { ...result, tiles };
         } catch (error) {
             console.error('Spectrogram generation error:', error);
             return null;
         }
     }
+
+    // One tile straight from raw PCM with positional reads, for loading tiles
+    // on demand without computing the ones before it
+    static async spectrogramTile(pcmPath, pcmFormat, index, options = {}) {
+        const settings = { ...Spectrogram.DEFAULTS, ...options };
+        const frameBytes = pcmFormat.channels * pcmFormat.bytesPerSample;
+        const firstSample = index * settings.tileFrames * settings.hopSize;
+        const sampleCount = (settings.tileFrames - 1) * settings.hopSize + settings.fftSize;
+
+        const buffer = Buffer.alloc(sampleCount * frameBytes);
+        const handle = await fs.open(pcmPath, 'r');
+        let bytesRead;
+        try {
+            ({ bytesRead } = await handle.read(buffer, 0, buffer.length, firstSample * frameBytes));
+        } finally {
+            await handle.close();
+        }
+        if (bytesRead < settings.fftSize * frameBytes) return null;
+
+        let tile = null;
+        const spectrogram = new Spectrogram(pcmFormat.sampleRate, settings, emitted => { tile = emitted; });
+        const block = new Int16Array(buffer.buffer, buffer.byteOffset, (bytesRead - (bytesRead % frameBytes)) / 2);
+        spectrogram.push(Spectrogram.mixDown(block, pcmFormat.channels));
+        spectrogram.finish();
+
+        return tile && {
+            ...tile,
+            index,
+            startFrame: index * settings.tileFrames,
+            startTime: firstSample / pcmFormat.sampleRate
+        };
+    }
+
+    // Mono s16le stream of any input, or null without ffmpeg
+    static async decodeMono(audioPath, sampleRate) {
+        const available = await new Promise(resolve => ffmpeg.getAvailableFormats(err => resolve(!err)));
+        if (!available) {
+            console.warn('FFmpeg not available for spectrogram generation');
+            return null;
+        }
+
+        return ffmpeg(audioPath)
+            .noVideo()
+            .audioCodec('pcm_s16le')
+            .audioFrequency(sampleRate)
+            .audioChannels(1)
+            .format('s16le')
+            .on('error', error => console.error('Spectrogram decode error:', error.message))
+            .pipe();
+    }
 }
 
 module.exports = WaveformGenerator;
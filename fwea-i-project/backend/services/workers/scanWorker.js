@@ -0,0 +1,34 @@
+const { parentPort, workerData } = require('worker_threads');
+const LexiconStore = require('../lexiconStore');
+const ProfanityFilter = require('../profanityFilter');
+
+// Batch scan worker. Each thread compiles the lexicons it sees once and reuses
+// the matchers for every transcript it is handed; no file watcher, since a
+// lexicon change means a new backfill anyway.
+const store = new LexiconStore(workerData.lexiconPath);
+const filter = new ProfanityFilter(store);
+const options = workerData.options || {};
+
+parentPort.on('message', async ({ batchId, transcripts }) => {
+    const results = [];
+
+    try {
+        for (const transcript of transcripts) {
+            const timestamps = await filter.scanSegments(transcript.segments, transcript.languages, options);
+
+            results.push({
+                id: transcript.id,
+                segments: transcript.segments.length,
+                profanityAnalysis: {
+                    ...filter.summarize(timestamps),
+                    lexiconVersion: store.getVersion(transcript.languages),
+                    scannedAt: new Date()
+                }
+            });
+        }
+
+        parentPort.postMessage({ batchId, results });
+    } catch (error) {
+        parentPort.postMessage({ batchId, error: error.message });
+    }
+});
@@ -0,0 +1,380 @@
+const crypto = require('crypto');
+const fs = require('fs');
+const zlib = require('zlib');
+
+const ZIP64_LIMIT = 0xFFFFFFFF;
+// bit 3: CRC and sizes follow the data; bit 11: UTF-8 names
+const FLAGS = 0x0808;
+const CRC_CACHE_SIZE = 10000;
+
+// zlib.crc32 is Node >= 20.15 / 22.2; a table-driven fallback otherwise
+let CRC_TABLE = null;
+function crc32(chunk, crc = 0) {
+    if (zlib.crc32) return zlib.crc32(chunk, crc);
+
+    if (!CRC_TABLE) {
+        CRC_TABLE = new Int32Array(256);
+        for (let n = 0; n < 256; n++) {
+            let c = n;
+            for (let k = 0; k < 8; k++) c = c & 1 ? 0xEDB88320 ^ (c >>> 1) : c >>> 1;
+            CRC_TABLE[n] = c;
+        }
+    }
+    let c = crc ^ -1;
+    for (let i = 0; i < chunk.length; i++) {
+        c = CRC_TABLE[(c ^ chunk[i]) & 0xFF] ^ (c >>> 8);
+    }
+    return (c ^ -1) >>> 0;
+}
+
+function dosDateTime(date) {
+    const time = (date.getHours() << 11) | (date.getMinutes() << 5) | Math.floor(date.getSeconds() / 2);
+    const day = ((Math.max(1980, date.getFullYear()) - 1980) << 9) | ((date.getMonth() + 1) << 5) | date.getDate();
+    return { time, day };
+}
+
+function writeUInt64(buffer, value, offset) {
+    buffer.writeBigUInt64LE(BigInt(value), offset);
+}
+
+function entryFor(name, size, offset, modified) {
+    return {
+        name: Buffer.from(name, 'utf8'),
+        size,
+        crc: null,
+        offset,
+        modified: dosDateTime(modified),
+        zip64: size >= ZIP64_LIMIT || offset >= ZIP64_LIMIT
+    };
+}
+
+function localHeader(entry) {
+    const extra = entry.zip64 ? 20 : 0;
+    const header = Buffer.alloc(30 + entry.name.length + extra);
+    header.writeUInt32LE(0x04034b50, 0);
+    header.writeUInt16LE(entry.zip64 ? 45 : 20, 4);
+    header.writeUInt16LE(FLAGS, 6);
+    header.writeUInt16LE(0, 8); // stored
+    header.writeUInt16LE(entry.modified.time, 10);
+    header.writeUInt16LE(entry.modified.day, 12);
+    // CRC and sizes are in the data descriptor
+    header.writeUInt32LE(0, 14);
+    header.writeUInt32LE(entry.zip64 ? ZIP64_LIMIT : 0, 18);
+    header.writeUInt32LE(entry.zip64 ? ZIP64_LIMIT : 0, 22);
+    header.writeUInt16LE(entry.name.length, 26);
+    header.writeUInt16LE(extra, 28);
+    entry.name.copy(header, 30);
+    if (entry.zip64) {
+        const at = 30 + entry.name.length;
+        header.writeUInt16LE(0x0001, at);
+        header.writeUInt16LE(16, at + 2);
+        // Sizes left zero, as the data descriptor has them
+    }
+    return header;
+}
+
+function descriptorLength(entry) {
+    return entry.zip64 ? 24 : 16;
+}
+
+function dataDescriptor(entry) {
+    const descriptor = Buffer.alloc(descriptorLength(entry));
+    descriptor.writeUInt32LE(0x08074b50, 0);
+    descriptor.writeUInt32LE(entry.crc >>> 0, 4);
+    if (entry.zip64) {
+        writeUInt64(descriptor, entry.size, 8);
+        writeUInt64(descriptor, entry.size, 16);
+    } else {
+        descriptor.writeUInt32LE(entry.size, 8);
+        descriptor.writeUInt32LE(entry.size, 12);
+    }
+    return descriptor;
+}
+
+function centralHeader(entry) {
+    const bigSize = entry.size >= ZIP64_LIMIT;
+    const bigOffset = entry.offset >= ZIP64_LIMIT;
+    const extra = (bigSize ? 16 : 0) + (bigOffset ? 8 : 0);
+    const header = Buffer.alloc(46 + entry.name.length + (extra ? extra + 4 : 0));
+
+    header.writeUInt32LE(0x02014b50, 0);
+    header.writeUInt16LE(entry.zip64 ? 45 : 20, 4);
+    header.writeUInt16LE(entry.zip64 ? 45 : 20, 6);
+    header.writeUInt16LE(FLAGS, 8);
+    header.writeUInt16LE(0, 10);
+    header.writeUInt16LE(entry.modified.time, 12);
+    header.writeUInt16LE(entry.modified.day, 14);
+    header.writeUInt32LE(entry.crc >>> 0, 16);
+    header.writeUInt32LE(bigSize ? ZIP64_LIMIT : entry.size, 20);
+    header.writeUInt32LE(bigSize ? ZIP64_LIMIT : entry.size, 24);
+    header.writeUInt16LE(entry.name.length, 28);
+    header.writeUInt16LE(extra ? extra + 4 : 0, 30);
+    // comment length, disk, internal and external attributes stay 0
+    header.writeUInt32LE(bigOffset ? ZIP64_LIMIT : entry.offset, 42);
+    entry.name.copy(header, 46);
+
+    if (extra) {
+        let at = 46 + entry.name.length;
+        header.writeUInt16LE(0x0001, at);
+        header.writeUInt16LE(extra, at + 2);
+        at += 4;
+        if (bigSize) {
+            writeUInt64(header, entry.size, at);
+            writeUInt64(header, entry.size, at + 8);
+            at += 16;
+        }
+        if (bigOffset) writeUInt64(header, entry.offset, at);
+    }
+    return header;
+}
+
+function centralHeaderLength(entry) {
+    const extra = (entry.size >= ZIP64_LIMIT ? 16 : 0) + (entry.offset >= ZIP64_LIMIT ? 8 : 0);
+    return 46 + entry.name.length + (extra ? extra + 4 : 0);
+}
+
+// ZIP64 end record and locator (when needed) plus the end of central directory
+function endRecords(count, start, size) {
+    const zip64 = count > 0xFFFF || start >= ZIP64_LIMIT || size >= ZIP64_LIMIT;
+    const records = Buffer.alloc((zip64 ? 76 : 0) + 22);
+    let at = 0;
+
+    if (zip64) {
+        const recordOffset = start + size;
+        records.writeUInt32LE(0x06064b50, 0);
+        writeUInt64(records, 44, 4);
+        records.writeUInt16LE(45, 12);
+        records.writeUInt16LE(45, 14);
+        writeUInt64(records, count, 24);
+        writeUInt64(records, count, 32);
+        writeUInt64(records, size, 40);
+        writeUInt64(records, start, 48);
+        // Locator
+        records.writeUInt32LE(0x07064b50, 56);
+        writeUInt64(records, recordOffset, 64);
+        records.writeUInt32LE(1, 72);
+        at = 76;
+    }
+
+    records.writeUInt32LE(0x06054b50, at);
+    records.writeUInt16LE(Math.min(count, 0xFFFF), at + 8);
+    records.writeUInt16LE(Math.min(count, 0xFFFF), at + 10);
+    records.writeUInt32LE(Math.min(size, ZIP64_LIMIT), at + 12);
+    records.writeUInt32LE(Math.min(start, ZIP64_LIMIT), at + 16);
+    return records;
+}
+
+// Streaming ZIP writer for archives of already-compressed audio. Entries
+// are stored (no deflate) and written straight through: the CRC is computed
+// as the bytes pass and follows each entry in a data descriptor, so a file
+// is read once and nothing is buffered. Entries or offsets past 4 GiB and
+// archives with more than 65535 entries use ZIP64 records.
+//
+//   const zip = new ZipWriter(res);
+//   await zip.addFile('a.mp3', '/path/a.mp3');
+//   await zip.finish();
+//
+// When every file is known up front, ZipWriter.layout() fixes the whole
+// archive's byte layout (exact length, offsets) before anything is read,
+// and writeRange() streams any byte range of it, for Content-Length and
+// HTTP Range requests. CRCs of files whose data a range skips come from a
+// cache of earlier reads, or a read of just that file.
+class ZipWriter {
+    // "<path>:<size>:<mtimeMs>" -> crc, least recently used first
+    static crcCache = new Map();
+
+    constructor(output) {
+        this.output = output;
+        this.offset = 0;
+        this.entries = [];
+        this.finished = false;
+    }
+
+    // Writes a chunk, waiting for the output to drain when it is full
+    write(chunk) {
+        this.offset += chunk.length;
+        return ZipWriter.send(this.output, chunk);
+    }
+
+    static send(output, chunk) {
+        if (output.write(chunk)) return Promise.resolve();
+
+        return new Promise((resolve, reject) => {
+            const cleanup = () => {
+                output.off('drain', onDrain);
+                output.off('close', onClose);
+                output.off('error', onError);
+            };
+            const onDrain = () => { cleanup(); resolve(); };
+            const onClose = () => { cleanup(); reject(new Error('Output closed')); };
+            const onError = error => { cleanup(); reject(error); };
+            output.on('drain', onDrain);
+            output.on('close', onClose);
+            output.on('error', onError);
+        });
+    }
+
+    async addFile(name, filePath, modified = null) {
+        const stats = await fs.promises.stat(filePath);
+        const entry = this.begin(name, stats.size, modified || stats.mtime);
+        await this.write(localHeader(entry));
+
+        entry.crc = 0;
+        let written = 0;
+        for await (const chunk of fs.createReadStream(filePath, { highWaterMark: 1024 * 1024 })) {
+            entry.crc = crc32(chunk, entry.crc);
+            written += chunk.length;
+            await this.write(chunk);
+        }
+        if (written !== entry.size) {
+            throw new Error(`${filePath} changed size while being archived`);
+        }
+
+        await this.write(dataDescriptor(entry));
+    }
+
+    async addBuffer(name, buffer, modified = new Date()) {
+        const entry = this.begin(name, buffer.length, modified);
+        entry.crc = crc32(buffer);
+        await this.write(localHeader(entry));
+        await this.write(buffer);
+        await this.write(dataDescriptor(entry));
+    }
+
+    begin(name, size, modified) {
+        if (this.finished) throw new Error('Archive already finished');
+
+        const entry = entryFor(name, size, this.offset, modified);
+        this.entries.push(entry);
+        return entry;
+    }
+
+    // Writes the central directory; the output is left open
+    async finish() {
+        if (this.finished) return;
+        this.finished = true;
+
+        const start = this.offset;
+        for (const entry of this.entries) {
+            await this.write(centralHeader(entry));
+        }
+        await this.write(endRecords(this.entries.length, start, this.offset - start));
+    }
+
+    // files: [{ name, path }] -> { size, etag, entries, directoryStart, directorySize }
+    // Same bytes as addFile() for each file then finish(), for unchanged files.
+    static async layout(files) {
+        const entries = [];
+        const etag = crypto.createHash('sha1');
+        let offset = 0;
+
+        for (const file of files) {
+            const stats = await fs.promises.stat(file.path);
+            const entry = entryFor(file.name, stats.size, offset, stats.mtime);
+            entry.path = file.path;
+            entry.cacheKey = `${file.path}:${stats.size}:${stats.mtimeMs}`;
+            entry.headerLength = 30 + entry.name.length + (entry.zip64 ? 20 : 0);
+            entry.dataStart = offset + entry.headerLength;
+            entries.push(entry);
+
+            etag.update(`${file.name}\0${entry.cacheKey}\n`);
+            offset = entry.dataStart + entry.size + descriptorLength(entry);
+        }
+
+        const directorySize = entries.reduce((sum, entry) => sum + centralHeaderLength(entry), 0);
+        const size = offset + directorySize + endRecords(entries.length, offset, directorySize).length;
+        return { size, etag: etag.digest('hex'), entries, directoryStart: offset, directorySize };
+    }
+
+    // Streams bytes [start, end] (inclusive) of a layout() archive
+    static async writeRange(output, layout, start = 0, end = layout.size - 1) {
+        const emit = async (bufferOrStart, segmentStart, segmentLength) => {
+            const from = Math.max(start, segmentStart) - segmentStart;
+            const to = Math.min(end + 1, segmentStart + segmentLength) - segmentStart;
+            if (to > from) await ZipWriter.send(output, bufferOrStart.subarray(from, to));
+        };
+        const overlaps = (segmentStart, segmentLength) => segmentStart <= end && segmentStart + segmentLength > start;
+
+        for (const entry of layout.entries) {
+            if (entry.offset > end) break;
+
+            if (overlaps(entry.offset, entry.headerLength)) {
+                await emit(localHeader(entry), entry.offset, entry.headerLength);
+            }
+
+            if (entry.size > 0 && overlaps(entry.dataStart, entry.size)) {
+                const whole = start <= entry.dataStart && end >= entry.dataStart + entry.size - 1;
+                let crc = 0;
+                let read = 0;
+                const stream = fs.createReadStream(entry.path, {
+                    start: Math.max(start, entry.dataStart) - entry.dataStart,
+                    end: Math.min(end, entry.dataStart + entry.size - 1) - entry.dataStart,
+                    highWaterMark: 1024 * 1024
+                });
+                for await (const chunk of stream) {
+                    if (whole) crc = crc32(chunk, crc);
+                    read += chunk.length;
+                    await ZipWriter.send(output, chunk);
+                }
+                if (whole) {
+                    if (read !== entry.size) throw new Error(`${entry.path} changed size while being archived`);
+                    ZipWriter.rememberCrc(entry.cacheKey, crc);
+                    entry.crc = crc;
+                }
+            }
+
+            // Nothing to read for an empty file; its CRC is 0
+            if (entry.size === 0) entry.crc = 0;
+
+            const descriptorStart = entry.dataStart + entry.size;
+            if (overlaps(descriptorStart, descriptorLength(entry))) {
+                await ZipWriter.ensureCrc(entry);
+                await emit(dataDescriptor(entry), descriptorStart, descriptorLength(entry));
+            }
+        }
+
+        if (end >= layout.directoryStart) {
+            let at = layout.directoryStart;
+            for (const entry of layout.entries) {
+                const length = centralHeaderLength(entry);
+                if (overlaps(at, length)) {
+                    await ZipWriter.ensureCrc(entry);
+                    await emit(centralHeader(entry), at, length);
+                }
+                at += length;
+            }
+            const records = endRecords(layout.entries.length, layout.directoryStart, layout.directorySize);
+            await emit(records, at, records.length);
+        }
+    }
+
+    // Fills in entry.crc from the cache, or by reading the file
+    static async ensureCrc(entry) {
+        if (entry.crc !== null) return;
+
+        const cached = ZipWriter.crcCache.get(entry.cacheKey);
+        if (cached !== undefined) {
+            ZipWriter.rememberCrc(entry.cacheKey, cached);
+            entry.crc = cached;
+            return;
+        }
+
+        let crc = 0;
+        for await (const chunk of fs.createReadStream(entry.path, { highWaterMark: 1024 * 1024 })) {
+            crc = crc32(chunk, crc);
+        }
+        ZipWriter.rememberCrc(entry.cacheKey, crc);
+        entry.crc = crc;
+    }
+
+    static rememberCrc(key, crc) {
+        ZipWriter.crcCache.delete(key);
+        ZipWriter.crcCache.set(key, crc);
+        while (ZipWriter.crcCache.size > CRC_CACHE_SIZE) {
+            ZipWriter.crcCache.delete(ZipWriter.crcCache.keys().next().value);
+        }
+    }
+}
+
+module.exports = ZipWriter;
+module.exports.crc32 = crc32;
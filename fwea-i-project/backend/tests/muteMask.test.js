@@ -0,0 +1,49 @@
+const MuteMask = require('../services/muteMask');
+
+// One word per 0.5s, as Whisper's word timestamps would give them
+function wordsOf(sentence) {
+    return sentence.split(' ').map((word, i) => ({ word, start: i * 0.5, end: i * 0.5 + 0.4 }));
+}
+
+// The words of `sentence` a mask built from one hit over it mutes
+function mutedWords(sentence, flagged) {
+    const words = wordsOf(sentence);
+    const hit = { start: 0, end: words.length * 0.5, words: flagged };
+    const mask = MuteMask.build([hit], words, { padding: 0, mergeGap: 0 });
+
+    return words
+        .filter(word => mask.some(interval => interval.start < word.end && interval.end > word.start))
+        .map(word => word.word);
+}
+
+describe('MuteMask.build', () => {
+    test('mutes every flagged word, including ones inside longer words', () => {
+        expect(mutedWords('damn you bitchy crappy fool', ['damn', 'bitch', 'crap']))
+            .toEqual(['damn', 'bitchy', 'crappy']);
+        expect(mutedWords('shit this is fuckery', ['shit', 'fuck']))
+            .toEqual(['shit', 'fuckery']);
+        expect(mutedWords('hell no, you dumbass', ['hell', 'ass']))
+            .toEqual(['hell', 'dumbass']);
+    });
+
+    test('leaves short words that only occur inside a flagged term audible', () => {
+        expect(mutedWords('I said it was shit', ['shit'])).toEqual(['shit']);
+        expect(mutedWords('a kick in the ass', ['ass'])).toEqual(['ass']);
+    });
+
+    test('matches multi-word terms as a consecutive run', () => {
+        expect(mutedWords('a son of a bitch of a day', ['son of a bitch']))
+            .toEqual(['son', 'of', 'a', 'bitch']);
+    });
+
+    test('mutes the whole segment when a flagged word cannot be placed', () => {
+        const words = wordsOf('what the heck');
+        const mask = MuteMask.build([{ start: 0, end: 1.5, words: ['fuck'] }], words, { padding: 0 });
+        expect(mask).toEqual([{ start: 0, end: 1.5 }]);
+    });
+
+    test('mutes the whole segment without word timings', () => {
+        const mask = MuteMask.build([{ start: 2, end: 4, words: ['shit'] }], []);
+        expect(mask).toEqual([{ start: 2, end: 4 }]);
+    });
+});
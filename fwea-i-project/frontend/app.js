@@ -516,7 +516,7 @@ class FWEAAudioEditor {
     }
 
     updateProgress(data) {
-        const { progress, stage, description, languages } = data;
+        const { progress, stage, description, languages, estimatedTimeRemaining } = data;
 
         const progressFill = document.getElementById('progressFill');
         const progressPercent = document.getElementById('progressPercent');
@@ -527,12 +527,46 @@ class FWEAAudioEditor {
         if (progressPercent) progressPercent.textContent = `${Math.round(progress)}%`;
         if (stage && progressStage) progressStage.textContent = this.formatStageName(stage);
         if (description && progressTime) progressTime.textContent = description;
+        if (typeof estimatedTimeRemaining === 'number') {
+            this.startEtaCountdown(description, estimatedTimeRemaining);
+        }
 
         if (languages && languages.length > 0) {
             this.showLanguageDetection(languages);
         }
     }
 
+    // Counts the server's estimate down locally between stage updates
+    startEtaCountdown(description, seconds) {
+        this.stopEtaCountdown();
+        const deadline = Date.now() + seconds * 1000;
+
+        const render = () => {
+            const progressTime = document.getElementById('progressTime');
+            if (!progressTime) return;
+            const left = Math.max(0, Math.round((deadline - Date.now()) / 1000));
+            progressTime.textContent = `${description || 'Processing...'} · ${this.formatEta(left)}`;
+        };
+
+        render();
+        this.etaTimer = setInterval(render, 1000);
+    }
+
+    stopEtaCountdown() {
+        if (this.etaTimer) {
+            clearInterval(this.etaTimer);
+            this.etaTimer = null;
+        }
+    }
+
+    formatEta(seconds) {
+        if (seconds < 5) return 'almost done';
+        if (seconds < 60) return `about ${seconds}s left`;
+        const minutes = Math.floor(seconds / 60);
+        const rest = seconds % 60;
+        return `about ${minutes}m ${String(rest).padStart(2, '0')}s left`;
+    }
+
     formatStageName(stage) {
         const stageNames = {
             'uploaded': 'Uploaded',
@@ -586,6 +620,7 @@ class FWEAAudioEditor {
 
     onProcessingComplete(data) {
         this.isProcessing = false;
+        this.stopEtaCountdown();
 
         const progressStage = document.getElementById('progressStage');
         const progressTime = document.getElementById('progressTime');
@@ -606,6 +641,7 @@ class FWEAAudioEditor {
 
     onProcessingError(data) {
         this.isProcessing = false;
+        this.stopEtaCountdown();
         this.showNotification(data.error || 'Processing failed. Please try again.', 'error');
     }
 